@@ -1,177 +1,101 @@
-from fastapi import APIRouter, Depends, HTTPException
+from datetime import date
+from fastapi import APIRouter, Depends, HTTPException, Request
 from sqlalchemy.orm import Session
 from sqlalchemy import func
 from app.core.database import get_db
+from app.core.cache import cached_json
+from app.services.profiler import current_snapshot, snapshot_payload
 from app.models.models import Customer, Transaction, ClusterResult, CustomerCluster
 from typing import List, Dict, Any
+from app.services.rollup_service import (
+    DATE_FORMATS, ROLLUP_GRANULARITIES, category_share, distinct_customers,
+    ensure_sales_rollup, sales_totals, sales_trend
+)
 
 router = APIRouter()
 
-@router.get("/analytics/summary")
-def get_summary_stats(db: Session = Depends(get_db)):
-    # Total Customers
-    total_customers = db.query(Customer).count()
-    
-    # Total Revenue
-    total_revenue = db.query(func.sum(Transaction.amount)).scalar() or 0
-    
-    # Total Transactions
-    total_transactions = db.query(Transaction).count()
-    
-    # Recent Clustering Runs
-    recent_runs = db.query(ClusterResult).order_by(ClusterResult.created_at.desc()).limit(5).all()
-    
-    return {
-        "total_customers": total_customers,
-        "total_revenue": total_revenue,
-        "total_transactions": total_transactions,
-        "recent_runs": [{"id": r.id, "name": r.run_name, "date": r.created_at} for r in recent_runs]
-    }
+def recency_day() -> str:
+    # Recency is measured from today, so payloads that include it go stale at midnight
+    return date.today().isoformat()
 
-@router.get("/analytics/sales-over-time")
-def get_sales_over_time(db: Session = Depends(get_db)):
-    # Aggregate sales by month (simplified)
-    # Note: In production, use database specific date truncation
-    # Aggregate sales by month
-    try:
-        results = db.query(
-            func.date_trunc('month', Transaction.transaction_date).label('month'),
-            func.sum(Transaction.amount).label('total')
-        ).group_by('month').order_by('month').all()
-        return [{"date": r.month.strftime('%Y-%m') if r.month else 'Unknown', "amount": r.total} for r in results]
-    except Exception:
-        db.rollback()
-        results = db.query(Transaction.transaction_date, Transaction.amount).all()
-        
-        if not results:
-            return []
-
-        import pandas as pd
-        df = pd.DataFrame(results, columns=['date', 'amount'])
-        df['month'] = pd.to_datetime(df['date']).dt.to_period('M')
-        monthly_sales = df.groupby('month')['amount'].sum().reset_index()
-        
-        return [{"date": str(r['month']), "amount": r['amount']} for _, r in monthly_sales.iterrows()]
+@router.get("/analytics/summary")
+def get_summary_stats(request: Request, db: Session = Depends(get_db)):
+    # Recent runs are not part of the data version; a cheap marker keeps the cache honest
+    run_count, latest_run = db.query(func.count(ClusterResult.id), func.max(ClusterResult.id)).one()
 
-@router.get("/analytics/data-quality")
-def get_data_quality_report(db: Session = Depends(get_db)):
-    # Basic Descriptive Statistics
-    total_transactions = db.query(Transaction).count()
-    total_customers = db.query(Customer).count()
-    
-    if total_transactions == 0:
+    def build():
+        # Recent Clustering Runs
+        recent_runs = db.query(ClusterResult).order_by(ClusterResult.created_at.desc()).limit(5).all()
         return {
-            "total_transactions": 0,
-            "total_customers": 0,
-            "date_range": {"start": None, "end": None},
-            "total_revenue": 0,
-            "avg_transaction_value": 0,
-            "missing_values": {}
+            "total_customers": db.query(Customer).count(),
+            "total_revenue": db.query(func.sum(Transaction.amount)).scalar() or 0,
+            "total_transactions": db.query(Transaction).count(),
+            "recent_runs": [{"id": r.id, "name": r.run_name, "date": r.created_at} for r in recent_runs]
         }
 
-    # Date Range
-    min_date = db.query(func.min(Transaction.transaction_date)).scalar()
-    max_date = db.query(func.max(Transaction.transaction_date)).scalar()
-    
-    # Revenue Stats
-    total_revenue = db.query(func.sum(Transaction.amount)).scalar() or 0
-    avg_transaction_value = total_revenue / total_transactions if total_transactions > 0 else 0
-    
-    # Check for missing values (simplified check on key columns)
-    missing_categories = db.query(Transaction).filter(Transaction.product_category == None).count()
-    
-    return {
-        "total_transactions": total_transactions,
-        "total_customers": total_customers,
-        "date_range": {"start": min_date, "end": max_date},
-        "total_revenue": total_revenue,
-        "avg_transaction_value": avg_transaction_value,
-        "missing_values": {
-            "product_category": missing_categories
-        }
-    }
+    return cached_json(request, db, "analytics-summary", build, extra=f"{run_count}.{latest_run or 0}")
 
-from app.services.clustering_service import get_customer_data
-import pandas as pd
-import numpy as np
+@router.get("/analytics/sales-over-time")
+def get_sales_over_time(granularity: str = "month", customers: bool = False, db: Session = Depends(get_db)):
+    # Read the pre-aggregated rollup: O(periods x categories) rows, exact totals on every backend
+    if granularity not in DATE_FORMATS:
+        raise HTTPException(status_code=400, detail=f"Unknown granularity: {granularity}")
+    if granularity not in ROLLUP_GRANULARITIES:
+        raise HTTPException(status_code=400, detail=f"The {granularity} rollup is not maintained")
+    ensure_sales_rollup(db)
+
+    trend = sales_trend(db, granularity)
+    if customers:
+        # HyperLogLog estimates; sketches of each category are merged per period
+        estimates = {period.strftime(DATE_FORMATS[granularity]): count for period, count in distinct_customers(db, granularity).items()}
+        for row in trend:
+            row["customers"] = estimates.get(row["date"], 0)
+    return trend
+
+@router.get("/analytics/data-quality")
+def get_data_quality_report(request: Request, db: Session = Depends(get_db)):
+    # Persisted profile snapshot; the single-pass scan only reruns (in the background) after the data
+    # version changes. Keyed by the snapshot too, so a stale response is replaced once the rebuild lands
+    snapshot = current_snapshot(db)
+    return cached_json(
+        request, db, "analytics-data-quality", lambda: snapshot_payload(db, snapshot),
+        extra=snapshot.data_version
+    )
+
+from app.services.histogram_service import HISTOGRAM_FEATURES, HISTOGRAM_SCALES, ensure_feature_store, feature_histogram
+
+@router.get("/analytics/histogram")
+def get_feature_histogram(
+    request: Request,
+    feature: str = "monetary",
+    bins: int = 10,
+    scale: str = "linear",
+    db: Session = Depends(get_db)
+):
+    if feature not in HISTOGRAM_FEATURES:
+        raise HTTPException(status_code=400, detail=f"Unknown feature: {feature}")
+    if scale not in HISTOGRAM_SCALES:
+        raise HTTPException(status_code=400, detail=f"Unknown scale: {scale}")
+
+    ensure_feature_store(db)
+    return cached_json(
+        request, db, f"analytics-histogram-{feature}-{bins}-{scale}",
+        lambda: {"feature": feature, "scale": scale, "bins": feature_histogram(db, feature, bins, scale)},
+        extra=recency_day()
+    )
 
 @router.get("/analytics/dashboard")
-def get_dashboard_metrics(db: Session = Depends(get_db)):
+def get_dashboard_metrics(request: Request, db: Session = Depends(get_db)):
     try:
-        # 1. Sales Over Time (Monthly) - OPTIMIZED with LIMIT
-        sales_data = []
-        try:
-            # Try database-native aggregation first (PostgreSQL)
-            sales = db.query(
-                func.date_trunc('month', Transaction.transaction_date).label('month'),
-                func.sum(Transaction.amount).label('total')
-            ).group_by('month').order_by('month').limit(24).all()  # Last 24 months max
-            sales_data = [{"date": r.month.strftime('%Y-%m') if r.month else 'Unknown', "amount": float(r.total or 0)} for r in sales]
-        except Exception:
-            # Fallback to Pandas for SQLite - SAMPLE ONLY 10K records
-            db.rollback()
-            # CRITICAL FIX: Limit to recent 10K transactions instead of ALL
-            sales = db.query(Transaction.transaction_date, Transaction.amount)\
-                      .order_by(Transaction.transaction_date.desc())\
-                      .limit(10000)\
-                      .all()
-            if sales:
-                df_sales = pd.DataFrame(sales, columns=['date', 'amount'])
-                df_sales['month'] = pd.to_datetime(df_sales['date']).dt.to_period('M')
-                monthly_sales = df_sales.groupby('month')['amount'].sum().reset_index()
-                monthly_sales['month'] = monthly_sales['month'].astype(str)
-                # Sort and keep last 24 months
-                monthly_sales = monthly_sales.tail(24)
-                sales_data = [{"date": r['month'], "amount": float(r['amount'])} for _, r in monthly_sales.iterrows()]
-
-
-        # 2. Category Share - LIMIT to top 10 categories
-        categories = db.query(
-            Transaction.product_category,
-            func.count(Transaction.id).label('count')
-        ).group_by(Transaction.product_category)\
-         .order_by(func.count(Transaction.id).desc())\
-         .limit(10)\
-         .all()
-        category_data = [{"name": r.product_category or "Uncategorized", "value": r.count} for r in categories]
-
-        # 3. RFM Distribution - OPTIMIZED: Use sampled data
-        rfm_distributions = {}
-        try:
-            # Pass limit parameter to avoid loading all customers
-            features_df, _ = get_customer_data(db, limit=5000)  # Sample 5K customers max
-            if features_df is not None and not features_df.empty:
-                for col in ['recency', 'frequency', 'monetary', 'length']:
-                    if col in features_df.columns:
-                        hist, bin_edges = np.histogram(features_df[col].dropna(), bins=10)
-                        rfm_distributions[col] = [
-                            {"range": f"{int(bin_edges[i])}-{int(bin_edges[i+1])}", "count": int(count)}
-                            for i, count in enumerate(hist) if count > 0  # Skip empty bins
-                        ]
-        except Exception as e:
-            print(f"RFM Distribution error: {e}")  # Log for debugging
-
-        # 4. KPI Cards - Fast COUNT queries
-        total_customers = db.query(Customer).count()
-        total_revenue = db.query(func.sum(Transaction.amount)).scalar() or 0
-        total_transactions = db.query(Transaction).count()
-        avg_order = float(total_revenue / total_transactions) if total_transactions > 0 else 0
-
-        return {
-            "kpi": {
-                "total_customers": total_customers,
-                "total_revenue": float(total_revenue),
-                "avg_order_value": avg_order
-            },
-            "sales_trend": sales_data,
-            "category_share": category_data,
-            "rfm_dist": rfm_distributions
-        }
+        # One-time backfills run before the data version is read
+        ensure_sales_rollup(db)
+        ensure_feature_store(db)
+        return cached_json(request, db, "analytics-dashboard", lambda: _dashboard_metrics(db), extra=recency_day())
     except Exception as e:
         print(f"Dashboard error: {e}")
         import traceback
         traceback.print_exc()  # Full error for debugging
-        # Return safe defaults
+        # Return safe defaults (never cached)
         return {
             "kpi": {
                 "total_customers": 0,
@@ -183,5 +107,36 @@ def get_dashboard_metrics(db: Session = Depends(get_db)):
             "rfm_dist": {}
         }
 
+def _dashboard_metrics(db: Session):
+    # 1. Sales Over Time (Monthly) - last 24 months from the sales rollup
+    sales_data = [{"date": r["date"], "amount": r["amount"]} for r in sales_trend(db, "month", limit=24)]
+
+    # 2. Category Share - top 10 categories
+    category_data = category_share(db, limit=10)
 
+    # 3. RFM Distribution - binned in SQL over every customer in the feature store
+    rfm_distributions = {}
+    try:
+        for col in ['recency', 'frequency', 'monetary', 'length']:
+            histogram = feature_histogram(db, col, bins=10, skip_empty=True)  # Skip empty bins
+            if histogram:
+                rfm_distributions[col] = [{"range": h["range"], "count": h["count"]} for h in histogram]
+    except Exception as e:
+        db.rollback()
+        print(f"RFM Distribution error: {e}")  # Log for debugging
 
+    # 4. KPI Cards - Fast COUNT queries
+    total_customers = db.query(Customer).count()
+    total_revenue, total_transactions = sales_totals(db)
+    avg_order = float(total_revenue / total_transactions) if total_transactions > 0 else 0
+
+    return {
+        "kpi": {
+            "total_customers": total_customers,
+            "total_revenue": float(total_revenue),
+            "avg_order_value": avg_order
+        },
+        "sales_trend": sales_data,
+        "category_share": category_data,
+        "rfm_dist": rfm_distributions
+    }
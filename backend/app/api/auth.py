@@ -1,17 +1,35 @@
 from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.concurrency import run_in_threadpool
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from sqlalchemy.orm import Session
+from app.core.cache import TTLCache
 from app.core.database import get_db
 from app.models.user import User
-from app.core.security import verify_password, get_password_hash, create_access_token, ALGORITHM, SECRET_KEY
+from app.core.security import get_password_hash, create_access_token, decode_access_token, verify_password_async
 from pydantic import BaseModel
-from jose import JWTError, jwt
+from jose import JWTError
 from datetime import timedelta
+import os
 
 router = APIRouter()
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/v1/auth/token")
 
+# Verified users keyed by (email, token id). The TTL also bounds how long a change
+# made by another worker (or scripts/seed_users.py) can go unnoticed here.
+AUTH_USER_CACHE_TTL = float(os.getenv("AUTH_USER_CACHE_TTL", 60))
+AUTH_USER_CACHE_SIZE = int(os.getenv("AUTH_USER_CACHE_SIZE", 1024))
+user_cache = TTLCache(AUTH_USER_CACHE_SIZE, AUTH_USER_CACHE_TTL)
+
+# Cached columns (never the password hash)
+USER_FIELDS = ("id", "email", "full_name", "role", "is_active")
+
+def invalidate_user(email: str):
+    user_cache.invalidate(lambda key: key[0] == email)
+
+def _find_user(db: Session, email: str):
+    return db.query(User).filter(User.email == email).first()
+
 class UserCreate(BaseModel):
     email: str
     password: str
@@ -55,9 +73,10 @@ def register(user: UserCreate, db: Session = Depends(get_db)):
     return new_user
 
 @router.post("/token", response_model=Token)
-def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
-    user = db.query(User).filter(User.email == form_data.username).first()
-    if not user or not verify_password(form_data.password, user.hashed_password):
+async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
+    # Database lookup and bcrypt both run off the event loop
+    user = await run_in_threadpool(_find_user, db, form_data.username)
+    if not user or not await verify_password_async(form_data.password, user.hashed_password):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password",
@@ -77,17 +96,23 @@ async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = De
         headers={"WWW-Authenticate": "Bearer"},
     )
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        payload = decode_access_token(token)
         email: str = payload.get("sub")
         if email is None:
             raise credentials_exception
     except JWTError:
         raise credentials_exception
-        
-    user = db.query(User).filter(User.email == email).first()
-    if user is None:
-        raise credentials_exception
-    return user
+
+    key = (email, payload.get("jti"))
+    fields = user_cache.get(key)
+    if fields is None:
+        user = await run_in_threadpool(_find_user, db, email)
+        if user is None:
+            raise credentials_exception
+        fields = {f: getattr(user, f) for f in USER_FIELDS}
+        user_cache.set(key, fields)
+    # Detached copy for reading; writes re-load the row through their own session
+    return User(**fields)
 
 @router.get("/me", response_model=UserResponse)
 def read_users_me(current_user: User = Depends(get_current_user)):
@@ -95,23 +120,46 @@ def read_users_me(current_user: User = Depends(get_current_user)):
 
 @router.put("/me", response_model=UserResponse)
 def update_user_me(user_update: UserUpdate, current_user: User = Depends(get_current_user), db: Session = Depends(get_db)):
-    current_user.full_name = user_update.full_name
+    user = db.query(User).filter(User.id == current_user.id).first()
+    if user is None:
+        raise HTTPException(status_code=404, detail="User not found")
+    user.full_name = user_update.full_name
     if user_update.password:
-        current_user.hashed_password = get_password_hash(user_update.password)
+        user.hashed_password = get_password_hash(user_update.password)
     
-    db.add(current_user)
     db.commit()
-    db.refresh(current_user)
-    return current_user
+    db.refresh(user)
+    invalidate_user(user.email)
+    return user
 
 class RoleChecker:
     def __init__(self, allowed_roles: list[str]):
         self.allowed_roles = allowed_roles
 
-    def __call__(self, user: User = Depends(get_current_user)):
+    async def __call__(self, user: User = Depends(get_current_user)):
         if user.role not in self.allowed_roles:
             raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN, 
                 detail=f"Operation not permitted. Required roles: {self.allowed_roles}"
             )
         return user
+
+class RoleUpdate(BaseModel):
+    role: str
+
+@router.put("/users/{user_id}/role", response_model=UserResponse)
+def update_user_role(
+    user_id: int,
+    role_update: RoleUpdate,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(RoleChecker(["admin"]))
+):
+    user = db.query(User).filter(User.id == user_id).first()
+    if user is None:
+        raise HTTPException(status_code=404, detail="User not found")
+    user.role = role_update.role
+    db.commit()
+    db.refresh(user)
+    # Takes effect on the user's next request, not after the cache TTL
+    invalidate_user(user.email)
+    return user
@@ -1,9 +1,14 @@
 from fastapi import APIRouter, Depends, HTTPException, Body
+from fastapi.encoders import jsonable_encoder
 from sqlalchemy.orm import Session
 from app.core.database import get_db
-from app.services.clustering_service import run_clustering
+from app.models.models import ClusteringJob
+from app.services.job_service import submit_clustering_job, cancel_job, job_to_dict
+from app.services.clustering_service import validate_fit_sample_size
+from app.services.sweep_service import expand_grid
+from app.services.model_registry import score
 from pydantic import BaseModel
-from typing import Dict, Any
+from typing import Dict, Any, List
 
 router = APIRouter()
 
@@ -17,6 +22,8 @@ class ClusteringRequest(BaseModel):
     start_date: Optional[date] = None
     end_date: Optional[date] = None
     save_result: bool = True
+    # Fit on a stratified sample of this many customers, then assign everyone else
+    fit_sample_size: Optional[int] = None
 
 from app.api.auth import RoleChecker
 
@@ -26,18 +33,98 @@ def trigger_clustering(
     db: Session = Depends(get_db),
     current_user: dict = Depends(RoleChecker(["admin", "staff"]))
 ):
+    # Runs execute in a bounded process pool; poll GET /jobs/{job_id} for the result
     try:
-        result = run_clustering(
-            request.algorithm, 
-            request.params, 
-            db, 
-            request.run_name,
-            start_date=request.start_date,
-            end_date=request.end_date,
-            save_result=request.save_result
+        validate_fit_sample_size(request.fit_sample_size, request.params)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    try:
+        job = submit_clustering_job(
+            db,
+            jsonable_encoder(request),
+            created_by=getattr(current_user, "email", None)
         )
-        return result
+        return {"job_id": job.id, "status": job.status}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/jobs/{job_id}")
+def get_job(
+    job_id: str,
+    db: Session = Depends(get_db),
+    current_user: dict = Depends(RoleChecker(["admin", "staff"]))
+):
+    job = db.get(ClusteringJob, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job_to_dict(job)
+
+@router.post("/jobs/{job_id}/cancel")
+def cancel_clustering_job(
+    job_id: str,
+    db: Session = Depends(get_db),
+    current_user: dict = Depends(RoleChecker(["admin", "staff"]))
+):
+    job = cancel_job(db, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job_to_dict(job)
+
+class SweepConfig(BaseModel):
+    algorithm: str
+    # A list value is a grid axis, e.g. {"n_clusters": [2, 3, 4, 5]}
+    params: Dict[str, Any] = {}
+
+class SweepRequest(BaseModel):
+    grid: List[SweepConfig]
+    start_date: Optional[date] = None
+    end_date: Optional[date] = None
+    max_workers: Optional[int] = None
+    save_best: bool = False
+    run_name: Optional[str] = None
+
+@router.post("/clustering/sweep")
+def sweep_clustering(
+    request: SweepRequest,
+    db: Session = Depends(get_db),
+    current_user: dict = Depends(RoleChecker(["admin", "staff"]))
+):
+    # Sweeps are background jobs like /run: poll GET /jobs/{job_id}, cancel with POST /jobs/{job_id}/cancel
+    try:
+        configs = expand_grid([c.model_dump() for c in request.grid])
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
+    if not configs:
+        raise HTTPException(status_code=400, detail="Empty parameter grid")
+
+    try:
+        job = submit_clustering_job(
+            db,
+            {**jsonable_encoder(request), "kind": "sweep"},
+            created_by=getattr(current_user, "email", None)
+        )
+        return {"job_id": job.id, "status": job.status, "n_configs": len(configs)}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+
+class AssignRequest(BaseModel):
+    # Existing customers, scored from their stored RLFM features ...
+    customer_codes: Optional[List[str]] = None
+    # ... and/or raw feature rows: lists in the run's feature order or {feature: value} objects
+    vectors: Optional[List[Any]] = None
+
+@router.post("/clustering/{run_id}/assign")
+def assign_to_clusters(
+    run_id: int,
+    request: AssignRequest,
+    db: Session = Depends(get_db),
+    current_user: dict = Depends(RoleChecker(["admin", "staff"]))
+):
+    # Uses the run's saved scaler and estimator; nothing is refitted
+    try:
+        return score(db, run_id, request.customer_codes, request.vectors)
+    except LookupError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
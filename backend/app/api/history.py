@@ -1,10 +1,15 @@
 from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy import func
 from sqlalchemy.orm import Session
 from typing import List, Optional
 from pydantic import BaseModel
 from datetime import datetime
 from app.core.database import get_db
-from app.models.models import ClusterResult, CustomerCluster
+from app.core.pagination import MAX_PAGE_SIZE, before_cursor, encode_cursor
+from app.models.models import ClusterResult, CustomerCluster, ClusteringJob, ClusterProfile, SegmentTransition
+from app.services.job_service import job_to_dict, ACTIVE_STATUSES
+from app.services.model_registry import delete_model, load_model
+from app.services.segment_service import activate_run
 
 router = APIRouter()
 
@@ -15,33 +20,88 @@ class HistoryItem(BaseModel):
     created_at: datetime
     parameters: Optional[dict] = None
     customer_count: int
+    cluster_sizes: Optional[dict] = None
+    fit_seconds: Optional[float] = None
+    feature_means: Optional[dict] = None
+    is_active: bool = False
 
     class Config:
         orm_mode = True
 
-@router.get("/", response_model=List[HistoryItem])
-def get_history(db: Session = Depends(get_db)):
-    # Fetch runs
-    runs = db.query(ClusterResult).order_by(ClusterResult.created_at.desc()).all()
-    
-    # Calculate customer counts effectively
-    # (In a real app, maybe store this count in ClusterResult table to avoid counting every time)
-    results = []
-    for run in runs:
-        count = db.query(CustomerCluster).filter(CustomerCluster.cluster_result_id == run.id).count()
-        results.append({
+class HistoryPage(BaseModel):
+    items: List[HistoryItem]
+    next_cursor: Optional[str] = None
+
+@router.get("/", response_model=HistoryPage)
+def get_history(
+    limit: int = 50,
+    cursor: Optional[str] = None,
+    algorithm: Optional[str] = None,
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+    db: Session = Depends(get_db)
+):
+    # Keyset pagination on (created_at, id): each page is an index range scan, not OFFSET
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    query = db.query(ClusterResult)
+    if algorithm:
+        query = query.filter(ClusterResult.algorithm == algorithm)
+    if start_date:
+        query = query.filter(ClusterResult.created_at >= start_date)
+    if end_date:
+        query = query.filter(ClusterResult.created_at <= end_date)
+    if cursor:
+        query = query.filter(before_cursor(ClusterResult.created_at, ClusterResult.id, cursor))
+
+    runs = query.order_by(ClusterResult.created_at.desc(), ClusterResult.id.desc()).limit(limit + 1).all()
+    has_more = len(runs) > limit
+    runs = runs[:limit]
+
+    # Runs saved before the stored statistics existed: one grouped count for the page
+    legacy = [run.id for run in runs if run.customer_count is None]
+    legacy_counts = {}
+    if legacy:
+        legacy_counts = dict(
+            db.query(CustomerCluster.cluster_result_id, func.count(CustomerCluster.id))
+            .filter(CustomerCluster.cluster_result_id.in_(legacy))
+            .group_by(CustomerCluster.cluster_result_id)
+            .all()
+        )
+
+    items = [
+        {
             "id": run.id,
             "run_name": run.run_name,
             "algorithm": run.algorithm,
             "created_at": run.created_at,
             "parameters": run.parameters,
-            "customer_count": count
-        })
-    
-    return results
+            "customer_count": run.customer_count if run.customer_count is not None else legacy_counts.get(run.id, 0),
+            "cluster_sizes": run.cluster_sizes,
+            "fit_seconds": run.fit_seconds,
+            "feature_means": run.feature_means,
+            "is_active": bool(run.is_active)
+        }
+        for run in runs
+    ]
+    return {"items": items, "next_cursor": encode_cursor(runs[-1].created_at, runs[-1].id) if has_more else None}
 
 from app.api.auth import RoleChecker
 
+@router.get("/jobs")
+def get_jobs(
+    active_only: bool = True,
+    limit: int = 50,
+    db: Session = Depends(get_db),
+    current_user: dict = Depends(RoleChecker(["admin", "staff"]))
+):
+    # Queued and running clustering jobs (or the latest jobs of any status)
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    query = db.query(ClusteringJob)
+    if active_only:
+        query = query.filter(ClusteringJob.status.in_(ACTIVE_STATUSES))
+    jobs = query.order_by(ClusteringJob.created_at.desc()).limit(limit).all()
+    return [job_to_dict(job) for job in jobs]
+
 @router.delete("/{run_id}")
 def delete_run(
     run_id: int, 
@@ -56,7 +116,30 @@ def delete_run(
     # Assuming standard delete works if no strict constraints or if cascade is set.
     # If not, we might need to delete customer_clusters first.
     db.query(CustomerCluster).filter(CustomerCluster.cluster_result_id == run_id).delete()
+    db.query(ClusterProfile).filter(ClusterProfile.cluster_result_id == run_id).delete()
+    db.query(SegmentTransition).filter(SegmentTransition.cluster_result_id == run_id).delete()
+    # Jobs keep their history; only the link to the deleted run goes
+    db.query(ClusteringJob).filter(ClusteringJob.cluster_result_id == run_id)\
+        .update({ClusteringJob.cluster_result_id: None}, synchronize_session=False)
     db.delete(run)
     db.commit()
+    delete_model(run_id)
     
     return {"message": "Run deleted successfully"}
+
+@router.post("/{run_id}/activate")
+def activate(
+    run_id: int,
+    db: Session = Depends(get_db),
+    current_user: dict = Depends(RoleChecker(["admin"]))
+):
+    # New transactions are scored against this run when SEGMENT_ASSIGN_ON_INGEST=1
+    try:
+        activate_run(db, run_id)
+    except LookupError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    if load_model(run_id) is None:
+        db.rollback()
+        raise HTTPException(status_code=400, detail="Run has no saved model; re-run clustering to activate it")
+    db.commit()
+    return {"message": "Run activated", "run_id": run_id}
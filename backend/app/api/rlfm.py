@@ -3,6 +3,7 @@ from sqlalchemy.orm import Session
 from app.core.database import get_db
 from app.services.clustering_service import calculate_and_save_rlfm
 from app.models.models import CustomerRLFM, Customer
+from app.services.export_service import RLFM_COLUMNS, check_format, iter_frames, rlfm_features_query, stream_export
 
 router = APIRouter()
 
@@ -33,3 +34,12 @@ def get_rlfm_data(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)
         })
         
     return {"total": total, "data": data}
+
+@router.get("/export")
+def export_rlfm_data(format: str = "csv", db: Session = Depends(get_db)):
+    """Every customer's RLFM features streamed as csv, ndjson, parquet or arrow"""
+    try:
+        check_format(format)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return stream_export(iter_frames(rlfm_features_query(db), RLFM_COLUMNS), format, "rlfm_features")
@@ -3,6 +3,8 @@ from sqlalchemy.orm import Session
 from app.core.database import get_db
 from app.services.strategy_service import generate_strategies
 from app.models.models import ClusterResult
+from app.services.export_service import MEMBER_COLUMNS, check_format, cluster_members_query, iter_frames, stream_export
+from typing import Optional
 
 router = APIRouter()
 
@@ -45,3 +47,16 @@ def get_cluster_customers(run_id: int, cluster_label: int, db: Session = Depends
         }
         for c in customers
     ]
+
+@router.get("/strategy/{run_id}/customers/export")
+def export_cluster_customers(run_id: int, cluster_label: Optional[int] = None, format: str = "csv", db: Session = Depends(get_db)):
+    """Members of a run (or one of its clusters) with total spend, streamed for campaign tooling"""
+    try:
+        check_format(format)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if db.query(ClusterResult.id).filter(ClusterResult.id == run_id).first() is None:
+        raise HTTPException(status_code=404, detail="Run not found")
+
+    filename = f"run_{run_id}" + (f"_cluster_{cluster_label}" if cluster_label is not None else "")
+    return stream_export(iter_frames(cluster_members_query(db, run_id, cluster_label), MEMBER_COLUMNS), format, filename)
@@ -1,10 +1,16 @@
 from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy import text
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 from pydantic import BaseModel
 from datetime import datetime
-from typing import Optional
+from typing import List, Optional
 from app.core.database import get_db
+from app.core.pagination import MAX_PAGE_SIZE, before_cursor, encode_cursor
 from app.models.models import Customer, Transaction
+from app.services.rollup_service import ensure_sales_rollup, sales_totals
+from app.services.transaction_service import TRANSACTION_BATCH_MAX, record_transactions
+import json
 
 router = APIRouter()
 
@@ -14,54 +20,124 @@ class TransactionCreate(BaseModel):
     transaction_date: datetime
     amount: float
     product_category: Optional[str] = None
+    transaction_code: Optional[str] = None
+    # Retries with the same key are recorded once
+    idempotency_key: Optional[str] = None
+
+class TransactionBatch(BaseModel):
+    items: List[TransactionCreate]
+
+def _record(db: Session, items: list) -> list:
+    # A concurrent request may insert the same idempotency key between our lookup and
+    # insert; the unique index rejects it and the retry reports it as a duplicate.
+    for attempt in range(2):
+        try:
+            results = record_transactions(db, items)
+            db.commit()
+            return results
+        except IntegrityError:
+            db.rollback()
+            if attempt:
+                raise HTTPException(status_code=409, detail="Conflicting concurrent writes, please retry")
 
 @router.post("/")
 def create_transaction(transaction: TransactionCreate, db: Session = Depends(get_db)):
-    # 1. Check or Create Customer
-    customer = db.query(Customer).filter(Customer.customer_code == transaction.customer_code).first()
-    if not customer:
-        customer = Customer(
-            customer_code=transaction.customer_code,
-            name=transaction.customer_name
-        )
-        db.add(customer)
-        db.commit()
-        db.refresh(customer)
-    
-    # 2. Create Transaction
-    new_transaction = Transaction(
-        customer_id=customer.id,
-        transaction_code=f"MANUAL-{int(datetime.utcnow().timestamp())}", # Simple ID generation
-        transaction_date=transaction.transaction_date,
-        amount=transaction.amount,
-        product_category=transaction.product_category
-    )
-    
-    db.add(new_transaction)
-    db.commit()
-    db.refresh(new_transaction)
-    
+    # Same path as the batch endpoint: customer upsert, insert and derived tables in one commit
+    result = _record(db, [transaction.model_dump()])[0]
     return {
-        "message": "Transaction created successfully",
-        "transaction_id": new_transaction.id,
-        "customer": customer.customer_code
+        "message": "Transaction created successfully" if result["status"] == "created" else "Transaction already recorded",
+        "transaction_id": result["transaction_id"],
+        "customer": transaction.customer_code
     }
 
+@router.post("/batch")
+def create_transactions_batch(batch: TransactionBatch, db: Session = Depends(get_db)):
+    if not batch.items:
+        raise HTTPException(status_code=400, detail="No transactions supplied")
+    if len(batch.items) > TRANSACTION_BATCH_MAX:
+        raise HTTPException(status_code=413, detail=f"At most {TRANSACTION_BATCH_MAX} transactions per batch")
+
+    results = _record(db, [item.model_dump() for item in batch.items])
+    created = sum(1 for r in results if r["status"] == "created")
+    return {
+        "created": created,
+        "duplicates": len(results) - created,
+        "results": results
+    }
+
+def _estimated_count(db: Session, query) -> int:
+    # Planner estimate (pg_class statistics) instead of scanning every matching row
+    # Filter values stay bound parameters, never SQL text
+    compiled = query.statement.compile(dialect=db.get_bind().dialect)
+    plan = db.connection().exec_driver_sql("EXPLAIN (FORMAT JSON) " + str(compiled), compiled.params).scalar()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]["Plan"]["Plan Rows"])
+
+def _transaction_total(db: Session, query, filtered: bool):
+    """(total, is_estimate) without a full COUNT(*) where statistics are available"""
+    if db.get_bind().dialect.name == "postgresql":
+        return _estimated_count(db, query), True
+    if not filtered:
+        # Exact and O(months x categories): the sales rollup counts every transaction
+        ensure_sales_rollup(db)
+        return sales_totals(db)[1], False
+    # Filters are served by the composite indexes
+    return query.order_by(None).count(), False
+
 @router.get("/")
 def get_transactions(
-    skip: int = 0, 
-    limit: int = 50, 
+    limit: int = 50,
+    cursor: Optional[str] = None,
+    customer_code: Optional[str] = None,
+    category: Optional[str] = None,
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+    include_total: bool = False,
     db: Session = Depends(get_db)
 ):
-    total = db.query(Transaction).count()
-    transactions = db.query(Transaction)\
-        .order_by(Transaction.transaction_date.desc())\
-        .offset(skip)\
-        .limit(limit)\
-        .all()
-    
+    # Keyset pagination on (transaction_date, id), newest first; customer_code comes from the join.
+    # Undated rows have no cursor position (and are not in the rollup totals), so they are not listed
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    query = db.query(
+        Transaction.id,
+        Transaction.transaction_code,
+        Transaction.transaction_date,
+        Transaction.amount,
+        Transaction.product_category,
+        Customer.customer_code
+    ).outerjoin(Customer, Customer.id == Transaction.customer_id)\
+     .filter(Transaction.transaction_date.isnot(None))
+
+    if customer_code:
+        # Resolved through the unique customer_code index so the filter hits (customer_id, date, id)
+        customer_id = db.query(Customer.id).filter(Customer.customer_code == customer_code).scalar()
+        if customer_id is None:
+            return {"total": 0 if include_total else None, "total_is_estimate": False if include_total else None, "next_cursor": None, "items": []}
+        query = query.filter(Transaction.customer_id == customer_id)
+    if category:
+        query = query.filter(Transaction.product_category == category)
+    if start_date:
+        query = query.filter(Transaction.transaction_date >= start_date)
+    if end_date:
+        query = query.filter(Transaction.transaction_date <= end_date)
+    filtered = any([customer_code, category, start_date, end_date])
+
+    total = is_estimate = None
+    if include_total:
+        total, is_estimate = _transaction_total(db, query, filtered)
+
+    if cursor:
+        query = query.filter(before_cursor(Transaction.transaction_date, Transaction.id, cursor))
+
+    rows = query.order_by(Transaction.transaction_date.desc(), Transaction.id.desc()).limit(limit + 1).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
     return {
         "total": total,
+        "total_is_estimate": is_estimate,
+        "next_cursor": encode_cursor(rows[-1].transaction_date, rows[-1].id) if has_more else None,
         "items": [
             {
                 "id": t.id,
@@ -69,8 +145,8 @@ def get_transactions(
                 "date": t.transaction_date,
                 "amount": t.amount,
                 "category": t.product_category,
-                "customer_code": t.customer.customer_code if t.customer else "N/A"
+                "customer_code": t.customer_code or "N/A"
             }
-            for t in transactions
+            for t in rows
         ]
     }
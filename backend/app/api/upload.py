@@ -1,13 +1,25 @@
 from fastapi import APIRouter, UploadFile, File, Depends, HTTPException
 from sqlalchemy.orm import Session
 from app.core.database import get_db
-from app.services.data_service import process_upload_file, preview_upload_file
+from app.services.data_service import process_upload_stream
+from app.services.preview_service import preview_upload
+from app.services.upload_session_service import (
+    UploadStorageFull, discard_upload_session, finish_upload_session, get_upload_session,
+    open_upload_session, process_upload_session
+)
+from pydantic import BaseModel
+from starlette.concurrency import run_in_threadpool
+import os
+import tempfile
 
 router = APIRouter()
 
 from fastapi import Form, Body
 import json
 
+# Bytes read from the request per await while spooling to disk
+SPOOL_BLOCK_SIZE = 1024 * 1024
+
 from app.api.auth import RoleChecker
 
 @router.post("/upload/preview")
@@ -16,9 +28,8 @@ async def preview_file(
     current_user: dict = Depends(RoleChecker(["admin", "retail_system"]))
 ):
     try:
-        contents = await file.read()
-        result = preview_upload_file(contents, file.filename)
-        return result
+        # Parsed straight from the spooled upload; only its first rows/bytes are read
+        return await run_in_threadpool(preview_upload, file.file, file.filename)
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
@@ -29,10 +40,103 @@ async def process_file(
     db: Session = Depends(get_db),
     current_user: dict = Depends(RoleChecker(["admin", "retail_system"]))
 ):
+    # Spool the upload to disk and ingest it chunk by chunk so a large file
+    # never has to fit in the worker's memory.
+    suffix = os.path.splitext(file.filename or "")[1]
+    tmp = tempfile.NamedTemporaryFile(delete=False, suffix=suffix)
     try:
-        contents = await file.read()
+        with tmp:
+            while True:
+                block = await file.read(SPOOL_BLOCK_SIZE)
+                if not block:
+                    break
+                tmp.write(block)
+
         mapping_dict = json.loads(mapping)
-        count = process_upload_file(contents, file.filename, db, mapping_dict)
-        return {"message": f"Successfully processed {count} transactions", "filename": file.filename}
+        stats = await run_in_threadpool(process_upload_stream, tmp.name, file.filename, db, mapping_dict)
+        return {
+            "message": f"Successfully processed {stats['count']} transactions",
+            "filename": file.filename,
+            **stats
+        }
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
+    finally:
+        os.remove(tmp.name)
+
+
+class UploadSessionProcess(BaseModel):
+    mapping: dict = {}
+
+
+@router.post("/upload/sessions")
+async def create_upload_session(
+    file: UploadFile = File(...),
+    current_user: dict = Depends(RoleChecker(["admin", "retail_system"]))
+):
+    # Sent and parsed once: returns the preview plus a session id to process with a mapping
+    try:
+        session_id, path, budget = open_upload_session(file.filename or "")
+    except UploadStorageFull as e:
+        raise HTTPException(status_code=507, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    try:
+        written = 0
+        with open(path, "wb") as out:
+            while True:
+                block = await file.read(SPOOL_BLOCK_SIZE)
+                if not block:
+                    break
+                written += len(block)
+                if written > budget:
+                    raise UploadStorageFull("Upload storage is full; try again when older sessions expire")
+                out.write(block)
+        return await run_in_threadpool(finish_upload_session, session_id, file.filename, budget)
+    except UploadStorageFull as e:
+        discard_upload_session(session_id)
+        raise HTTPException(status_code=507, detail=str(e))
+    except Exception as e:
+        discard_upload_session(session_id)
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.get("/upload/sessions/{session_id}")
+def read_upload_session(
+    session_id: str,
+    current_user: dict = Depends(RoleChecker(["admin", "retail_system"]))
+):
+    try:
+        return get_upload_session(session_id)
+    except LookupError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+
+@router.post("/upload/sessions/{session_id}/process")
+async def process_session(
+    session_id: str,
+    body: UploadSessionProcess,
+    db: Session = Depends(get_db),
+    current_user: dict = Depends(RoleChecker(["admin", "retail_system"]))
+):
+    try:
+        stats = await run_in_threadpool(process_upload_session, db, session_id, body.mapping)
+    except LookupError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"message": f"Successfully processed {stats['count']} transactions", **stats}
+
+
+@router.delete("/upload/sessions/{session_id}")
+def delete_upload_session(
+    session_id: str,
+    current_user: dict = Depends(RoleChecker(["admin", "retail_system"]))
+):
+    try:
+        get_upload_session(session_id)
+    except LookupError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    discard_upload_session(session_id)
+    return {"message": "Upload session deleted"}
@@ -0,0 +1,195 @@
+import hashlib
+import json
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from datetime import datetime
+from fastapi import Request, Response
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from app.models.models import DataVersion
+
+# In-process tier: bounded by entry count and by total payload bytes
+CACHE_MAX_ENTRIES = int(os.getenv("ANALYTICS_CACHE_MAX_ENTRIES", 128))
+CACHE_MAX_BYTES = int(os.getenv("ANALYTICS_CACHE_MAX_BYTES", 16 * 1024 * 1024))
+
+# Optional shared tier for multiple uvicorn workers (unset = memory only)
+CACHE_DIR = os.getenv("ANALYTICS_CACHE_DIR")
+
+
+def bump_data_version(db: Session):
+    """Mark the data as changed; call before the commit of the write it describes"""
+    updated = db.query(DataVersion).filter(DataVersion.id == 1).update(
+        {DataVersion.version: DataVersion.version + 1, DataVersion.updated_at: datetime.utcnow()},
+        synchronize_session=False
+    )
+    if not updated:
+        db.add(DataVersion(id=1, version=1, token=uuid.uuid4().hex, updated_at=datetime.utcnow()))
+        db.flush()
+
+
+def get_data_version(db: Session) -> str:
+    row = db.query(DataVersion.token, DataVersion.version).filter(DataVersion.id == 1).first()
+    if row is None:
+        try:
+            bump_data_version(db)
+            db.commit()
+        except IntegrityError:
+            # Another worker created the row first
+            db.rollback()
+        row = db.query(DataVersion.token, DataVersion.version).filter(DataVersion.id == 1).one()
+    return f"{row.token}-{row.version}"
+
+
+class ResponseCache:
+    """LRU of serialized payloads keyed by (name, data version), with an optional disk tier."""
+
+    def __init__(self, max_entries: int = CACHE_MAX_ENTRIES, max_bytes: int = CACHE_MAX_BYTES, directory: str = CACHE_DIR):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.directory = directory
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def _path(self, name: str, version: str) -> str:
+        digest = hashlib.sha1(name.encode()).hexdigest()[:16]
+        return os.path.join(self.directory, f"{digest}.{version}.json")
+
+    def get(self, name: str, version: str):
+        key = (name, version)
+        with self._lock:
+            body = self._entries.get(key)
+            if body is not None:
+                self._entries.move_to_end(key)
+                return body
+
+        if self.directory:
+            try:
+                with open(self._path(name, version), "rb") as f:
+                    body = f.read()
+            except OSError:
+                return None
+            self._remember(key, body)
+            return body
+        return None
+
+    def set(self, name: str, version: str, body: bytes):
+        self._remember((name, version), body)
+        if self.directory:
+            self._write_file(name, version, body)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def _remember(self, key, body: bytes):
+        if len(body) > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._bytes -= len(previous)
+            self._entries[key] = body
+            self._bytes += len(body)
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= len(evicted)
+
+    def _write_file(self, name: str, version: str, body: bytes):
+        path = self._path(name, version)
+        # Write-then-rename so other workers never read a partial file
+        tmp = f"{path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp, "wb") as f:
+                f.write(body)
+            os.replace(tmp, path)
+        except OSError:
+            return
+
+        # Older versions of the same payload can never be served again
+        prefix = os.path.basename(path).split(".")[0] + "."
+        for entry in os.listdir(self.directory):
+            if entry.startswith(prefix) and entry.endswith(".json") and os.path.join(self.directory, entry) != path:
+                try:
+                    os.remove(os.path.join(self.directory, entry))
+                except OSError:
+                    pass
+
+
+response_cache = ResponseCache()
+
+
+class TTLCache:
+    """Small thread-safe LRU whose entries also expire after ttl seconds (ttl <= 0 disables it)."""
+
+    def __init__(self, max_entries: int, ttl: float):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires, value = entry
+            if expires < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        if self.ttl <= 0:
+            return
+        with self._lock:
+            self._entries.pop(key, None)
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, match):
+        """Drop every entry whose key satisfies match(key)"""
+        with self._lock:
+            for key in [k for k in self._entries if match(k)]:
+                del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+def _etag_matches(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    candidates = [value.strip() for value in header.split(",")]
+    return "*" in candidates or etag in candidates or f"W/{etag}" in candidates
+
+
+def cached_json(request: Request, db: Session, name: str, build, extra: str = None) -> Response:
+    """Serve build() from the cache for the current data version, honouring If-None-Match.
+
+    extra is folded into the version for payloads that also depend on non-data state.
+    """
+    version = get_data_version(db)
+    if extra:
+        version = f"{version}-{extra}"
+    etag = f'"{name}-{version}"'
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if _etag_matches(request, etag):
+        return Response(status_code=304, headers=headers)
+
+    body = response_cache.get(name, version)
+    if body is None:
+        body = json.dumps(jsonable_encoder(build())).encode()
+        response_cache.set(name, version, body)
+    return Response(content=body, media_type="application/json", headers=headers)
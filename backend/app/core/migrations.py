@@ -0,0 +1,216 @@
+import re
+from datetime import datetime
+from sqlalchemy import Column, DateTime, Integer, MetaData, String, Table, bindparam, func, inspect, select, text, update
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.exc import IntegrityError
+
+# create_all never alters existing tables, so column/index changes to them are
+# recorded here as numbered steps. Each step is idempotent (a fresh database
+# created from the models already has everything) and is applied at most once.
+
+metadata = MetaData()
+
+schema_migrations = Table(
+    "schema_migrations",
+    metadata,
+    Column("version", Integer, primary_key=True),
+    Column("name", String),
+    Column("applied_at", DateTime)
+)
+
+
+def _columns(conn: Connection, table: str) -> set:
+    return {c["name"] for c in inspect(conn).get_columns(table)}
+
+
+def add_column(conn: Connection, table: str, name: str, sql_type: str):
+    if name not in _columns(conn, table):
+        conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {name} {sql_type}"))
+
+
+def create_index(conn: Connection, name: str, table: str, columns: list, unique: bool = False):
+    # Spelled out rather than taken from the models so a step never changes after release
+    conn.execute(text(
+        f"CREATE {'UNIQUE ' if unique else ''}INDEX IF NOT EXISTS {name} ON {table} ({', '.join(columns)})"
+    ))
+
+
+def _users_role(conn: Connection):
+    add_column(conn, "users", "role", "VARCHAR DEFAULT 'staff'")
+
+
+def _customer_rlfm_feature_store(conn: Connection):
+    # Derived data only: recreate with the running-aggregate columns, the store backfills on demand
+    if "transaction_count" not in _columns(conn, "customer_rlfm"):
+        from app.models.models import CustomerRLFM
+        CustomerRLFM.__table__.drop(bind=conn)
+        CustomerRLFM.__table__.create(bind=conn)
+
+
+def _cluster_result_stats(conn: Connection):
+    from app.models.models import ClusterResult, CustomerCluster
+    for name, sql_type in [
+        ("customer_count", "INTEGER"),
+        ("cluster_sizes", "JSON"),
+        ("fit_seconds", "FLOAT"),
+        ("feature_means", "JSON"),
+        ("feature_quantiles", "JSON")
+    ]:
+        add_column(conn, "cluster_results", name, sql_type)
+    create_index(conn, "ix_cluster_results_created_at", "cluster_results", ["created_at"])
+
+    # Sizes for runs saved before the columns existed (one grouped scan)
+    sizes = {}
+    rows = conn.execute(
+        select(CustomerCluster.cluster_result_id, CustomerCluster.cluster_label, func.count(CustomerCluster.id))
+        .group_by(CustomerCluster.cluster_result_id, CustomerCluster.cluster_label)
+    )
+    for run_id, label, count in rows:
+        sizes.setdefault(run_id, {})[int(label)] = int(count)
+
+    table = ClusterResult.__table__
+    for (run_id,) in conn.execute(select(table.c.id).where(table.c.customer_count.is_(None))).all():
+        run_sizes = sizes.get(run_id, {})
+        conn.execute(
+            update(table).where(table.c.id == run_id)
+            .values(cluster_sizes=run_sizes, customer_count=sum(run_sizes.values()))
+        )
+
+
+def _transaction_listing_indexes(conn: Connection):
+    create_index(conn, "ix_transactions_date_id", "transactions", ["transaction_date", "id"])
+    create_index(conn, "ix_transactions_customer_date_id", "transactions", ["customer_id", "transaction_date", "id"])
+    create_index(conn, "ix_transactions_category_date_id", "transactions", ["product_category", "transaction_date", "id"])
+
+
+def _transaction_idempotency_key(conn: Connection):
+    add_column(conn, "transactions", "idempotency_key", "VARCHAR")
+    # NULL keys never conflict, so uploaded rows are unaffected
+    create_index(conn, "uq_transactions_idempotency_key", "transactions", ["idempotency_key"], unique=True)
+
+
+def _hot_query_indexes(conn: Connection):
+    # Covers the per-customer RLFM aggregation without touching the table
+    create_index(conn, "ix_transactions_customer_rlfm", "transactions",
+                 ["customer_id", "transaction_date", "amount", "product_category", "transaction_code"])
+    # Run -> cluster -> members (strategy, profiles, exports, history counts/deletes)
+    create_index(conn, "ix_customer_clusters_run_label_customer", "customer_clusters",
+                 ["cluster_result_id", "cluster_label", "customer_id"])
+    # A customer's interactions, newest first
+    create_index(conn, "ix_interactions_customer_date", "interactions", ["customer_id", "interaction_date"])
+
+
+def _active_run(conn: Connection):
+    add_column(conn, "cluster_results", "is_active", "BOOLEAN DEFAULT FALSE")
+    create_index(conn, "ix_cluster_results_is_active", "cluster_results", ["is_active"])
+
+
+def _feature_store_backfill(conn: Connection):
+    # Step 2 left the store empty and later writes only added the customers they
+    # touched; rebuild it in full and record that it is complete
+    from sqlalchemy.orm import Session
+    from app.services.feature_store import backfill_feature_store
+    with Session(bind=conn) as db:
+        backfill_feature_store(db)
+        db.flush()
+
+
+def _integer_customer_codes(conn: Connection):
+    # Float ID columns were once stored as '17850.0'; uploads now store '17850', so
+    # re-importing the same file would create every customer a second time
+    rows = conn.execute(text("SELECT id, customer_code FROM customers WHERE customer_code LIKE '%.0'")).all()
+    float_codes = {row_id: code[:-2] for row_id, code in rows if re.fullmatch(r"-?\d+\.0", code)}
+    if not float_codes:
+        return
+
+    canonical = {}
+    codes = list(set(float_codes.values()))
+    for i in range(0, len(codes), 500):
+        canonical.update(conn.execute(
+            text("SELECT customer_code, id FROM customers WHERE customer_code IN :codes")
+            .bindparams(bindparam("codes", expanding=True)),
+            {"codes": codes[i:i + 500]}
+        ).all())
+
+    renames = [{"id": row_id, "code": code} for row_id, code in float_codes.items() if code not in canonical]
+    if renames:
+        conn.execute(text("UPDATE customers SET customer_code = :code WHERE id = :id"), renames)
+
+    # Both forms exist: move the duplicate's rows to the canonical customer
+    merges = [{"old": row_id, "new": canonical[code]} for row_id, code in float_codes.items() if code in canonical]
+    if not merges:
+        return
+    conn.execute(text(
+        "DELETE FROM customer_clusters WHERE customer_id = :old AND cluster_result_id IN "
+        "(SELECT cluster_result_id FROM customer_clusters WHERE customer_id = :new)"
+    ), merges)
+    for table in ("transactions", "interactions", "customer_clusters", "segment_transitions"):
+        conn.execute(text(f"UPDATE {table} SET customer_id = :new WHERE customer_id = :old"), merges)
+    conn.execute(text("DELETE FROM customer_rlfm WHERE customer_id = :old"), merges)
+    conn.execute(text("DELETE FROM customers WHERE id = :old"), merges)
+    # Aggregates of the merged customers are stale; the store is rebuilt on next use
+    conn.execute(text("DELETE FROM backfill_state WHERE name = 'customer_rlfm'"))
+
+
+def _clustering_job_owner(conn: Connection):
+    add_column(conn, "clustering_jobs", "owner", "VARCHAR")
+
+
+def _sales_rollup_backfill(conn: Connection):
+    # The rollup was only backfilled while it had no rows, so one manual
+    # transaction before the first dashboard view left it with just that row
+    from sqlalchemy.orm import Session
+    from app.services.rollup_service import backfill_sales_rollup
+    with Session(bind=conn) as db:
+        backfill_sales_rollup(db)
+        db.flush()
+
+
+# (version, name, step) in application order; append only
+MIGRATIONS = [
+    (1, "users_role_column", _users_role),
+    (2, "customer_rlfm_feature_store", _customer_rlfm_feature_store),
+    (3, "cluster_result_stats", _cluster_result_stats),
+    (4, "transaction_listing_indexes", _transaction_listing_indexes),
+    (5, "transaction_idempotency_key", _transaction_idempotency_key),
+    (6, "hot_query_indexes", _hot_query_indexes),
+    (7, "active_run", _active_run),
+    (8, "feature_store_backfill", _feature_store_backfill),
+    (9, "integer_customer_codes", _integer_customer_codes),
+    (10, "clustering_job_owner", _clustering_job_owner),
+    (11, "sales_rollup_backfill", _sales_rollup_backfill),
+]
+
+
+def applied_versions(engine: Engine) -> dict:
+    metadata.create_all(bind=engine)
+    with engine.connect() as conn:
+        return dict(conn.execute(select(schema_migrations.c.version, schema_migrations.c.applied_at)).all())
+
+
+def pending_migrations(engine: Engine) -> list:
+    applied = applied_versions(engine)
+    return [(version, name) for version, name, _ in MIGRATIONS if version not in applied]
+
+
+def run_migrations(engine: Engine) -> list:
+    """Create missing tables, then apply pending steps in order, each in its own transaction"""
+    from app.core.database import Base
+    from app.models import models, user  # noqa: F401 (register every table)
+    Base.metadata.create_all(bind=engine)
+
+    applied = []
+    for version, name, step in MIGRATIONS:
+        if version in applied_versions(engine):
+            continue
+        try:
+            with engine.begin() as conn:
+                step(conn)
+                conn.execute(schema_migrations.insert().values(version=version, name=name, applied_at=datetime.utcnow()))
+        except IntegrityError:
+            # Another process recorded this version first; its changes are already in place
+            if version in applied_versions(engine):
+                continue
+            raise
+        applied.append((version, name))
+    return applied
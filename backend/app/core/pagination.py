@@ -0,0 +1,24 @@
+from datetime import datetime
+from fastapi import HTTPException
+from sqlalchemy import and_, or_
+
+# Upper bound on page sizes for keyset-paginated listings
+MAX_PAGE_SIZE = 200
+
+
+def encode_cursor(value: datetime, row_id: int) -> str:
+    return f"{value.isoformat()}_{row_id}"
+
+
+def decode_cursor(cursor: str):
+    try:
+        value, row_id = cursor.rsplit("_", 1)
+        return datetime.fromisoformat(value), int(row_id)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def before_cursor(value_column, id_column, cursor: str):
+    """Rows after the cursor in (value DESC, id DESC) order"""
+    value, row_id = decode_cursor(cursor)
+    return or_(value_column < value, and_(value_column == value, id_column < row_id))
@@ -1,7 +1,21 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
-app = FastAPI(title="Customer Segmentation DSS", version="1.0.0")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Jobs left queued/running by a previous server process can never finish
+    from app.services.job_service import recover_orphaned_jobs
+    db = SessionLocal()
+    try:
+        recover_orphaned_jobs(db)
+    finally:
+        db.close()
+    yield
+
+
+app = FastAPI(title="Customer Segmentation DSS", version="1.0.0", lifespan=lifespan)
 
 # CORS
 origins = [
@@ -22,7 +36,7 @@ app.add_middleware(
 )
 
 from app.api import upload, clustering, analytics, strategy, auth, rlfm
-from app.core.database import engine, Base
+from app.core.database import engine, Base, SessionLocal
 from app.models import models
 from app.models.user import User
 
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, JSON
+from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, JSON, Boolean, LargeBinary, UniqueConstraint, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from app.core.database import Base
@@ -15,6 +15,16 @@ class Customer(Base):
 
 class Transaction(Base):
     __tablename__ = "transactions"
+    __table_args__ = (
+        # Keyset pagination (newest first), optionally narrowed by customer or category
+        Index("ix_transactions_date_id", "transaction_date", "id"),
+        Index("ix_transactions_customer_date_id", "customer_id", "transaction_date", "id"),
+        Index("ix_transactions_category_date_id", "product_category", "transaction_date", "id"),
+        # Covering index for the per-customer RLFM aggregation
+        Index("ix_transactions_customer_rlfm", "customer_id", "transaction_date", "amount", "product_category", "transaction_code"),
+        # NULL keys never conflict, so uploaded rows are unaffected
+        Index("uq_transactions_idempotency_key", "idempotency_key", unique=True),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     customer_id = Column(Integer, ForeignKey("customers.id"))
@@ -22,6 +32,8 @@ class Transaction(Base):
     transaction_date = Column(DateTime)
     amount = Column(Float)
     product_category = Column(String, nullable=True)
+    # Client-supplied key so retried API calls are recorded once
+    idempotency_key = Column(String, nullable=True)
     
     customer = relationship("Customer", back_populates="transactions")
 
@@ -32,13 +44,26 @@ class ClusterResult(Base):
     run_name = Column(String)
     algorithm = Column(String)
     parameters = Column(JSON)
-    created_at = Column(DateTime, default=datetime.utcnow)
+    created_at = Column(DateTime, default=datetime.utcnow, index=True)
     model_path = Column(String, nullable=True)
+    # The run new transactions are scored against (at most one)
+    is_active = Column(Boolean, default=False, index=True)
+    
+    # Written once when the run is saved, so history never counts customer_clusters
+    customer_count = Column(Integer, nullable=True)
+    cluster_sizes = Column(JSON, nullable=True)  # {cluster: customers}
+    fit_seconds = Column(Float, nullable=True)
+    feature_means = Column(JSON, nullable=True)  # {feature: {cluster: mean}}
+    feature_quantiles = Column(JSON, nullable=True)  # Customer-level {feature: {p25, p50, p75}} over the run
     
     customer_clusters = relationship("CustomerCluster", back_populates="cluster_result")
 
 class CustomerCluster(Base):
     __tablename__ = "customer_clusters"
+    __table_args__ = (
+        # Run -> cluster -> members; covers membership joins, counts and deletes
+        Index("ix_customer_clusters_run_label_customer", "cluster_result_id", "cluster_label", "customer_id"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     cluster_result_id = Column(Integer, ForeignKey("cluster_results.id"))
@@ -47,11 +72,64 @@ class CustomerCluster(Base):
     
     cluster_result = relationship("ClusterResult", back_populates="customer_clusters")
 
+class ClusterProfile(Base):
+    __tablename__ = "cluster_profile"
+    __table_args__ = (UniqueConstraint("cluster_result_id", "cluster_label"),)
+
+    id = Column(Integer, primary_key=True, index=True)
+    cluster_result_id = Column(Integer, ForeignKey("cluster_results.id"), index=True)
+    cluster_label = Column(Integer)
+    
+    customer_count = Column(Integer)
+    transaction_count = Column(Integer)
+    avg_spend = Column(Float)  # Per transaction
+    frequency = Column(Float)  # Transactions per customer
+    recency = Column(Float)  # Mean days since last purchase
+    quantiles = Column(JSON)  # Customer-level {feature: {p25, p50, p75}} within the cluster
+    
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+class SegmentTransition(Base):
+    __tablename__ = "segment_transitions"
+    __table_args__ = (
+        Index("ix_segment_transitions_customer_changed", "customer_id", "changed_at"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    cluster_result_id = Column(Integer, ForeignKey("cluster_results.id"), index=True)
+    customer_id = Column(Integer, ForeignKey("customers.id"))
+    from_label = Column(Integer, nullable=True)  # None when the customer joined the run
+    to_label = Column(Integer)
+    source = Column(String)  # upload, manual
+    changed_at = Column(DateTime, default=datetime.utcnow)
+
+class ClusteringJob(Base):
+    __tablename__ = "clustering_jobs"
+
+    id = Column(String, primary_key=True, index=True)  # uuid hex
+    status = Column(String, default="queued", index=True)  # queued, running, completed, failed, cancelled
+    progress = Column(Float, default=0.0)
+    message = Column(String, nullable=True)
+    cancel_requested = Column(Boolean, default=False)
+    
+    run_name = Column(String)
+    algorithm = Column(String)
+    request = Column(JSON)
+    result = Column(JSON, nullable=True)
+    error = Column(String, nullable=True)
+    cluster_result_id = Column(Integer, ForeignKey("cluster_results.id"), nullable=True)
+    created_by = Column(String, nullable=True)
+    owner = Column(String, nullable=True)  # host:pid of the API process whose pool runs the job
+    
+    created_at = Column(DateTime, default=datetime.utcnow)
+    started_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
+
 class CustomerRLFM(Base):
     __tablename__ = "customer_rlfm"
 
     id = Column(Integer, primary_key=True, index=True)
-    customer_id = Column(Integer, ForeignKey("customers.id"))
+    customer_id = Column(Integer, ForeignKey("customers.id"), unique=True, index=True)
     
     recency = Column(Float)
     frequency = Column(Float)
@@ -59,12 +137,65 @@ class CustomerRLFM(Base):
     length = Column(Float)
     variety = Column(Float)
     
+    # Running aggregates (feature store); recency is re-derived from a reference date on read
+    transaction_count = Column(Integer, default=0)
+    order_count = Column(Integer, default=0)
+    first_date = Column(DateTime, nullable=True)
+    last_date = Column(DateTime, nullable=True)
+    
     created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow)
     
     customer = relationship("Customer")
 
+class SalesRollup(Base):
+    __tablename__ = "sales_rollup"
+    __table_args__ = (UniqueConstraint("period", "granularity", "product_category"),)
+
+    id = Column(Integer, primary_key=True, index=True)
+    period = Column(DateTime, nullable=False, index=True)  # Start of the month/day
+    granularity = Column(String, nullable=False)  # month, day
+    product_category = Column(String, nullable=False, default="")  # "" = uncategorized
+    
+    total_amount = Column(Float, default=0)
+    transaction_count = Column(Integer, default=0)
+    # Mergeable HyperLogLog of customer ids; customer_estimate caches its count
+    customer_sketch = Column(LargeBinary, nullable=True)
+    customer_estimate = Column(Float, default=0)
+    
+    updated_at = Column(DateTime, default=datetime.utcnow)
+
+class DataVersion(Base):
+    __tablename__ = "data_version"
+
+    # Single row (id=1); token changes if the table is recreated so old ETags never match
+    id = Column(Integer, primary_key=True)
+    version = Column(Integer, nullable=False, default=1)
+    token = Column(String, nullable=False)
+    updated_at = Column(DateTime, default=datetime.utcnow)
+
+class BackfillState(Base):
+    __tablename__ = "backfill_state"
+
+    # One row per derived table once a full backfill completed; until then its
+    # rows may only reflect recent deltas and readers must not trust it
+    name = Column(String, primary_key=True)
+    completed_at = Column(DateTime, default=datetime.utcnow)
+
+class DataProfile(Base):
+    __tablename__ = "data_profiles"
+
+    id = Column(Integer, primary_key=True, index=True)
+    data_version = Column(String, index=True)  # Profile is valid until the data version changes
+    profile = Column(JSON)
+    scan_seconds = Column(Float)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
 class Interaction(Base):
     __tablename__ = "interactions"
+    __table_args__ = (
+        Index("ix_interactions_customer_date", "customer_id", "interaction_date"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     customer_id = Column(Integer, ForeignKey("customers.id"))
@@ -0,0 +1,16 @@
+from datetime import datetime
+from sqlalchemy.orm import Session
+from app.models.models import BackfillState
+
+
+def is_backfilled(db: Session, name: str) -> bool:
+    return db.get(BackfillState, name) is not None
+
+
+def mark_backfilled(db: Session, name: str):
+    """Record a completed full backfill of a derived table (no commit)"""
+    db.merge(BackfillState(name=name, completed_at=datetime.utcnow()))
+
+
+def clear_backfilled(db: Session, name: str):
+    db.query(BackfillState).filter(BackfillState.name == name).delete(synchronize_session=False)
@@ -0,0 +1,90 @@
+import io
+import numpy as np
+import pandas as pd
+from sqlalchemy import Table
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+from app.models.models import CustomerCluster
+
+# Rows per executemany / COPY batch
+DEFAULT_CHUNK_SIZE = 50000
+
+
+def _is_postgres(db: Session) -> bool:
+    return db.get_bind().dialect.name == "postgresql"
+
+
+def upsert_statement(db: Session, table: Table):
+    """INSERT that supports .on_conflict_do_update(), or None where the backend has no ON CONFLICT"""
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        return postgresql.insert(table)
+    if dialect == "sqlite":
+        return sqlite.insert(table)
+    return None
+
+
+def _copy_frame(db: Session, table: Table, frame: pd.DataFrame):
+    # PostgreSQL COPY through the session's own connection (same transaction)
+    buffer = io.StringIO()
+    frame.to_csv(buffer, index=False, header=False)
+    buffer.seek(0)
+
+    columns = ", ".join(f'"{c}"' for c in frame.columns)
+    cursor = db.connection().connection.cursor()
+    try:
+        cursor.copy_expert(f'COPY "{table.name}" ({columns}) FROM STDIN WITH (FORMAT csv)', buffer)
+    finally:
+        cursor.close()
+
+
+def insert_columns(db: Session, table: Table, columns: dict, chunk_size: int = None) -> int:
+    """Bulk insert column arrays (NumPy arrays or lists of equal length); no ORM objects, no commit"""
+    names = list(columns)
+    arrays = [np.asarray(columns[name]) for name in names]
+    # datetime64 would come out of .tolist() as integers; microsecond precision maps to datetime objects
+    arrays = [a.astype('datetime64[us]').astype(object) if a.dtype.kind == 'M' else a for a in arrays]
+    total = len(arrays[0]) if arrays else 0
+    if total == 0:
+        return 0
+
+    chunk_size = chunk_size or DEFAULT_CHUNK_SIZE
+    use_copy = _is_postgres(db)
+    statement = table.insert()
+
+    for start in range(0, total, chunk_size):
+        chunk = [a[start:start + chunk_size] for a in arrays]
+        if use_copy:
+            _copy_frame(db, table, pd.DataFrame(dict(zip(names, chunk))))
+        else:
+            # .tolist() converts NumPy scalars to native Python values in C
+            rows = [dict(zip(names, values)) for values in zip(*(c.tolist() for c in chunk))]
+            db.execute(statement, rows)
+
+    return total
+
+
+def insert_frame(db: Session, table: Table, frame: pd.DataFrame, chunk_size: int = None) -> int:
+    """Bulk insert a DataFrame whose columns match the table"""
+    if frame.empty:
+        return 0
+    # NaN/NaT -> None so the driver writes NULL
+    clean = frame.astype(object).where(frame.notna(), None)
+    return insert_columns(db, table, {c: clean[c].to_numpy() for c in clean.columns}, chunk_size)
+
+
+def write_cluster_labels(
+    db: Session,
+    cluster_result_id: int,
+    customer_ids,
+    labels,
+    chunk_size: int = None
+) -> int:
+    """Persist (cluster_result_id, customer_id, cluster_label) for a whole run from NumPy arrays"""
+    customer_ids = np.asarray(customer_ids, dtype=np.int64)
+    labels = np.asarray(labels, dtype=np.int64)
+    return insert_columns(db, CustomerCluster.__table__, {
+        "cluster_result_id": np.full(len(customer_ids), int(cluster_result_id), dtype=np.int64),
+        "customer_id": customer_ids,
+        "cluster_label": labels
+    }, chunk_size)
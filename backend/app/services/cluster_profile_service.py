@@ -0,0 +1,71 @@
+import numpy as np
+import pandas as pd
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+from app.models.models import ClusterProfile, CustomerCluster, CustomerRLFM, Transaction
+from app.services.feature_store import store_is_populated
+from datetime import datetime
+
+QUANTILES = {"p25": 0.25, "p50": 0.5, "p75": 0.75}
+
+
+def feature_quantiles(features: pd.DataFrame) -> dict:
+    """Customer-level {feature: {p25, p50, p75}}"""
+    values = features.quantile(list(QUANTILES.values()))
+    return {
+        col: {name: float(values.loc[q, col]) for name, q in QUANTILES.items()}
+        for col in features.columns
+    }
+
+
+def _spend_by_cluster(db: Session, run_id: int) -> dict:
+    """{label: (total spend, transaction count)} over each member's full history"""
+    if store_is_populated(db):
+        # O(customers) through the feature store
+        query = db.query(
+            CustomerCluster.cluster_label,
+            func.sum(CustomerRLFM.monetary),
+            func.sum(CustomerRLFM.transaction_count)
+        ).join(CustomerRLFM, CustomerRLFM.customer_id == CustomerCluster.customer_id)
+    else:
+        query = db.query(
+            CustomerCluster.cluster_label,
+            func.sum(Transaction.amount),
+            func.count(Transaction.id)
+        ).join(Transaction, Transaction.customer_id == CustomerCluster.customer_id)
+
+    rows = query.filter(CustomerCluster.cluster_result_id == run_id)\
+        .group_by(CustomerCluster.cluster_label)\
+        .all()
+    return {int(label): (float(total or 0), int(count or 0)) for label, total, count in rows}
+
+
+def save_cluster_profiles(db: Session, run_id: int, features: pd.DataFrame, labels) -> dict:
+    """One cluster_profile row per cluster, written once when a run is saved (no commit).
+
+    Call after the run's customer_clusters rows are flushed. Returns the run-level
+    customer quantiles that strategy thresholds are compared against.
+    """
+    labels = np.asarray(labels)
+    spend = _spend_by_cluster(db, run_id)
+    now = datetime.utcnow()
+
+    rows = []
+    for label, group in features.groupby(labels):
+        customers = len(group)
+        total, count = spend.get(int(label), (float(group['monetary'].sum()), 0))
+        rows.append({
+            "cluster_result_id": run_id,
+            "cluster_label": int(label),
+            "customer_count": customers,
+            "transaction_count": count,
+            "avg_spend": total / count if count else 0.0,
+            "frequency": count / customers if customers else 0.0,
+            "recency": float(group['recency'].mean()),
+            "quantiles": feature_quantiles(group),
+            "created_at": now
+        })
+
+    if rows:
+        db.bulk_insert_mappings(ClusterProfile, rows)
+    return feature_quantiles(features)
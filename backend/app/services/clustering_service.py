@@ -1,17 +1,118 @@
 import pandas as pd
 import numpy as np
-from sklearn.cluster import KMeans, DBSCAN, AgglomerativeClustering, SpectralClustering, Birch, MeanShift, AffinityPropagation
+from sklearn.cluster import KMeans, MiniBatchKMeans, DBSCAN, AgglomerativeClustering, SpectralClustering, Birch, MeanShift, AffinityPropagation, estimate_bandwidth
 from sklearn.mixture import GaussianMixture
 from sklearn.preprocessing import StandardScaler
+from sqlalchemy import func
 from sqlalchemy.orm import Session
-from app.models.models import Customer, Transaction, ClusterResult, CustomerCluster
+from app.models.models import Customer, Transaction, ClusterResult
+from app.services.scalable_clustering import NystroemSpectralClustering, SampledAffinityPropagation
 from datetime import datetime
 import json
+import os
+import time
 
 
-def get_customer_data(db: Session, start_date: datetime = None, end_date: datetime = None, limit: int = None):
+# Column order of the feature matrix fed to the scaler
+FEATURE_COLUMNS = ['monetary', 'recency', 'length', 'variety', 'frequency']
+
+
+def get_customer_data(
+    db: Session,
+    start_date: datetime = None,
+    end_date: datetime = None,
+    limit: int = None,
+    reference_date: datetime = None,
+    use_sql: bool = True
+):
     # Aggregate transaction data for each customer
-    
+    now = reference_date or datetime.now()
+
+    # Prefer the database-side aggregation: only one row per customer crosses the wire.
+    # The pandas path is kept as a fallback for backends where the aggregate fails.
+    if use_sql:
+        try:
+            return _get_customer_data_sql(db, start_date, end_date, limit, now)
+        except Exception as e:
+            print(f"SQL feature aggregation failed, falling back to pandas: {e}")
+            db.rollback()
+
+    return _get_customer_data_pandas(db, start_date, end_date, limit, now)
+
+
+def features_from_aggregates(agg: pd.DataFrame, now: datetime, has_txn_code: bool) -> pd.DataFrame:
+    """Turn per-customer aggregates (sum, first/last date, distinct counts) into RLFM features"""
+    first_date = pd.to_datetime(agg['first_date'])
+    last_date = pd.to_datetime(agg['last_date'])
+
+    features = pd.DataFrame(index=agg.index)
+    features['monetary'] = agg['monetary'].astype(float)
+    features['recency'] = (pd.Timestamp(now) - last_date).dt.days
+    features['length'] = (last_date - first_date).dt.days
+    features['variety'] = agg['variety']
+    # Frequency = unique orders when transaction codes exist, otherwise number of rows
+    features['frequency'] = agg['order_count'] if has_txn_code else agg['transaction_count']
+    return features[FEATURE_COLUMNS]
+
+
+AGGREGATE_COLUMNS = [
+    'id', 'customer_code', 'monetary', 'first_date', 'last_date',
+    'variety', 'order_count', 'transaction_count'
+]
+
+
+def aggregate_customer_transactions(
+    db: Session,
+    start_date: datetime = None,
+    end_date: datetime = None,
+    limit: int = None,
+    customer_ids: list = None
+):
+    # Single GROUP BY; COUNT(DISTINCT ...) works the same on PostgreSQL and SQLite
+    query = db.query(
+        Customer.id,
+        Customer.customer_code,
+        func.sum(Transaction.amount).label('monetary'),
+        func.min(Transaction.transaction_date).label('first_date'),
+        func.max(Transaction.transaction_date).label('last_date'),
+        func.count(func.distinct(Transaction.product_category)).label('variety'),
+        func.count(func.distinct(Transaction.transaction_code)).label('order_count'),
+        func.count(Transaction.id).label('transaction_count')
+    ).join(Transaction)
+
+    if start_date:
+        query = query.filter(Transaction.transaction_date >= start_date)
+    if end_date:
+        query = query.filter(Transaction.transaction_date <= end_date)
+    if customer_ids is not None:
+        query = query.filter(Customer.id.in_(customer_ids))
+
+    query = query.group_by(Customer.id, Customer.customer_code).order_by(Customer.id)
+
+    # Limit whole customers rather than raw rows so histories are never truncated
+    if limit:
+        query = query.limit(limit)
+
+    rows = query.all()
+    if not rows:
+        return None
+
+    return pd.DataFrame(rows, columns=AGGREGATE_COLUMNS).set_index('id')
+
+
+def _get_customer_data_sql(db: Session, start_date: datetime, end_date: datetime, limit: int, now: datetime):
+    agg = aggregate_customer_transactions(db, start_date, end_date, limit)
+    if agg is None:
+        return None, None
+
+    has_txn_code = bool((agg['order_count'] > 0).any())
+    customer_features = features_from_aggregates(agg, now, has_txn_code)
+
+    return customer_features, agg[['customer_code']]
+
+
+def _get_customer_data_pandas(db: Session, start_date: datetime, end_date: datetime, limit: int, now: datetime):
+    # Fallback: pull the raw rows and aggregate them in pandas
     query = db.query(
         Customer.id,
         Customer.customer_code,
@@ -34,71 +135,210 @@ def get_customer_data(db: Session, start_date: datetime = None, end_date: dateti
     
     if df.empty:
         return None, None
-        
-    # Feature Engineering
-    now = datetime.now()
-    
-    # Check if transaction_code is populated
-    has_txn_code = df['transaction_code'].notna().any()
-    
-    aggs = {
-        'amount': 'sum',
-        'transaction_date': [
-            lambda x: (now - x.max()).days, # Recency
-            lambda x: (x.max() - x.min()).days # Length
-        ],
-        'product_category': lambda x: x.nunique()
-    }
-    
-    if has_txn_code:
-        aggs['transaction_code'] = lambda x: x.nunique() # Frequency = unique orders
-    else:
-        aggs['id'] = 'count' # Frequency = count of rows
-    
-    customer_features = df.groupby('id').agg(aggs)
-    
+
+    customer_features, customer_map = build_customer_features(df, now)
+
     # Apply limit to customer count if specified
     if limit and len(customer_features) > limit:
         customer_features = customer_features.head(limit)
-    
-    # Flatten MultiIndex columns
-    # Order matches dictionary key order
-    # amount, transaction_date(recency), transaction_date(length), product_category, transaction_code/id
-    # Note: Dictionary order is preserved in Python 3.7+
-    
-    # We need to explicitly order or map because dict order might vary? 
-    # Actually, let's just use flattened names
-    customer_features.columns = ['_'.join(col).strip() for col in customer_features.columns.values]
-    
-    # Rename specifically
-    # Expected: amount_sum, transaction_date_<lambda_0>, transaction_date_<lambda_1>, product_category_<lambda>, (transaction_code_<lambda> OR id_count)
-    
-    rename_map = {
-        'amount_sum': 'monetary',
-        'transaction_date_<lambda_0>': 'recency',
-        'transaction_date_<lambda_1>': 'length',
-        'product_category_<lambda>': 'variety'
-    }
-    
-    if has_txn_code:
-        rename_map['transaction_code_<lambda>'] = 'frequency'
+        customer_map = customer_map.loc[customer_features.index]
+
+    return customer_features, customer_map
+
+
+def build_customer_features(df: pd.DataFrame, now: datetime):
+    """Vectorized RLFM features from raw transaction rows (built-in aggregations only)"""
+    df = df.assign(transaction_date=pd.to_datetime(df['transaction_date']))
+
+    agg = df.groupby('id').agg(
+        customer_code=('customer_code', 'first'),
+        monetary=('amount', 'sum'),
+        first_date=('transaction_date', 'min'),
+        last_date=('transaction_date', 'max'),
+        variety=('product_category', 'nunique'),
+        order_count=('transaction_code', 'nunique'),
+        transaction_count=('amount', 'size')
+    )
+
+    # Check if transaction_code is populated
+    has_txn_code = bool(df['transaction_code'].notna().any())
+    customer_features = features_from_aggregates(agg, now, has_txn_code)
+
+    return customer_features, agg[['customer_code']]
+
+
+# Above this many customers the O(n^2) algorithms switch to their scalable variants
+SCALABLE_THRESHOLD = int(os.getenv("CLUSTERING_SCALABLE_THRESHOLD", 20000))
+
+# Rows used to estimate the mean-shift bandwidth for large inputs
+BANDWIDTH_SAMPLE_SIZE = 5000
+
+
+def _n_clusters(params):
+    return int(params.get('n_clusters', 3))
+
+
+def _meanshift_bandwidth(params):
+    bandwidth = params.get('bandwidth')
+    return float(bandwidth) if bandwidth else None # None lets sklearn estimate it
+
+
+# Exact estimators: name -> builder(params, X)
+ALGORITHMS = {
+    'kmeans': lambda p, X: KMeans(n_clusters=_n_clusters(p), random_state=42),
+    'dbscan': lambda p, X: DBSCAN(eps=float(p.get('eps', 0.5)), min_samples=int(p.get('min_samples', 5))),
+    'hierarchical': lambda p, X: AgglomerativeClustering(n_clusters=_n_clusters(p)),
+    'gmm': lambda p, X: GaussianMixture(n_components=_n_clusters(p), random_state=42),
+    'spectral': lambda p, X: SpectralClustering(
+        n_clusters=_n_clusters(p), affinity=p.get('affinity', 'rbf'), random_state=42
+    ),
+    'birch': lambda p, X: Birch(n_clusters=_n_clusters(p), threshold=float(p.get('threshold', 0.5))),
+    'meanshift': lambda p, X: MeanShift(bandwidth=_meanshift_bandwidth(p)),
+    'affinity_propagation': lambda p, X: AffinityPropagation(
+        damping=float(p.get('damping', 0.5)), random_state=42
+    ),
+}
+
+# Scalable variants: name -> (variant name, builder(params, X))
+SCALABLE_ALGORITHMS = {
+    'kmeans': ('minibatch_kmeans', lambda p, X: MiniBatchKMeans(
+        n_clusters=_n_clusters(p), batch_size=int(p.get('batch_size', 4096)), random_state=42
+    )),
+    'hierarchical': ('birch_agglomerative', lambda p, X: Birch(
+        threshold=float(p.get('threshold', 0.5)),
+        n_clusters=AgglomerativeClustering(n_clusters=_n_clusters(p))
+    )),
+    'spectral': ('nystroem_spectral', lambda p, X: NystroemSpectralClustering(
+        n_clusters=_n_clusters(p), n_components=int(p.get('n_components', 300)), random_state=42
+    )),
+    'meanshift': ('meanshift_bin_seeding', lambda p, X: MeanShift(
+        bandwidth=_meanshift_bandwidth(p) or estimate_bandwidth(
+            X, n_samples=min(len(X), BANDWIDTH_SAMPLE_SIZE), random_state=42
+        ),
+        bin_seeding=True
+    )),
+    'affinity_propagation': ('sampled_affinity_propagation', lambda p, X: SampledAffinityPropagation(
+        damping=float(p.get('damping', 0.5)), sample_size=int(p.get('sample_size', 2000)), random_state=42
+    )),
+}
+
+
+def _use_scalable(params: dict, n_samples: int) -> bool:
+    # params['scalable']: "auto" (default) switches on size, true/false forces it
+    choice = str(params.get('scalable', 'auto')).lower()
+    if choice in ('true', '1', 'yes'):
+        return True
+    if choice in ('false', '0', 'no'):
+        return False
+    return n_samples >= SCALABLE_THRESHOLD
+
+
+def build_model(algorithm: str, params: dict, X):
+    """Return (unfitted estimator, variant name) for the algorithm registry"""
+    if algorithm not in ALGORITHMS:
+        raise ValueError(f"Unknown algorithm: {algorithm}")
+
+    if algorithm in SCALABLE_ALGORITHMS and _use_scalable(params, len(X)):
+        variant, builder = SCALABLE_ALGORITHMS[algorithm]
+        return builder(params, X), variant
+
+    return ALGORITHMS[algorithm](params, X), algorithm
+
+
+# Customers assigned per predict() call in sample-fit mode
+ASSIGN_BATCH_SIZE = 50000
+
+# Held-out customers re-clustered independently to measure sample-fit agreement
+AGREEMENT_SUBSET_SIZE = 2000
+
+
+# Monetary strata of a fit sample; each needs enough customers to be represented at all
+SAMPLE_STRATA = 10
+MIN_FIT_SAMPLE_SIZE = 10 * SAMPLE_STRATA
+
+
+def validate_fit_sample_size(fit_sample_size, params: dict):
+    """Raise ValueError unless fit_sample_size (None = fit everyone) can be sampled and clustered"""
+    if fit_sample_size is None:
+        return
+    minimum = max(MIN_FIT_SAMPLE_SIZE, _n_clusters(params or {}))
+    if int(fit_sample_size) < minimum:
+        raise ValueError(f"fit_sample_size must be at least {minimum} (got {fit_sample_size})")
+
+
+def stratified_sample_indices(features_df: pd.DataFrame, size: int, random_state: int = 42) -> np.ndarray:
+    """Positions of a sample stratified on monetary deciles (keeps the spend mix of the population)"""
+    # Never more strata than rows (qcut fails) or than sampled rows (each stratum would round to none)
+    q = max(1, min(SAMPLE_STRATA, len(features_df), size))
+    strata = pd.qcut(features_df['monetary'].rank(method='first'), q=q, labels=False)
+    positions = pd.Series(np.arange(len(features_df)), index=features_df.index)
+    sample = positions.groupby(strata.values).sample(frac=size / len(features_df), random_state=random_state)
+    return np.sort(sample.to_numpy())
+
+
+def assign_labels(model, X_fit: np.ndarray, fit_labels: np.ndarray, X: np.ndarray,
+                  batch_size: int = ASSIGN_BATCH_SIZE) -> np.ndarray:
+    """Label every row of X with a model fitted on X_fit, in vectorized batches"""
+    fit_labels = np.asarray(fit_labels)
+
+    if hasattr(model, 'predict'):
+        return np.concatenate([model.predict(X[i:i + batch_size]) for i in range(0, len(X), batch_size)])
+
+    from sklearn.neighbors import NearestNeighbors
+
+    core_indices = getattr(model, 'core_sample_indices_', None)
+    if core_indices is not None:
+        # DBSCAN: nearest core point within eps, otherwise noise
+        labels = np.full(len(X), -1)
+        if len(core_indices) == 0:
+            return labels
+        index = NearestNeighbors(n_neighbors=1).fit(X_fit[core_indices])
+        core_labels = fit_labels[core_indices]
+        for i in range(0, len(X), batch_size):
+            distances, nearest = index.kneighbors(X[i:i + batch_size])
+            batch = core_labels[nearest[:, 0]]
+            batch[distances[:, 0] > model.eps] = -1
+            labels[i:i + batch_size] = batch
+        return labels
+
+    # Agglomerative / spectral: nearest centroid of the fitted clusters
+    clusters = np.unique(fit_labels[fit_labels >= 0])
+    centroids = np.vstack([X_fit[fit_labels == c].mean(axis=0) for c in clusters])
+    index = NearestNeighbors(n_neighbors=1).fit(centroids)
+    return np.concatenate([
+        clusters[index.kneighbors(X[i:i + batch_size], return_distance=False)[:, 0]]
+        for i in range(0, len(X), batch_size)
+    ])
+
+
+def holdout_agreement(algorithm: str, params: dict, X: np.ndarray, sample_idx: np.ndarray, labels: np.ndarray):
+    """ARI between the assigned labels and an independent fit on held-out customers"""
+    from sklearn.metrics import adjusted_rand_score
+
+    held_out = np.setdiff1d(np.arange(len(X)), sample_idx)
+    if len(held_out) < 2:
+        return None, 0
+
+    rng = np.random.default_rng(42)
+    subset = rng.choice(held_out, size=min(AGREEMENT_SUBSET_SIZE, len(held_out)), replace=False)
+    reference, _ = build_model(algorithm, params, X[subset])
+    reference_labels = reference.fit_predict(X[subset])
+    return round(float(adjusted_rand_score(reference_labels, labels[subset])), 4), int(len(subset))
+
+
+def load_run_features(db: Session, start_date: datetime = None, end_date: datetime = None):
+    # Whole-history runs read the persisted feature store (O(customers));
+    # date-filtered runs still aggregate the transactions in that window.
+    from app.services.feature_store import load_customer_features, store_is_populated
+    if start_date is None and end_date is None and store_is_populated(db):
+        features_df, customer_map = load_customer_features(db)
     else:
-        rename_map['id_count'] = 'frequency'
-        
-    customer_features.rename(columns=rename_map, inplace=True)
-    
-    # Ensure all required columns exist (if lambda names differ)
-    # Just to be safe with lambda naming in older pandas/python
-    if 'recency' not in customer_features.columns: 
-        customer_features.columns.values[1] = 'recency'
-    if 'length' not in customer_features.columns:
-        customer_features.columns.values[2] = 'length'
-    if 'variety' not in customer_features.columns:
-        customer_features.columns.values[3] = 'variety'
-    if 'frequency' not in customer_features.columns:
-        customer_features.columns.values[4] = 'frequency'
+        features_df, customer_map = get_customer_data(db, start_date, end_date)
     
-    return customer_features, df[['id', 'customer_code']].drop_duplicates().set_index('id')
+    if features_df is None or features_df.empty:
+        raise ValueError("Not enough data to cluster")
+    return features_df, customer_map
+
 
 def run_clustering(
     algorithm: str, 
@@ -107,148 +347,126 @@ def run_clustering(
     run_name: str,
     start_date: datetime = None,
     end_date: datetime = None,
-    save_result: bool = True
+    save_result: bool = True,
+    progress_callback=None,
+    fit_sample_size: int = None,
+    features: tuple = None
 ):
-    features_df, customer_map = get_customer_data(db, start_date, end_date)
-    
-    if features_df is None or features_df.empty:
-        raise ValueError("Not enough data to cluster")
+    # progress_callback(fraction, message) lets a background job report progress;
+    # it may raise to abort the run before anything is saved.
+    def report(fraction, message):
+        if progress_callback:
+            progress_callback(fraction, message)
+
+    report(0.05, "Loading customer features")
+
+    if features is not None:
+        features_df, customer_map = features
+        features_df = features_df.copy()
+    else:
+        features_df, customer_map = load_run_features(db, start_date, end_date)
         
     # Preprocessing
+    feature_columns = list(features_df.columns)
     scaler = StandardScaler()
     X_scaled = scaler.fit_transform(features_df)
     
-    # Algorithm selection
-    if algorithm == 'kmeans':
-        n_clusters = int(params.get('n_clusters', 3))
-        model = KMeans(n_clusters=n_clusters, random_state=42)
-        labels = model.fit_predict(X_scaled)
+    validate_fit_sample_size(fit_sample_size, params)
+    sampling = None
+    if fit_sample_size and int(fit_sample_size) < len(X_scaled):
+        # Fit on a stratified sample, then assign every customer to the fitted clusters
+        sample_idx = stratified_sample_indices(features_df, int(fit_sample_size))
+        report(0.2, f"Fitting {algorithm} on a sample of {len(sample_idx)} customers")
         
-    elif algorithm == 'dbscan':
-        eps = float(params.get('eps', 0.5))
-        min_samples = int(params.get('min_samples', 5))
-        model = DBSCAN(eps=eps, min_samples=min_samples)
-        labels = model.fit_predict(X_scaled)
+        started = time.perf_counter()
+        model, variant = build_model(algorithm, params, X_scaled[sample_idx])
+        sample_labels = model.fit_predict(X_scaled[sample_idx])
+        fit_seconds = time.perf_counter() - started
         
-    elif algorithm == 'hierarchical':
-        n_clusters = int(params.get('n_clusters', 3))
-        model = AgglomerativeClustering(n_clusters=n_clusters)
-        labels = model.fit_predict(X_scaled)
-        
-    elif algorithm == 'gmm':
-        n_components = int(params.get('n_clusters', 3))
-        model = GaussianMixture(n_components=n_components, random_state=42)
-        labels = model.fit_predict(X_scaled)
-
-    elif algorithm == 'spectral':
-        n_clusters = int(params.get('n_clusters', 3))
-        affinity = params.get('affinity', 'rbf')
-        model = SpectralClustering(n_clusters=n_clusters, affinity=affinity, random_state=42)
-        labels = model.fit_predict(X_scaled)
-
-    elif algorithm == 'birch':
-        n_clusters = int(params.get('n_clusters', 3))
-        threshold = float(params.get('threshold', 0.5))
-        model = Birch(n_clusters=n_clusters, threshold=threshold)
-        labels = model.fit_predict(X_scaled)
-
-    elif algorithm == 'meanshift':
-        bandwidth = params.get('bandwidth')
-        if bandwidth:
-            bandwidth = float(bandwidth)
-        else:
-            bandwidth = None # Let sklearn estimate it
-        model = MeanShift(bandwidth=bandwidth)
-        labels = model.fit_predict(X_scaled)
-
-    elif algorithm == 'affinity_propagation':
-        damping = float(params.get('damping', 0.5))
-        model = AffinityPropagation(damping=damping, random_state=42)
-        labels = model.fit_predict(X_scaled)
+        report(0.5, f"Assigning {len(X_scaled)} customers")
+        started = time.perf_counter()
+        labels = assign_labels(model, X_scaled[sample_idx], sample_labels, X_scaled)
+        labels[sample_idx] = sample_labels
+        assign_seconds = time.perf_counter() - started
+        X_fit, fit_labels = X_scaled[sample_idx], sample_labels
         
+        report(0.7, "Measuring agreement on a held-out subset")
+        agreement, subset_size = holdout_agreement(algorithm, params, X_scaled, sample_idx, labels)
+        sampling = {
+            "sample_size": int(len(sample_idx)),
+            "fit_seconds": round(fit_seconds, 3),
+            "assign_seconds": round(assign_seconds, 3),
+            "agreement": agreement,
+            "agreement_subset_size": subset_size
+        }
     else:
-        raise ValueError(f"Unknown algorithm: {algorithm}")
+        report(0.2, f"Fitting {algorithm} on {len(features_df)} customers")
         
+        # Algorithm selection (exact estimator, or its scalable variant for large inputs)
+        started = time.perf_counter()
+        model, variant = build_model(algorithm, params, X_scaled)
+        labels = model.fit_predict(X_scaled)
+        fit_seconds = time.perf_counter() - started
+        X_fit, fit_labels = X_scaled, labels
+        
+    report(0.8, "Saving results" if save_result else "Summarizing clusters")
+    
+    # Per-cluster summary (native types so it can be stored in JSON columns)
+    features_df['cluster'] = labels
+    summary = {
+        col: {int(k): float(v) for k, v in values.items()}
+        for col, values in features_df.groupby('cluster').mean().to_dict().items()
+    }
+    counts = {int(k): int(v) for k, v in features_df['cluster'].value_counts().to_dict().items()}
+    
     run_id = None
     
     if save_result:
-        # Save Results
-        # Create model store directory if not exists
-        import os
-        import joblib
-        
-        model_store_dir = "model_store"
-        if not os.path.exists(model_store_dir):
-            os.makedirs(model_store_dir)
-            
-        timestamp = datetime.now().strftime("%Y%m%d%H%M%S")
-        model_filename = f"{run_name}_{algorithm}_{timestamp}.joblib"
-        model_path = os.path.join(model_store_dir, model_filename)
-        
-        # Save the model
-        joblib.dump(model, model_path)
-
         cluster_result = ClusterResult(
             run_name=run_name,
             algorithm=algorithm,
             parameters=params,
-            model_path=model_path
+            customer_count=int(len(labels)),
+            cluster_sizes=counts,
+            fit_seconds=round(fit_seconds, 3),
+            feature_means=summary
         )
         db.add(cluster_result)
         db.flush()
         run_id = cluster_result.id
         
-        # Save Customer Clusters
-        for customer_id, label in zip(features_df.index, labels):
-            cc = CustomerCluster(
-                cluster_result_id=cluster_result.id,
-                customer_id=customer_id,
-                cluster_label=int(label)
-            )
-            db.add(cc)
+        # Scaler, feature order, estimator and centroids so the run can score new customers
+        from app.services.model_registry import save_model
+        cluster_result.model_path = save_model(
+            run_id, model, scaler, feature_columns, X_fit, fit_labels, algorithm, variant,
+            X=X_scaled, labels=labels
+        )
+        
+        # Save Customer Clusters (chunked bulk insert straight from the arrays)
+        from app.services.bulk_writer import write_cluster_labels
+        write_cluster_labels(db, cluster_result.id, features_df.index.to_numpy(), labels)
+        
+        # Per-cluster profile rows so strategy generation is a lookup over k rows
+        from app.services.cluster_profile_service import save_cluster_profiles
+        cluster_result.feature_quantiles = save_cluster_profiles(
+            db, cluster_result.id, features_df.drop(columns='cluster'), labels
+        )
             
         db.commit()
     
-    # Prepare summary for return
-    features_df['cluster'] = labels
-    summary = features_df.groupby('cluster').mean().to_dict()
-    counts = features_df['cluster'].value_counts().to_dict()
+    report(1.0, "Completed")
     
     return {
         "run_id": run_id, 
         "counts": counts,
         "centroids": summary,
-        "saved": save_result
+        "saved": save_result,
+        "variant": variant,
+        "sampling": sampling
     }
 
 def calculate_and_save_rlfm(db: Session):
-    features_df, _ = get_customer_data(db) # RLFM always on all data
-    
-    if features_df is None or features_df.empty:
-        return 0
-        
-    # Clear existing RLFM data? Or update?
-    # For now, let's delete all and recreate for simplicity, or upsert.
-    # Given the request is to "process" and save, clearing old might be cleaner to avoid stale data.
-    from app.models.models import CustomerRLFM
-    db.query(CustomerRLFM).delete()
-    
-    rlfm_records = []
-    timestamp = datetime.now()
-    
-    for customer_id, row in features_df.iterrows():
-        record = CustomerRLFM(
-            customer_id=int(customer_id),
-            recency=float(row['recency']),
-            frequency=float(row['frequency']),
-            monetary=float(row['monetary']),
-            length=float(row['length']),
-            variety=float(row['variety']),
-            created_at=timestamp
-        )
-        rlfm_records.append(record)
-    
-    db.bulk_save_objects(rlfm_records)
-    db.commit()
-    return len(rlfm_records)
-
+    # Full rebuild (backfill) of the feature store; uploads and manual
+    # transactions keep it up to date incrementally afterwards.
+    from app.services.feature_store import rebuild_feature_store
+    return rebuild_feature_store(db)
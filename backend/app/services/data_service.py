@@ -1,118 +1,276 @@
 import pandas as pd
 from sqlalchemy.orm import Session
+from app.core.cache import bump_data_version
 from app.models.models import Customer, Transaction
+from app.services.bulk_writer import insert_frame
+from app.services.feature_store import refresh_customer_features
+from app.services.preview_service import PREVIEW_SNIFF_BYTES, sheet_header, sniff_csv
+from app.services.rollup_service import update_sales_rollup
+from app.services.segment_service import reassign_segments
 from datetime import datetime
 import io
+import os
+import time
 
-def preview_upload_file(file_contents: bytes, filename: str):
-    if filename.endswith('.csv'):
-        df = pd.read_csv(io.BytesIO(file_contents), nrows=5) # Read only first 5 rows for preview
-    elif filename.endswith('.xlsx') or filename.endswith('.xls'):
-        df = pd.read_excel(io.BytesIO(file_contents), nrows=5)
-    else:
-        raise ValueError("Unsupported file format")
-    
-    # Return available columns and a small sample
-    columns = list(df.columns)
-    sample = df.head().to_dict(orient='records')
-    # Convert dates to string in sample for JSON serializability
-    for row in sample:
-        for k, v in row.items():
-            if isinstance(v, (datetime, pd.Timestamp)):
-                row[k] = str(v)
-                
-    return {"columns": columns, "sample": sample}
-
-def process_upload_file(file_contents: bytes, filename: str, db: Session, mapping: dict = None):
+# Rows inserted and committed per batch during uploads
+UPLOAD_CHUNK_SIZE = int(os.getenv("UPLOAD_CHUNK_SIZE", 50000))
+
+# Control fields that are not actual columns
+CONTROL_FIELDS = {'amount_mode'}
+
+# Bound on the number of codes in one IN (...) lookup
+CUSTOMER_LOOKUP_CHUNK = 5000
+
+
+def _read_upload_frame(file_contents: bytes, filename: str) -> pd.DataFrame:
     # Determine file type
     if filename.endswith('.csv'):
-        df = pd.read_csv(io.BytesIO(file_contents))
+        return pd.read_csv(io.BytesIO(file_contents), **sniff_csv(file_contents[:PREVIEW_SNIFF_BYTES]))
     elif filename.endswith('.xlsx') or filename.endswith('.xls'):
-        df = pd.read_excel(io.BytesIO(file_contents))
-    else:
-        raise ValueError("Unsupported file format")
+        return pd.read_excel(io.BytesIO(file_contents))
+    raise ValueError("Unsupported file format")
 
-    # Mapping: { "customer_code": "User ID", "amount": "Total", "quantity": "Qty", "unit_price": "Price", "transaction_code": "InvoiceNo" ... }
-    # Map columns based on user selection
-    
-    # We need to handle 'amount' vs 'quantity' + 'unit_price' explicitly before generic renaming
-    # because generic renaming assumes 1-to-1 mapping to standard names
-    
-    standard_columns = {v: k for k, v in mapping.items() if v}
-    # standard_columns maps "Original Name" -> "standard_name" (e.g., "InvoiceNo" -> "transaction_code")
-    
-    # Control fields that are not actual columns
-    control_fields = {'amount_mode'}
-    
-    if mapping:
-         # Check existence of column mappings (skip control fields)
-        for target, source in mapping.items():
-            if target in control_fields:
-                continue  # Skip control fields
-            if source and source not in df.columns:
-                raise ValueError(f"Column '{source}' not found for '{target}'")
-    
-    processed_count = 0
-    
-    for _, row in df.iterrows():
-        # Resolve Customer Code
-        c_col = mapping.get('customer_code')
-        customer_code = str(row.get(c_col, '')) if c_col else str(row.get(df.columns[0]))
-        
-        if not customer_code or customer_code.lower() == 'nan':
+
+def validate_mapping(columns, mapping: dict):
+    # Check existence of column mappings (skip control fields)
+    for target, source in (mapping or {}).items():
+        if target in CONTROL_FIELDS:
             continue
-            
-        customer = db.query(Customer).filter(Customer.customer_code == customer_code).first()
-        if not customer:
-            name_col = mapping.get('customer_name')
-            customer_name = str(row.get(name_col, 'Unknown')) if name_col else 'Unknown'
-            customer = Customer(
-                customer_code=customer_code,
-                name=customer_name
+        if source and source not in columns:
+            raise ValueError(f"Column '{source}' not found for '{target}'")
+
+
+def _parse_dates(values: pd.Series, default: datetime) -> pd.Series:
+    parsed = pd.to_datetime(values, errors='coerce')
+    # A single inferred format can miss rows that use another one; retry only those
+    retry = parsed.isna() & values.notna()
+    if retry.any():
+        parsed[retry] = pd.to_datetime(values[retry].astype(str), errors='coerce', format='mixed')
+    return parsed.fillna(pd.Timestamp(default))
+
+
+def _as_code(values: pd.Series) -> pd.Series:
+    # ID columns with gaps are upcast to float by pandas (17850 -> 17850.0), and
+    # chunked reads may type the same column differently; keep the integer form.
+    if pd.api.types.is_float_dtype(values):
+        present = values.dropna()
+        if (present % 1 == 0).all():
+            values = values.astype('Int64')
+    codes = values.astype(str).str.strip()
+    return codes.where(values.notna(), None)
+
+
+def map_upload_columns(df: pd.DataFrame, mapping: dict, now: datetime = None) -> pd.DataFrame:
+    """Map user columns to the standard transaction columns on whole columns at once"""
+    # Mapping: { "customer_code": "User ID", "amount": "Total", "quantity": "Qty", "unit_price": "Price", "transaction_code": "InvoiceNo" ... }
+    mapping = mapping or {}
+    now = now or datetime.now()
+    out = pd.DataFrame(index=df.index)
+
+    # Resolve Customer Code (first column when not mapped)
+    c_col = mapping.get('customer_code') or df.columns[0]
+    out['customer_code'] = _as_code(df[c_col]).fillna('')
+
+    name_col = mapping.get('customer_name')
+    out['customer_name'] = df[name_col].fillna('Unknown').astype(str) if name_col else 'Unknown'
+
+    date_col = mapping.get('transaction_date')
+    out['transaction_date'] = _parse_dates(df[date_col], now) if date_col else pd.Timestamp(now)
+
+    # Calculate Amount: explicit column, or quantity x unit price
+    if mapping.get('amount'):
+        out['amount'] = pd.to_numeric(df[mapping['amount']], errors='coerce').fillna(0.0)
+    elif mapping.get('quantity') and mapping.get('unit_price'):
+        qty = pd.to_numeric(df[mapping['quantity']], errors='coerce').fillna(0.0)
+        price = pd.to_numeric(df[mapping['unit_price']], errors='coerce').fillna(0.0)
+        out['amount'] = qty * price
+    else:
+        out['amount'] = 0.0
+
+    # Transaction Code (for Frequency)
+    txn_code_col = mapping.get('transaction_code')
+    if txn_code_col:
+        out['transaction_code'] = _as_code(df[txn_code_col])
+    else:
+        out['transaction_code'] = None
+
+    # Product Category
+    cat_col = mapping.get('product_category')
+    out['product_category'] = df[cat_col].fillna('General').astype(str) if cat_col else 'General'
+
+    # Skip rows without a usable customer code
+    valid = (out['customer_code'] != '') & (out['customer_code'].str.lower() != 'nan')
+    return out[valid]
+
+
+def resolve_customer_ids(db: Session, rows: pd.DataFrame) -> pd.Series:
+    """customer_code -> id, creating missing customers with one bulk insert"""
+    codes = rows['customer_code'].drop_duplicates()
+    unique_codes = codes.tolist()
+
+    def lookup(values):
+        found = {}
+        for i in range(0, len(values), CUSTOMER_LOOKUP_CHUNK):
+            chunk = values[i:i + CUSTOMER_LOOKUP_CHUNK]
+            found.update(
+                db.query(Customer.customer_code, Customer.id)
+                .filter(Customer.customer_code.in_(chunk))
+                .all()
             )
-            db.add(customer)
-            db.flush()
-            
-        # Add transaction
+        return found
+
+    ids = lookup(unique_codes)
+
+    missing = [c for c in unique_codes if c not in ids]
+    if missing:
+        # Name comes from the first row of each new customer
+        names = rows.drop_duplicates('customer_code').set_index('customer_code')['customer_name']
+        new_customers = pd.DataFrame({
+            'customer_code': missing,
+            'name': names.loc[missing].values,
+            'created_at': datetime.utcnow()
+        })
+        insert_frame(db, Customer.__table__, new_customers)
+        ids.update(lookup(missing))
+
+    return pd.Series(ids, name='customer_id')
+
+
+def ingest_frame(db: Session, df: pd.DataFrame, mapping: dict, chunk_size: int = None, now: datetime = None,
+                 committed_customers: set = None):
+    """Map, resolve customers and bulk insert one frame; commits every chunk_size rows.
+
+    committed_customers, when given, collects the customers of each batch as it commits.
+    """
+    chunk_size = chunk_size or UPLOAD_CHUNK_SIZE
+    rows = map_upload_columns(df, mapping, now)
+    if rows.empty:
+        return 0, set()
+
+    customer_ids = resolve_customer_ids(db, rows)
+    transactions = pd.DataFrame({
+        'customer_id': rows['customer_code'].map(customer_ids).astype(int),
+        'transaction_code': rows['transaction_code'],
+        'transaction_date': rows['transaction_date'],
+        'amount': rows['amount'].astype(float),
+        'product_category': rows['product_category']
+    })
+
+    for start in range(0, len(transactions), chunk_size):
+        batch = transactions.iloc[start:start + chunk_size]
+        insert_frame(db, Transaction.__table__, batch, chunk_size)
+        # Rollup deltas commit with their rows so the dashboard never double counts
+        update_sales_rollup(db, batch)
+        db.commit()
+        if committed_customers is not None:
+            committed_customers.update(batch['customer_id'].unique().tolist())
+
+    return len(transactions), set(transactions['customer_id'].unique().tolist())
+
+
+def iter_upload_chunks(path: str, filename: str, chunk_size: int = None):
+    """Yield DataFrames of at most chunk_size rows without loading the whole file"""
+    chunk_size = chunk_size or UPLOAD_CHUNK_SIZE
+
+    if filename.endswith('.csv'):
+        # Same delimiter/encoding the preview showed
+        with open(path, 'rb') as f:
+            options = sniff_csv(f.read(PREVIEW_SNIFF_BYTES))
+        with pd.read_csv(path, chunksize=chunk_size, **options) as reader:
+            for chunk in reader:
+                yield chunk
+    elif filename.endswith('.xlsx'):
+        # Read-only mode streams rows from the sheet XML instead of building the workbook
+        from openpyxl import load_workbook
+        workbook = load_workbook(path, read_only=True, data_only=True)
         try:
-            date_col = mapping.get('transaction_date')
-            date_val = row.get(date_col) if date_col else datetime.now()
-            if date_val:
-                t_date = pd.to_datetime(date_val)
-            else:
-                t_date = datetime.now()
-        except:
-            t_date = datetime.now()
-            
-        # Calculate Amount
-        amount = 0.0
-        if mapping.get('amount'):
-            amount = float(row.get(mapping['amount'], 0))
-        elif mapping.get('quantity') and mapping.get('unit_price'):
-            try:
-                qty = float(row.get(mapping['quantity'], 0))
-                price = float(row.get(mapping['unit_price'], 0))
-                amount = qty * price
-            except:
-                amount = 0.0
-                
-        # Transaction Code (for Frequency)
-        txn_code_col = mapping.get('transaction_code')
-        txn_code = str(row.get(txn_code_col)) if txn_code_col else None
-        
-        # Product Category
-        cat_col = mapping.get('product_category')
-        category = str(row.get(cat_col, 'General')) if cat_col else 'General'
-
-        transaction = Transaction(
-            customer_id=customer.id,
-            transaction_code=txn_code,
-            transaction_date=t_date,
-            amount=amount,
-            product_category=category
-        )
-        db.add(transaction)
-        processed_count += 1
-        
+            rows = workbook.active.iter_rows(values_only=True)
+            header = next(rows, None)
+            if header is None:
+                return
+            header = sheet_header(header)
+            batch = []
+            for row in rows:
+                batch.append(row)
+                if len(batch) >= chunk_size:
+                    yield pd.DataFrame(batch, columns=header)
+                    batch = []
+            if batch:
+                yield pd.DataFrame(batch, columns=header)
+        finally:
+            workbook.close()
+    elif filename.endswith('.xls'):
+        # Legacy binary workbooks have no streaming reader; they are small by format limits
+        yield pd.read_excel(path)
+    else:
+        raise ValueError("Unsupported file format")
+
+
+def _refresh_after_ingest(db: Session, touched_customers: set):
+    # Keep the RLFM feature store current for the customers in this file only
+    refresh_customer_features(db, touched_customers)
+    # One scoring pass for the whole file (opt-in, needs an active run)
+    segments = reassign_segments(db, touched_customers, "upload")
+    bump_data_version(db)
     db.commit()
-    return processed_count
+    return segments
+
+
+def _ingest_chunks(db: Session, chunks, mapping: dict, chunk_size: int = None, on_chunk_committed=None):
+    """Ingest every chunk, then refresh derived data once.
+
+    on_chunk_committed(i), when given, is called after chunk i is committed; each
+    chunk is then committed as a whole so a caller can resume after it.
+    """
+    started = time.perf_counter()
+    now = datetime.now()
+    processed_count = 0
+    touched_customers = set()
+
+    try:
+        for i, chunk in enumerate(chunks):
+            if i == 0:
+                validate_mapping(chunk.columns, mapping)
+            size = max(len(chunk), 1) if on_chunk_committed else chunk_size
+            count, _ = ingest_frame(db, chunk, mapping, size, now, touched_customers)
+            processed_count += count
+            if on_chunk_committed:
+                on_chunk_committed(i)
+    except Exception:
+        # Batches committed before the failure stay; derived data must include them
+        db.rollback()
+        if touched_customers:
+            _refresh_after_ingest(db, touched_customers)
+        raise
+
+    segments = _refresh_after_ingest(db, touched_customers)
+
+    elapsed = time.perf_counter() - started
+    return {
+        "count": processed_count,
+        "segments": segments,
+        "elapsed_seconds": round(elapsed, 3),
+        "rows_per_second": round(processed_count / elapsed, 1) if elapsed > 0 else None
+    }
+
+
+def process_upload_stream(
+    path: str,
+    filename: str,
+    db: Session,
+    mapping: dict = None,
+    chunk_size: int = None
+):
+    """Streaming variant of process_upload_file: peak memory follows chunk_size, not file size"""
+    return _ingest_chunks(db, iter_upload_chunks(path, filename, chunk_size), mapping, chunk_size)
+
+
+def process_upload_file(
+    file_contents: bytes,
+    filename: str,
+    db: Session,
+    mapping: dict = None,
+    chunk_size: int = None
+):
+    df = _read_upload_frame(file_contents, filename)
+    return _ingest_chunks(db, [df], mapping, chunk_size)
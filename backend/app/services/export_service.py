@@ -0,0 +1,183 @@
+import itertools
+import os
+import pandas as pd
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+from app.models.models import Customer, CustomerCluster, CustomerRLFM, Transaction
+from app.services.feature_store import store_is_populated
+from app.services.histogram_service import feature_expression
+from datetime import datetime
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # Parquet/Arrow exports are optional
+    pa = None
+    pq = None
+
+# Rows fetched per round trip / encoded per output chunk
+EXPORT_CHUNK_SIZE = int(os.getenv("EXPORT_CHUNK_SIZE", 10000))
+
+EXPORT_FORMATS = {
+    "csv": ("text/csv", "csv"),
+    "ndjson": ("application/x-ndjson", "ndjson"),
+    "parquet": ("application/vnd.apache.parquet", "parquet"),
+    "arrow": ("application/vnd.apache.arrow.stream", "arrows"),
+}
+
+RLFM_COLUMNS = ['customer_id', 'customer_code', 'recency', 'frequency', 'monetary', 'length', 'variety', 'updated_at']
+MEMBER_COLUMNS = ['customer_id', 'customer_code', 'name', 'cluster_label', 'total_spend']
+
+
+def check_format(fmt: str):
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Unknown format: {fmt}. Use one of {', '.join(EXPORT_FORMATS)}")
+    if fmt in ("parquet", "arrow") and pa is None:
+        raise ValueError(f"{fmt} export needs pyarrow installed")
+
+
+def iter_frames(query, columns: list, chunk_size: int = None):
+    """DataFrames of at most chunk_size rows from a server-side cursor"""
+    chunk_size = chunk_size or EXPORT_CHUNK_SIZE
+    rows = iter(query.execution_options(stream_results=True).yield_per(chunk_size))
+    first = True
+    while True:
+        batch = list(itertools.islice(rows, chunk_size))
+        if not batch and not first:
+            return
+        # An empty export still gets one (empty) frame so headers/schemas are written
+        yield pd.DataFrame(batch, columns=columns)
+        if not batch:
+            return
+        first = False
+
+
+def rlfm_features_query(db: Session, reference_date: datetime = None):
+    # Recency from last_date at read time, like the histograms
+    recency = feature_expression(db, 'recency', reference_date or datetime.now())
+    return db.query(
+        CustomerRLFM.customer_id,
+        Customer.customer_code,
+        recency,
+        CustomerRLFM.frequency,
+        CustomerRLFM.monetary,
+        CustomerRLFM.length,
+        CustomerRLFM.variety,
+        CustomerRLFM.updated_at
+    ).join(Customer, Customer.id == CustomerRLFM.customer_id)\
+     .order_by(CustomerRLFM.customer_id)
+
+
+def cluster_members_query(db: Session, run_id: int, cluster_label: int = None):
+    """Members of a run (optionally one cluster) with their lifetime spend"""
+    if store_is_populated(db):
+        # Spend is already aggregated per customer in the feature store
+        spend = func.coalesce(CustomerRLFM.monetary, 0.0)
+        query = db.query(
+            Customer.id, Customer.customer_code, Customer.name, CustomerCluster.cluster_label, spend
+        ).outerjoin(CustomerRLFM, CustomerRLFM.customer_id == Customer.id)
+    else:
+        # Correlated per member, so only the exported customers' transactions are read
+        spend = select(func.coalesce(func.sum(Transaction.amount), 0.0))\
+            .where(Transaction.customer_id == Customer.id)\
+            .scalar_subquery()
+        query = db.query(Customer.id, Customer.customer_code, Customer.name, CustomerCluster.cluster_label, spend)
+
+    query = query.join(CustomerCluster, CustomerCluster.customer_id == Customer.id)\
+        .filter(CustomerCluster.cluster_result_id == run_id)
+    if cluster_label is not None:
+        query = query.filter(CustomerCluster.cluster_label == cluster_label)
+    return query.order_by(CustomerCluster.cluster_label, Customer.id)
+
+
+class _ChunkSink:
+    """Write-only file for pyarrow writers; encoded bytes are drained after every chunk"""
+
+    closed = False
+
+    def __init__(self):
+        self._parts = []
+        self._position = 0
+
+    def write(self, data):
+        data = bytes(data)
+        self._parts.append(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        # Writers record absolute offsets (Parquet footer), so count drained bytes too
+        return self._position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def writable(self):
+        return True
+
+    def drain(self) -> bytes:
+        data = b"".join(self._parts)
+        self._parts = []
+        return data
+
+
+def _encode_csv(frames):
+    header = True
+    for frame in frames:
+        yield frame.to_csv(index=False, header=header, date_format="%Y-%m-%dT%H:%M:%S")
+        header = False
+
+
+def _encode_ndjson(frames):
+    for frame in frames:
+        if len(frame):
+            # Older pandas omit the trailing newline, which would glue chunks together
+            yield frame.to_json(orient="records", lines=True, date_format="iso").rstrip("\n") + "\n"
+
+
+def _arrow_table(frame: pd.DataFrame, schema=None):
+    # Text columns stay strings even when a chunk happens to be all-null
+    text = frame.select_dtypes(include="object").columns
+    frame = frame.astype({c: "string" for c in text})
+    table = pa.Table.from_pandas(frame, preserve_index=False)
+    if schema is not None and not table.schema.equals(schema):
+        table = table.cast(schema, safe=False)
+    return table
+
+
+def _encode_arrow(frames, fmt: str):
+    sink = _ChunkSink()
+    stream = pa.PythonFile(sink, mode="w")
+    writer = schema = None
+    for frame in frames:
+        table = _arrow_table(frame, schema)
+        if writer is None:
+            schema = table.schema
+            writer = pq.ParquetWriter(stream, schema) if fmt == "parquet" else pa.ipc.new_stream(stream, schema)
+        writer.write_table(table)
+        yield sink.drain()
+    if writer is not None:
+        writer.close()
+        yield sink.drain()
+
+
+def encode(frames, fmt: str):
+    """Generator of encoded chunks; only one chunk of rows is held in memory"""
+    if fmt == "csv":
+        return _encode_csv(frames)
+    if fmt == "ndjson":
+        return _encode_ndjson(frames)
+    return _encode_arrow(frames, fmt)
+
+
+def stream_export(frames, fmt: str, filename: str):
+    from fastapi.responses import StreamingResponse
+    media_type, extension = EXPORT_FORMATS[fmt]
+    return StreamingResponse(
+        encode(frames, fmt),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}.{extension}"'}
+    )
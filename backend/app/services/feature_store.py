@@ -0,0 +1,170 @@
+import numpy as np
+import pandas as pd
+from sqlalchemy.orm import Session
+from app.core.cache import bump_data_version
+from app.models.models import Customer, CustomerRLFM
+from app.services.backfill_state import is_backfilled, mark_backfilled
+from app.services.bulk_writer import insert_columns, upsert_statement
+from app.services.clustering_service import aggregate_customer_transactions, features_from_aggregates
+from datetime import datetime
+
+# Keep IN (...) lists well below SQLite's bound-parameter limit
+ID_CHUNK_SIZE = 500
+
+BACKFILL_NAME = "customer_rlfm"
+
+
+def _chunks(values: list, size: int = ID_CHUNK_SIZE):
+    for i in range(0, len(values), size):
+        yield values[i:i + size]
+
+
+def _store_columns(agg: pd.DataFrame, now: datetime) -> dict:
+    """Column arrays for customer_rlfm from per-customer aggregates"""
+    first_date = pd.to_datetime(agg['first_date'])
+    last_date = pd.to_datetime(agg['last_date'])
+    order_count = agg['order_count'].astype(int)
+    transaction_count = agg['transaction_count'].astype(int)
+    return {
+        "customer_id": agg.index.to_numpy(dtype='int64'),
+        "monetary": agg['monetary'].fillna(0).astype(float).to_numpy(),
+        "transaction_count": transaction_count.to_numpy(),
+        "order_count": order_count.to_numpy(),
+        "first_date": first_date.to_numpy(),
+        "last_date": last_date.to_numpy(),
+        "variety": agg['variety'].astype(float).to_numpy(),
+        # Snapshot values for display; readers re-derive recency from their own reference date
+        "frequency": order_count.where(order_count > 0, transaction_count).astype(float).to_numpy(),
+        "length": (last_date - first_date).dt.days.astype(float).to_numpy(),
+        "recency": (pd.Timestamp(now) - last_date).dt.days.astype(float).to_numpy(),
+        "updated_at": np.full(len(agg), now, dtype=object)
+    }
+
+
+def _store_mappings(agg: pd.DataFrame, now: datetime) -> list:
+    # Row dicts for bulk_update_mappings (native Python values)
+    return pd.DataFrame(_store_columns(agg, now)).astype(object).to_dict(orient='records')
+
+
+def refresh_customer_features(db: Session, customer_ids) -> int:
+    """Recompute the stored aggregates for the given customers only (no commit).
+
+    A store that was never backfilled is built in full instead, so it never
+    holds just the customers touched since it was created. The customers' rows
+    are locked before their transactions are aggregated, so a concurrent write
+    for the same customer waits and then aggregates including this one.
+    """
+    customer_ids = sorted({int(c) for c in customer_ids})
+    if not customer_ids:
+        return 0
+    if not store_is_populated(db):
+        return backfill_feature_store(db)
+
+    now = datetime.now()
+    refreshed = 0
+
+    statement = upsert_statement(db, CustomerRLFM.__table__)
+    if statement is not None:
+        table = CustomerRLFM.__table__
+        statement = statement.on_conflict_do_update(
+            index_elements=[table.c.customer_id],
+            # created_at keeps the first insert
+            set_={c.name: statement.excluded[c.name] for c in table.columns if c.name not in ("id", "customer_id", "created_at")}
+        )
+
+    for chunk in _chunks(customer_ids):
+        # Ordered, so concurrent writers lock shared customers in the same order
+        db.query(Customer.id).filter(Customer.id.in_(chunk)).order_by(Customer.id).with_for_update().all()
+        agg = aggregate_customer_transactions(db, customer_ids=chunk)
+        if agg is None:
+            continue
+
+        if statement is not None:
+            # New and existing customers in one statement; a concurrent insert becomes an update
+            rows = [{**mapping, "created_at": now} for mapping in _store_mappings(agg, now)]
+            db.execute(statement, rows)
+            refreshed += len(rows)
+        else:
+            refreshed += _insert_or_update(db, agg, chunk, now)
+
+    return refreshed
+
+
+def _insert_or_update(db: Session, agg: pd.DataFrame, chunk: list, now: datetime) -> int:
+    # Backends without ON CONFLICT; the customers are already locked
+    existing = dict(
+        db.query(CustomerRLFM.customer_id, CustomerRLFM.id)
+        .filter(CustomerRLFM.customer_id.in_(chunk))
+        .all()
+    )
+
+    inserts, updates = [], []
+    for mapping in _store_mappings(agg, now):
+        if mapping["customer_id"] in existing:
+            updates.append({**mapping, "id": existing[mapping["customer_id"]]})
+        else:
+            inserts.append({**mapping, "created_at": now})
+
+    if updates:
+        db.bulk_update_mappings(CustomerRLFM, updates)
+    if inserts:
+        db.bulk_insert_mappings(CustomerRLFM, inserts)
+    return len(updates) + len(inserts)
+
+
+def backfill_feature_store(db: Session) -> int:
+    """Full backfill of customer_rlfm from all transactions (no commit)"""
+    db.query(CustomerRLFM).delete()
+
+    count = 0
+    agg = aggregate_customer_transactions(db)
+    if agg is not None:
+        now = datetime.now()
+        columns = _store_columns(agg, now)
+        columns["created_at"] = columns["updated_at"]
+        count = insert_columns(db, CustomerRLFM.__table__, columns)
+    mark_backfilled(db, BACKFILL_NAME)
+    return count
+
+
+def rebuild_feature_store(db: Session) -> int:
+    count = backfill_feature_store(db)
+    bump_data_version(db)
+    db.commit()
+    return count
+
+
+def store_is_populated(db: Session) -> bool:
+    """True once the store was backfilled; later writes keep it complete"""
+    return is_backfilled(db, BACKFILL_NAME)
+
+
+def load_customer_features(db: Session, reference_date: datetime = None, customer_ids: list = None):
+    """Read RLFM features from the store in O(customers); same shape as get_customer_data"""
+    now = reference_date or datetime.now()
+
+    query = db.query(
+        CustomerRLFM.customer_id.label('id'),
+        Customer.customer_code,
+        CustomerRLFM.monetary,
+        CustomerRLFM.first_date,
+        CustomerRLFM.last_date,
+        CustomerRLFM.variety,
+        CustomerRLFM.order_count,
+        CustomerRLFM.transaction_count
+    ).join(Customer, Customer.id == CustomerRLFM.customer_id)
+
+    if customer_ids is not None:
+        query = query.filter(CustomerRLFM.customer_id.in_(customer_ids))
+
+    rows = query.order_by(CustomerRLFM.customer_id).all()
+    if not rows:
+        return None, None
+
+    agg = pd.DataFrame(rows, columns=[
+        'id', 'customer_code', 'monetary', 'first_date', 'last_date',
+        'variety', 'order_count', 'transaction_count'
+    ]).set_index('id')
+
+    has_txn_code = bool((agg['order_count'] > 0).any())
+    return features_from_aggregates(agg, now, has_txn_code), agg[['customer_code']]
@@ -0,0 +1,116 @@
+import numpy as np
+from sqlalchemy import Float, Integer, case, cast, func, literal
+from sqlalchemy.dialects.postgresql import ARRAY, array
+from sqlalchemy.orm import Session
+from app.models.models import CustomerRLFM
+from datetime import datetime
+
+HISTOGRAM_FEATURES = ('recency', 'frequency', 'monetary', 'length', 'variety')
+HISTOGRAM_SCALES = ('linear', 'log', 'quantile')
+MAX_BINS = 100
+
+
+def _is_postgres(db: Session) -> bool:
+    return db.get_bind().dialect.name == "postgresql"
+
+
+def feature_expression(db: Session, feature: str, now: datetime):
+    """SQL expression for one RLFM feature over the customer_rlfm store"""
+    if feature == 'recency':
+        # Derived from last_date at read time, like load_customer_features
+        if _is_postgres(db):
+            return func.floor(func.extract('epoch', literal(now) - CustomerRLFM.last_date) / 86400)
+        return cast(func.julianday(literal(now.isoformat(sep=' '))) - func.julianday(CustomerRLFM.last_date), Integer)
+    if feature in HISTOGRAM_FEATURES:
+        return getattr(CustomerRLFM, feature)
+    raise ValueError(f"Unknown feature: {feature}")
+
+
+def bin_edges(low: float, high: float, bins: int, scale: str) -> np.ndarray:
+    if scale == 'log':
+        # log1p spacing so zeros (recency 0, no variety) stay representable
+        edges = np.expm1(np.linspace(np.log1p(max(low, 0.0)), np.log1p(max(high, 0.0)), bins + 1))
+    else:
+        edges = np.linspace(low, high, bins + 1)
+    # Exact outer edges (expm1/log1p round-trips drift), negatives join the first bin
+    edges[0], edges[-1] = low, high
+    return edges
+
+
+def bucket_expression(db: Session, expr, edges: np.ndarray):
+    """1-based bin number; values outside the edges fall into the first/last bin"""
+    bins = len(edges) - 1
+    if _is_postgres(db):
+        # width_bucket(value, thresholds) counts the lower bounds <= value
+        thresholds = cast(array([float(e) for e in edges[:-1]]), ARRAY(Float))
+        return func.least(func.greatest(func.width_bucket(expr, thresholds), 1), bins)
+    return case(
+        *[(expr < float(edges[i + 1]), i + 1) for i in range(bins - 1)],
+        else_=bins
+    )
+
+
+def _format(start: float, end: float, count: int) -> dict:
+    return {"range": f"{int(start)}-{int(end)}", "start": float(start), "end": float(end), "count": int(count)}
+
+
+def _quantile_histogram(db: Session, expr, bins: int) -> list:
+    # ntile() gives equal-count bins in one sorted pass on both backends
+    ranked = db.query(
+        expr.label('value'),
+        func.ntile(bins).over(order_by=expr).label('bucket')
+    ).filter(expr.isnot(None)).subquery()
+
+    rows = db.query(
+        ranked.c.bucket,
+        func.min(ranked.c.value),
+        func.max(ranked.c.value),
+        func.count()
+    ).group_by(ranked.c.bucket).order_by(ranked.c.bucket).all()
+    return [_format(low, high, count) for _, low, high, count in rows]
+
+
+def feature_histogram(
+    db: Session,
+    feature: str,
+    bins: int = 10,
+    scale: str = 'linear',
+    reference_date: datetime = None,
+    skip_empty: bool = False
+) -> list:
+    """Histogram over every customer in the store; O(bins) rows come back from the database"""
+    if scale not in HISTOGRAM_SCALES:
+        raise ValueError(f"Unknown scale: {scale}")
+    bins = max(1, min(int(bins), MAX_BINS))
+    expr = feature_expression(db, feature, reference_date or datetime.now())
+
+    if scale == 'quantile':
+        return _quantile_histogram(db, expr, bins)
+
+    low, high, total = db.query(func.min(expr), func.max(expr), func.count(expr)).one()
+    if not total:
+        return []
+    low, high = float(low), float(high)
+    if high <= low:
+        return [_format(low, high, total)]
+
+    edges = bin_edges(low, high, bins, scale)
+    bucket = bucket_expression(db, expr, edges).label('bucket')
+    counts = dict(
+        db.query(bucket, func.count())
+        .filter(expr.isnot(None))
+        .group_by(bucket)
+        .all()
+    )
+
+    histogram = [_format(edges[i], edges[i + 1], counts.get(i + 1, 0)) for i in range(bins)]
+    if skip_empty:
+        histogram = [h for h in histogram if h["count"] > 0]
+    return histogram
+
+
+def ensure_feature_store(db: Session):
+    """One-time backfill so histograms cover the whole population"""
+    from app.services.feature_store import rebuild_feature_store, store_is_populated
+    if not store_is_populated(db):
+        rebuild_feature_store(db)
@@ -0,0 +1,271 @@
+import multiprocessing
+import os
+import socket
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from sqlalchemy.orm import Session
+from app.core.database import SessionLocal
+from app.models.models import ClusteringJob
+
+# Upper bound on concurrent clustering fits per API process
+MAX_WORKERS = int(os.getenv("CLUSTERING_MAX_WORKERS", 2))
+
+ACTIVE_STATUSES = ("queued", "running")
+FINAL_STATUSES = ("completed", "failed", "cancelled")
+
+_executor = None
+_futures = {}
+
+
+class JobCancelled(Exception):
+    pass
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        # "spawn" so workers never inherit the parent's open database connections
+        _executor = ProcessPoolExecutor(
+            max_workers=MAX_WORKERS,
+            mp_context=multiprocessing.get_context("spawn")
+        )
+    return _executor
+
+
+def job_owner() -> str:
+    """Identifies this API process; its pool is the only one that can run the jobs it submitted"""
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def _process_alive(pid: int) -> bool:
+    if os.name == "nt":
+        # Signal 0 is CTRL_C_EVENT on Windows; ask for the exit code instead
+        import ctypes
+        kernel32 = ctypes.windll.kernel32
+        handle = kernel32.OpenProcess(0x1000, False, pid)  # PROCESS_QUERY_LIMITED_INFORMATION
+        if not handle:
+            return False
+        code = ctypes.c_ulong()
+        kernel32.GetExitCodeProcess(handle, ctypes.byref(code))
+        kernel32.CloseHandle(handle)
+        return code.value == 259  # STILL_ACTIVE
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def owner_alive(owner: str) -> bool:
+    """False when the owning process is known to be gone; owners on other hosts are assumed alive"""
+    if not owner:
+        return False  # submitted before jobs recorded their owner
+    host, _, pid = owner.rpartition(":")
+    if host != socket.gethostname():
+        return True
+    if owner == job_owner():
+        return True
+    try:
+        return _process_alive(int(pid))
+    except ValueError:
+        return False
+
+
+def recover_orphaned_jobs(db: Session) -> int:
+    """Fail queued/running jobs whose API process died with them; returns how many.
+
+    A job only runs in the pool of the process that submitted it, so after a
+    restart or crash nothing would ever move it out of queued/running.
+    """
+    jobs = db.query(ClusteringJob).filter(ClusteringJob.status.in_(ACTIVE_STATUSES)).all()
+    orphaned = [job for job in jobs if job.id not in _futures and not owner_alive(job.owner)]
+    for job in orphaned:
+        job.status = "failed"
+        job.message = "Failed"
+        job.error = "Interrupted: the server restarted before the job finished"
+        job.finished_at = datetime.utcnow()
+    db.commit()
+    return len(orphaned)
+
+
+def _job_done(job_id: str, future):
+    _futures.pop(job_id, None)
+    error = None if future.cancelled() else future.exception()
+    if error is None:
+        return
+    # The worker died (e.g. a broken pool) before it could record an outcome
+    db = SessionLocal()
+    try:
+        db.query(ClusteringJob).filter(ClusteringJob.id == job_id, ClusteringJob.status.in_(ACTIVE_STATUSES)).update({
+            ClusteringJob.status: "failed",
+            ClusteringJob.message: "Failed",
+            ClusteringJob.error: str(error) or type(error).__name__,
+            ClusteringJob.finished_at: datetime.utcnow()
+        }, synchronize_session=False)
+        db.commit()
+    finally:
+        db.close()
+
+
+def job_to_dict(job: ClusteringJob) -> dict:
+    return {
+        "job_id": job.id,
+        "status": job.status,
+        "progress": job.progress,
+        "message": job.message,
+        "run_name": job.run_name,
+        "algorithm": job.algorithm,
+        "result": job.result,
+        "error": job.error,
+        "run_id": job.cluster_result_id,
+        "created_by": job.created_by,
+        "created_at": job.created_at,
+        "started_at": job.started_at,
+        "finished_at": job.finished_at
+    }
+
+
+def submit_clustering_job(db: Session, request: dict, created_by: str = None) -> ClusteringJob:
+    """Persist a queued job and hand it to the process pool; returns immediately.
+
+    A request with "kind": "sweep" runs a parameter sweep (sweep_service.run_sweep)
+    instead of a single fit; it is polled and cancelled like any other job.
+    """
+    job = ClusteringJob(
+        id=uuid.uuid4().hex,
+        status="queued",
+        progress=0.0,
+        message="Queued",
+        run_name=request.get("run_name"),
+        algorithm=request.get("algorithm") or request.get("kind"),
+        request=request,
+        created_by=created_by,
+        owner=job_owner()
+    )
+    db.add(job)
+    db.commit()
+
+    job_id = job.id
+    future = get_executor().submit(execute_clustering_job, job_id)
+    _futures[job_id] = future
+    future.add_done_callback(lambda f: _job_done(job_id, f))
+    return job
+
+
+def cancel_job(db: Session, job_id: str):
+    job = db.get(ClusteringJob, job_id)
+    if job is None or job.status in FINAL_STATUSES:
+        return job
+
+    future = _futures.get(job_id)
+    if job.status == "queued" and future is not None and future.cancel():
+        job.status = "cancelled"
+        job.message = "Cancelled before start"
+        job.finished_at = datetime.utcnow()
+    elif future is None and not owner_alive(job.owner):
+        # Nothing will ever reach the next checkpoint
+        job.status = "cancelled"
+        job.message = "Cancelled"
+        job.finished_at = datetime.utcnow()
+    else:
+        # Running (or queued in another worker process): the job stops at its next checkpoint
+        job.cancel_requested = True
+        job.message = "Cancellation requested"
+    db.commit()
+    db.refresh(job)
+    return job
+
+
+def _update_job(job_id: str, **values):
+    db = SessionLocal()
+    try:
+        db.query(ClusteringJob).filter(ClusteringJob.id == job_id).update(values)
+        db.commit()
+    finally:
+        db.close()
+
+
+def _cancel_requested(job_id: str) -> bool:
+    db = SessionLocal()
+    try:
+        return bool(db.query(ClusteringJob.cancel_requested).filter(ClusteringJob.id == job_id).scalar())
+    finally:
+        db.close()
+
+
+def execute_clustering_job(job_id: str):
+    """Worker entry point: runs inside the process pool with its own sessions"""
+    from app.services.clustering_service import run_clustering
+    from app.services.sweep_service import run_sweep
+
+    db = SessionLocal()
+    try:
+        job = db.get(ClusteringJob, job_id)
+        if job is None or job.status != "queued":
+            return
+        request = dict(job.request or {})
+        db.close()
+
+        if _cancel_requested(job_id):
+            raise JobCancelled()
+
+        _update_job(job_id, status="running", message="Starting", started_at=datetime.utcnow())
+
+        # Progress is written through a separate session so it never commits the run's own work
+        def progress(fraction, message):
+            if _cancel_requested(job_id):
+                raise JobCancelled()
+            _update_job(job_id, progress=round(float(fraction), 3), message=message)
+
+        db = SessionLocal()
+        if request.get("kind") == "sweep":
+            result = run_sweep(
+                db,
+                request["grid"],
+                start_date=_parse_date(request.get("start_date")),
+                end_date=_parse_date(request.get("end_date")),
+                max_workers=request.get("max_workers"),
+                save_best=request.get("save_best", False),
+                run_name=request.get("run_name"),
+                progress_callback=progress
+            )
+            run_id = result.get("saved_run_id")
+        else:
+            result = run_clustering(
+                request["algorithm"],
+                request.get("params") or {},
+                db,
+                request.get("run_name"),
+                start_date=_parse_date(request.get("start_date")),
+                end_date=_parse_date(request.get("end_date")),
+                save_result=request.get("save_result", True),
+                progress_callback=progress,
+                fit_sample_size=request.get("fit_sample_size")
+            )
+            run_id = result.get("run_id")
+        _update_job(
+            job_id,
+            status="completed",
+            progress=1.0,
+            message="Completed",
+            result=result,
+            cluster_result_id=run_id,
+            finished_at=datetime.utcnow()
+        )
+    except JobCancelled:
+        db.rollback()
+        _update_job(job_id, status="cancelled", message="Cancelled", finished_at=datetime.utcnow())
+    except Exception as e:
+        db.rollback()
+        _update_job(job_id, status="failed", message="Failed", error=str(e), finished_at=datetime.utcnow())
+    finally:
+        db.close()
+
+
+def _parse_date(value):
+    if not value:
+        return None
+    return datetime.fromisoformat(str(value))
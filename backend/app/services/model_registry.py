@@ -0,0 +1,232 @@
+import json
+import os
+import shutil
+import threading
+from collections import OrderedDict
+import joblib
+import numpy as np
+
+# One directory per saved run: meta.json, scaler/centroid arrays (.npy) and the estimator
+MODEL_STORE_DIR = os.getenv("MODEL_STORE_DIR", "model_store")
+
+# Loaded models kept per worker process
+MODEL_CACHE_SIZE = int(os.getenv("MODEL_CACHE_SIZE", 8))
+
+# Upper bound on customers/vectors per scoring request
+ASSIGN_MAX_ITEMS = int(os.getenv("ASSIGN_MAX_ITEMS", 10000))
+
+ARRAYS = ("scaler_mean", "scaler_scale", "centroids", "centroid_labels", "core_points", "core_labels")
+
+
+def run_directory(run_id: int) -> str:
+    return os.path.join(MODEL_STORE_DIR, f"run_{run_id}")
+
+
+def save_model(run_id: int, model, scaler, features: list, X_fit: np.ndarray, fit_labels,
+               algorithm: str, variant: str, X: np.ndarray = None, labels=None) -> str:
+    """Persist everything needed to score new customers against a run; returns the directory.
+
+    X_fit/fit_labels are what the estimator was fitted on (a sample in sample-fit mode);
+    centroids come from X/labels (every customer) when given.
+    """
+    X = X_fit if X is None else X
+    labels = np.asarray(fit_labels if labels is None else labels)
+    fit_labels = np.asarray(fit_labels)
+
+    clusters = np.unique(labels[labels >= 0])
+    arrays = {
+        "scaler_mean": np.asarray(scaler.mean_, dtype=float),
+        "scaler_scale": np.asarray(scaler.scale_, dtype=float),
+        # Scaled space, one row per cluster (noise excluded)
+        "centroids": np.vstack([X[labels == c].mean(axis=0) for c in clusters]) if len(clusters) else np.empty((0, X.shape[1])),
+        "centroid_labels": clusters.astype(np.int64),
+    }
+
+    core_indices = getattr(model, 'core_sample_indices_', None)
+    if core_indices is not None:
+        # DBSCAN has no predict(): new points join the nearest core point within eps
+        arrays["core_points"] = np.ascontiguousarray(X_fit[core_indices])
+        arrays["core_labels"] = fit_labels[core_indices].astype(np.int64)
+
+    has_predict = hasattr(model, 'predict')
+    meta = {
+        "run_id": run_id,
+        "algorithm": algorithm,
+        "variant": variant,
+        "features": list(features),
+        "method": "predict" if has_predict else ("core_points" if core_indices is not None else "centroids"),
+        "eps": float(getattr(model, 'eps', 0.0)) if core_indices is not None else None
+    }
+
+    # Written to a temporary directory and renamed, so readers never see a partial model
+    directory = run_directory(run_id)
+    tmp = f"{directory}.tmp{os.getpid()}"
+    shutil.rmtree(tmp, ignore_errors=True)
+    os.makedirs(tmp)
+    for name, array in arrays.items():
+        np.save(os.path.join(tmp, f"{name}.npy"), array)
+    if has_predict:
+        # Uncompressed so its arrays can be memory-mapped on load
+        joblib.dump(model, os.path.join(tmp, "estimator.joblib"))
+    with open(os.path.join(tmp, "meta.json"), "w") as f:
+        json.dump(meta, f)
+
+    shutil.rmtree(directory, ignore_errors=True)
+    os.replace(tmp, directory)
+    model_cache.evict(run_id)
+    return directory
+
+
+class LoadedModel:
+    """Memory-mapped artifacts of one run, ready to score"""
+
+    def __init__(self, directory: str):
+        with open(os.path.join(directory, "meta.json")) as f:
+            self.meta = json.load(f)
+        self.features = self.meta["features"]
+        self.arrays = {}
+        for name in ARRAYS:
+            path = os.path.join(directory, f"{name}.npy")
+            if os.path.exists(path):
+                self.arrays[name] = np.load(path, mmap_mode='r')
+        self.estimator = None
+        if self.meta["method"] == "predict":
+            self.estimator = joblib.load(os.path.join(directory, "estimator.joblib"), mmap_mode='r')
+        self._index = None
+        self._lock = threading.Lock()
+
+    def _nearest(self, points, X):
+        # Built once per loaded model, then reused for every request
+        with self._lock:
+            if self._index is None:
+                from sklearn.neighbors import NearestNeighbors
+                self._index = NearestNeighbors(n_neighbors=1).fit(np.asarray(points))
+        return self._index.kneighbors(X)
+
+    def transform(self, X: np.ndarray) -> np.ndarray:
+        return (np.asarray(X, dtype=float) - self.arrays["scaler_mean"]) / self.arrays["scaler_scale"]
+
+    def assign(self, X: np.ndarray) -> np.ndarray:
+        """Cluster labels for raw feature rows (columns in self.features order)"""
+        X = self.transform(X)
+        if len(X) == 0:
+            return np.empty(0, dtype=np.int64)
+
+        method = self.meta["method"]
+        if method == "predict":
+            return np.asarray(self.estimator.predict(X), dtype=np.int64)
+        if method == "core_points":
+            labels = np.full(len(X), -1, dtype=np.int64)
+            if len(self.arrays["core_points"]) == 0:
+                return labels
+            distances, nearest = self._nearest(self.arrays["core_points"], X)
+            within = distances[:, 0] <= self.meta["eps"]
+            labels[within] = np.asarray(self.arrays["core_labels"])[nearest[within, 0]]
+            return labels
+        if len(self.arrays["centroids"]) == 0:
+            return np.full(len(X), -1, dtype=np.int64)
+        _, nearest = self._nearest(self.arrays["centroids"], X)
+        return np.asarray(self.arrays["centroid_labels"])[nearest[:, 0]]
+
+
+class ModelCache:
+    """Per-process LRU of loaded models keyed by run id"""
+
+    def __init__(self, max_entries: int = MODEL_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, run_id: int):
+        with self._lock:
+            model = self._entries.get(run_id)
+            if model is not None:
+                self._entries.move_to_end(run_id)
+                return model
+
+        directory = run_directory(run_id)
+        if not os.path.exists(os.path.join(directory, "meta.json")):
+            return None
+        model = LoadedModel(directory)
+        with self._lock:
+            self._entries[run_id] = model
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return model
+
+    def evict(self, run_id: int):
+        with self._lock:
+            self._entries.pop(run_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+model_cache = ModelCache()
+
+
+def load_model(run_id: int):
+    """LoadedModel for a run, or None when the run predates the registry"""
+    return model_cache.get(run_id)
+
+
+def delete_model(run_id: int):
+    model_cache.evict(run_id)
+    shutil.rmtree(run_directory(run_id), ignore_errors=True)
+
+
+def _vector_matrix(vectors: list, features: list) -> np.ndarray:
+    rows = []
+    for i, vector in enumerate(vectors):
+        if isinstance(vector, dict):
+            missing = [f for f in features if f not in vector]
+            if missing:
+                raise ValueError(f"vectors[{i}] is missing {', '.join(missing)}")
+            vector = [vector[f] for f in features]
+        if len(vector) != len(features):
+            raise ValueError(f"vectors[{i}] must have {len(features)} values ({', '.join(features)})")
+        rows.append(vector)
+    return np.asarray(rows, dtype=float).reshape(len(rows), len(features))
+
+
+def score(db, run_id: int, customer_codes: list = None, vectors: list = None) -> dict:
+    """Assign customers (by code, from the feature store) and/or raw feature rows to a saved run's clusters"""
+    from app.models.models import ClusterResult, Customer
+    from app.services.feature_store import load_customer_features
+    from app.services.histogram_service import ensure_feature_store
+
+    customer_codes = list(dict.fromkeys(customer_codes or []))
+    vectors = vectors or []
+    if not customer_codes and not vectors:
+        raise ValueError("Provide customer_codes or vectors")
+    if len(customer_codes) + len(vectors) > ASSIGN_MAX_ITEMS:
+        raise ValueError(f"At most {ASSIGN_MAX_ITEMS} customers per request")
+    if db.get(ClusterResult, run_id) is None:
+        raise LookupError("Run not found")
+    model = load_model(run_id)
+    if model is None:
+        raise LookupError("Run has no saved model; re-run clustering to enable scoring")
+
+    assignments, missing = [], []
+    if customer_codes:
+        ensure_feature_store(db)
+        ids = dict(
+            db.query(Customer.id, Customer.customer_code)
+            .filter(Customer.customer_code.in_(customer_codes))
+            .all()
+        )
+        features_df, customer_map = load_customer_features(db, customer_ids=list(ids)) if ids else (None, None)
+        found = set()
+        if features_df is not None:
+            labels = model.assign(features_df[model.features].to_numpy(dtype=float))
+            for code, label in zip(customer_map['customer_code'], labels):
+                assignments.append({"customer_code": code, "cluster": int(label)})
+                found.add(code)
+        missing = [code for code in customer_codes if code not in found]
+
+    if vectors:
+        labels = model.assign(_vector_matrix(vectors, model.features))
+        assignments += [{"index": i, "cluster": int(label)} for i, label in enumerate(labels)]
+
+    return {"run_id": run_id, "features": model.features, "assignments": assignments, "missing": missing}
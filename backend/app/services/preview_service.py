@@ -0,0 +1,250 @@
+import csv
+import io
+import os
+import re
+import pandas as pd
+from datetime import date, datetime
+
+# Bytes read from the start of a file to preview it (CSV text / decompressed sheet XML)
+PREVIEW_SNIFF_BYTES = int(os.getenv("PREVIEW_SNIFF_BYTES", 64 * 1024))
+
+# Rows used to infer column types; the first PREVIEW_SAMPLE_ROWS of them are returned
+PREVIEW_INFER_ROWS = int(os.getenv("PREVIEW_INFER_ROWS", 200))
+PREVIEW_SAMPLE_ROWS = 5
+
+CSV_DELIMITERS = ",;\t|"
+
+# Row start tags in sheet XML (some writers use a namespace prefix)
+SHEET_ROW_TAG = re.compile(rb"<(?:\w+:)?row[ >]")
+SHEET_DIMENSION = re.compile(rb"<(?:\w+:)?dimension ref=\"[A-Z]+\d+(?::[A-Z]+(\d+))?\"")
+
+
+def sniff_csv(head: bytes) -> dict:
+    """read_csv options (sep, encoding) guessed from the first bytes of a CSV"""
+    encoding = "utf-8-sig"
+    try:
+        text = head.decode(encoding)
+    except UnicodeDecodeError as e:
+        if e.start >= len(head) - 3:
+            # Only a multibyte character cut off by the sample boundary
+            text = head[:e.start].decode(encoding)
+        else:
+            encoding = "latin-1"
+            text = head.decode(encoding)
+
+    # Complete lines only, a cut-off last line skews the delimiter counts
+    if "\n" in text:
+        text = text[:text.rindex("\n")]
+    try:
+        sep = csv.Sniffer().sniff(text, delimiters=CSV_DELIMITERS).delimiter
+    except csv.Error:
+        sep = ","
+    return {"sep": sep, "encoding": encoding}
+
+
+def sheet_header(row) -> list:
+    return [str(h) if h is not None else f"Unnamed: {i}" for i, h in enumerate(row or [])]
+
+
+def infer_column_type(values: pd.Series) -> str:
+    present = values.dropna()
+    if present.empty:
+        return "empty"
+    kind = pd.api.types.infer_dtype(present, skipna=True)
+    if kind == "integer":
+        return "integer"
+    if kind == "floating":
+        # ID columns with gaps come back as floats (17850.0)
+        return "integer" if (present % 1 == 0).all() else "float"
+    if kind in ("mixed-integer-float", "decimal"):
+        return "float"
+    if kind == "boolean":
+        return "boolean"
+    if kind in ("datetime64", "datetime", "date"):
+        return "datetime"
+    if kind == "string" and pd.to_datetime(present, errors="coerce", format="mixed").notna().all():
+        return "datetime"
+    return "string"
+
+
+def _sample_records(df: pd.DataFrame) -> list:
+    sample = df.head(PREVIEW_SAMPLE_ROWS).astype(object)
+    sample = sample.where(sample.notna(), None).to_dict(orient="records")
+    # Convert dates to string in sample for JSON serializability
+    for row in sample:
+        for k, v in row.items():
+            if isinstance(v, (datetime, date, pd.Timestamp)):
+                row[k] = str(v)
+    return sample
+
+
+def _file_size(fileobj) -> int:
+    fileobj.seek(0, os.SEEK_END)
+    size = fileobj.tell()
+    fileobj.seek(0)
+    return size
+
+
+def _preview_csv(fileobj) -> dict:
+    size = _file_size(fileobj)
+    head = fileobj.read(PREVIEW_SNIFF_BYTES)
+    complete = len(head) >= size
+    if not complete and b"\n" in head:
+        head = head[:head.rindex(b"\n") + 1]
+
+    options = sniff_csv(head)
+    df = pd.read_csv(io.BytesIO(head), **options)
+
+    if complete:
+        estimated_rows = len(df)
+    elif len(df):
+        # Average bytes per data row in the sample, extrapolated to the file size
+        header_bytes = head.index(b"\n") + 1
+        per_row = (len(head) - header_bytes) / len(df)
+        estimated_rows = round((size - header_bytes) / per_row)
+    else:
+        estimated_rows = None
+
+    return {
+        "frame": df.head(PREVIEW_INFER_ROWS),
+        "estimated_rows": estimated_rows,
+        "rows_exact": complete,
+        "delimiter": options["sep"],
+        "encoding": options["encoding"]
+    }
+
+
+def _sheet_row_count(archive, path: str):
+    """(rows excluding the header, exact?) from the start of a sheet's XML"""
+    total = archive.getinfo(path).file_size
+    with archive.open(path) as source:
+        head = source.read(PREVIEW_SNIFF_BYTES)
+
+    # Writers normally record the used range; it includes the header
+    dimension = SHEET_DIMENSION.search(head)
+    if dimension and dimension.group(1):
+        return max(int(dimension.group(1)) - 1, 0), False
+
+    # Otherwise extrapolate from the row tags seen so far
+    starts = [m.start() for m in SHEET_ROW_TAG.finditer(head)]
+    if len(head) >= total:
+        return max(len(starts) - 1, 0), True
+    if len(starts) < 2:
+        return None, False
+    per_row = (starts[-1] - starts[0]) / (len(starts) - 1)
+    return max(round((total - starts[0]) / per_row) - 1, 0), False
+
+
+def _parse_first_sheet_rows(fileobj, limit: int):
+    """First rows of the active sheet, parsed lazily from its XML.
+
+    openpyxl's read-only worksheets look for <dimension> on construction and scan
+    the whole sheet when a (streaming) writer left it out, so the workbook parts
+    are read here and only the sheet parser is driven. Shared strings are still
+    loaded in full; they grow with distinct values, not with rows.
+    """
+    from openpyxl.reader.excel import ExcelReader
+    from openpyxl.styles.stylesheet import apply_stylesheet
+    from openpyxl.worksheet._reader import WorkSheetParser
+
+    reader = ExcelReader(fileobj, read_only=True, data_only=True)
+    try:
+        reader.read_manifest()
+        reader.read_strings()
+        reader.read_workbook()
+        # Needed to tell dates from numbers
+        apply_stylesheet(reader.archive, reader.wb)
+
+        sheets = [rel for _, rel in reader.parser.find_sheets() if rel.target in reader.valid_files]
+        active = sheets[reader.wb._active_sheet_index] if reader.wb._active_sheet_index < len(sheets) else None
+        if active is None or "chartsheet" in active.Type:
+            active = next((rel for rel in sheets if "chartsheet" not in rel.Type), None)
+        if active is None:
+            return [], None, False
+
+        rows = []
+        with reader.archive.open(active.target) as source:
+            parser = WorkSheetParser(
+                source, reader.shared_strings, data_only=True, epoch=reader.wb.epoch,
+                date_formats=reader.wb._date_formats, timedelta_formats=reader.wb._timedelta_formats
+            )
+            for _, cells in parser.parse():
+                values = [None] * max((c['column'] for c in cells), default=0)
+                for c in cells:
+                    values[c['column'] - 1] = c['value']
+                rows.append(values)
+                if len(rows) >= limit:
+                    break
+        estimated_rows, rows_exact = _sheet_row_count(reader.archive, active.target)
+    finally:
+        reader.archive.close()
+    return rows, estimated_rows, rows_exact
+
+
+def _load_first_sheet_rows(fileobj, limit: int):
+    """Same as _parse_first_sheet_rows through openpyxl's public API"""
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(fileobj, read_only=True, data_only=True)
+    try:
+        sheet = workbook.active
+        rows = [list(row) for row in sheet.iter_rows(max_row=limit, values_only=True)]
+        # Read from <dimension>, or counted by the scan the worksheet already did
+        estimated_rows = max(sheet.max_row - 1, 0) if sheet.max_row else None
+    finally:
+        workbook.close()
+    return rows, estimated_rows, False
+
+
+def _first_sheet_rows(fileobj, limit: int):
+    """(first rows of the active sheet, estimated rows, exact?)"""
+    try:
+        return _parse_first_sheet_rows(fileobj, limit)
+    except (ImportError, AttributeError, TypeError):
+        # The parser relies on openpyxl internals; if a release moves them, fall
+        # back to a read-only workbook (slower on sheets without <dimension>)
+        fileobj.seek(0)
+        return _load_first_sheet_rows(fileobj, limit)
+
+
+def _preview_xlsx(fileobj) -> dict:
+    rows, estimated_rows, rows_exact = _first_sheet_rows(fileobj, PREVIEW_INFER_ROWS + 1)
+    width = max((len(r) for r in rows), default=0)
+    rows = [r + [None] * (width - len(r)) for r in rows]
+    header = sheet_header(rows[0] if rows else None)
+    df = pd.DataFrame(rows[1:], columns=header)
+
+    if len(rows) <= PREVIEW_INFER_ROWS:
+        # The whole sheet was read
+        estimated_rows, rows_exact = len(df), True
+    return {"frame": df, "estimated_rows": estimated_rows, "rows_exact": rows_exact}
+
+
+def preview_upload(fileobj, filename: str) -> dict:
+    """Columns, inferred types, a sample and an estimated row count.
+
+    Reads the first PREVIEW_SNIFF_BYTES of a CSV or the first PREVIEW_INFER_ROWS
+    rows of a workbook, so the cost does not grow with the file. fileobj must be
+    seekable (an UploadFile's spooled file or an open file).
+    """
+    if filename.endswith('.csv'):
+        result = _preview_csv(fileobj)
+    elif filename.endswith('.xlsx'):
+        result = _preview_xlsx(fileobj)
+    elif filename.endswith('.xls'):
+        # Legacy binary workbooks have no streaming reader; they are small by format limits
+        result = {"frame": pd.read_excel(fileobj, nrows=PREVIEW_INFER_ROWS), "estimated_rows": None, "rows_exact": False}
+    else:
+        raise ValueError("Unsupported file format")
+
+    df = result.pop("frame")
+    return {
+        "columns": [str(c) for c in df.columns],
+        "types": {str(c): infer_column_type(df[c]) for c in df.columns},
+        "sample": _sample_records(df),
+        **result
+    }
+
+
+def preview_upload_file(file_contents: bytes, filename: str) -> dict:
+    return preview_upload(io.BytesIO(file_contents), filename)
@@ -0,0 +1,301 @@
+import itertools
+import os
+import numpy as np
+import pandas as pd
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+from app.core.cache import bump_data_version
+from app.models.models import SalesRollup, Transaction
+from app.services.backfill_state import is_backfilled, mark_backfilled
+from app.services.bulk_writer import upsert_statement
+from app.services.sketch import HyperLogLog, hash_values
+from datetime import datetime
+
+# Monthly rows are always maintained; daily rows are opt-in (~30x more rows)
+ROLLUP_GRANULARITIES = ("month", "day") if os.getenv("SALES_ROLLUP_DAILY", "0") == "1" else ("month",)
+
+REBUILD_CHUNK_SIZE = int(os.getenv("SALES_ROLLUP_REBUILD_CHUNK", 100000))
+
+# Keep IN (...) lists well below SQLite's bound-parameter limit
+PERIOD_CHUNK_SIZE = 500
+
+DATE_FORMATS = {"month": "%Y-%m", "day": "%Y-%m-%d"}
+
+BACKFILL_NAME = "sales_rollup"
+
+
+def period_start(dates: pd.Series, granularity: str) -> pd.Series:
+    dates = pd.to_datetime(dates)
+    if dates.dt.tz is not None:
+        # Rollup periods are naive, like transaction_date
+        dates = dates.dt.tz_convert(None)
+    if granularity == "month":
+        return dates.dt.to_period("M").dt.start_time
+    if granularity == "day":
+        return dates.dt.normalize()
+    raise ValueError(f"Unknown granularity: {granularity}")
+
+
+def summarize_transactions(frame: pd.DataFrame, granularities=None) -> dict:
+    """{(period, granularity, category): [amount, count, sketch]} for customer_id/transaction_date/amount/product_category rows"""
+    summary = {}
+    frame = frame[pd.to_datetime(frame['transaction_date']).notna()]
+    if frame.empty:
+        return summary
+
+    categories = frame['product_category'].fillna('').astype(str).to_numpy()
+    amounts = frame['amount'].astype(float).to_numpy()
+    index, rank = HyperLogLog().register_updates(hash_values(frame['customer_id'].astype('int64')))
+
+    for granularity in granularities or ROLLUP_GRANULARITIES:
+        keys = pd.DataFrame({
+            'period': period_start(frame['transaction_date'], granularity).to_numpy(),
+            'category': categories,
+            'amount': amounts
+        })
+        groups = keys.groupby(['period', 'category'], sort=False)
+        codes = groups.ngroup().to_numpy()
+        totals = groups['amount'].agg(['sum', 'count'])
+
+        # Rows sorted by group so each sketch is built from one contiguous slice
+        order = np.argsort(codes, kind='stable')
+        bounds = np.searchsorted(codes[order], np.arange(len(totals) + 1))
+        for g, ((period, category), total, count) in enumerate(
+            zip(totals.index, totals['sum'].to_numpy(), totals['count'].to_numpy())
+        ):
+            rows = order[bounds[g]:bounds[g + 1]]
+            sketch = HyperLogLog().add_registers(index[rows], rank[rows])
+            summary[(pd.Timestamp(period).to_pydatetime(), granularity, category)] = [float(total), int(count), sketch]
+
+    return summary
+
+
+def merge_summaries(target: dict, other: dict) -> dict:
+    for key, (amount, count, sketch) in other.items():
+        if key in target:
+            target[key][0] += amount
+            target[key][1] += count
+            target[key][2].merge(sketch)
+        else:
+            target[key] = [amount, count, sketch]
+    return target
+
+
+def _locked_rows(db: Session, keys: list) -> dict:
+    """{(period, granularity, category): row} for the given keys, locked until commit"""
+    rows = {}
+    periods = sorted({key[0] for key in keys})
+    for i in range(0, len(periods), PERIOD_CHUNK_SIZE):
+        found = db.query(
+            SalesRollup.id,
+            SalesRollup.period,
+            SalesRollup.granularity,
+            SalesRollup.product_category,
+            SalesRollup.total_amount,
+            SalesRollup.transaction_count,
+            SalesRollup.customer_sketch
+        ).filter(SalesRollup.period.in_(periods[i:i + PERIOD_CHUNK_SIZE]))\
+         .order_by(SalesRollup.id)\
+         .with_for_update()\
+         .all()
+        for row in found:
+            rows[(row.period, row.granularity, row.product_category)] = row
+    return rows
+
+
+def _merge_sketches(db: Session, summary: dict, keys: list, now: datetime):
+    # Sketches cannot be merged in SQL; the rows are locked, so read-merge-write is safe
+    existing = _locked_rows(db, keys)
+    updates = []
+    for key in keys:
+        row = existing[key]
+        sketch = summary[key][2]
+        if row.customer_sketch:
+            sketch = HyperLogLog.from_bytes(row.customer_sketch).merge(sketch)
+        updates.append({
+            "id": row.id,
+            "customer_sketch": sketch.to_bytes(),
+            "customer_estimate": round(sketch.count(), 1),
+            "updated_at": now
+        })
+    db.bulk_update_mappings(SalesRollup, updates)
+
+
+def apply_summary(db: Session, summary: dict) -> int:
+    """Merge a summary into sales_rollup (no commit).
+
+    Totals are added by the database (INSERT .. ON CONFLICT DO UPDATE), so
+    concurrent writers never lose an increment or collide on a new row. The
+    upsert locks the rows, and sketches are merged under that lock.
+    """
+    if not summary:
+        return 0
+
+    statement = upsert_statement(db, SalesRollup.__table__)
+    if statement is None:
+        return _apply_summary_locked(db, summary)
+
+    now = datetime.now()
+    table = SalesRollup.__table__
+    # Same key order in every writer, so row locks are always taken in one order
+    keys = sorted(summary)
+    for i in range(0, len(keys), PERIOD_CHUNK_SIZE):
+        chunk = keys[i:i + PERIOD_CHUNK_SIZE]
+        upsert = statement.values([
+            {
+                "period": key[0], "granularity": key[1], "product_category": key[2],
+                "total_amount": summary[key][0], "transaction_count": summary[key][1],
+                "customer_estimate": 0, "updated_at": now
+            }
+            for key in chunk
+        ])
+        db.execute(upsert.on_conflict_do_update(
+            index_elements=[table.c.period, table.c.granularity, table.c.product_category],
+            set_={
+                "total_amount": func.coalesce(table.c.total_amount, 0) + upsert.excluded.total_amount,
+                "transaction_count": func.coalesce(table.c.transaction_count, 0) + upsert.excluded.transaction_count,
+                "updated_at": upsert.excluded.updated_at
+            }
+        ))
+        _merge_sketches(db, summary, chunk, now)
+    return len(keys)
+
+
+def _apply_summary_locked(db: Session, summary: dict) -> int:
+    # Backends without ON CONFLICT: read-modify-write under row locks
+    now = datetime.now()
+    existing = _locked_rows(db, list(summary))
+
+    inserts, updates = [], []
+    for key, (amount, count, sketch) in summary.items():
+        row = existing.get(key)
+        if row is not None:
+            if row.customer_sketch:
+                sketch = HyperLogLog.from_bytes(row.customer_sketch).merge(sketch)
+            amount += row.total_amount or 0
+            count += row.transaction_count or 0
+        mapping = {
+            "total_amount": amount,
+            "transaction_count": count,
+            "customer_sketch": sketch.to_bytes(),
+            "customer_estimate": round(sketch.count(), 1),
+            "updated_at": now
+        }
+        if row is not None:
+            updates.append({**mapping, "id": row.id})
+        else:
+            inserts.append({**mapping, "period": key[0], "granularity": key[1], "product_category": key[2]})
+
+    if updates:
+        db.bulk_update_mappings(SalesRollup, updates)
+    if inserts:
+        db.bulk_insert_mappings(SalesRollup, inserts)
+    return len(updates) + len(inserts)
+
+
+def update_sales_rollup(db: Session, frame: pd.DataFrame) -> int:
+    """Add newly inserted transactions to the rollup (no commit, so it lands with the rows).
+
+    A rollup that was never backfilled is built in full instead (the new rows
+    are already inserted), so it never holds just the rows written since.
+    """
+    if not is_backfilled(db, BACKFILL_NAME):
+        return backfill_sales_rollup(db)
+    return apply_summary(db, summarize_transactions(frame))
+
+
+def backfill_sales_rollup(db: Session, chunk_size: int = None) -> int:
+    """Full backfill of sales_rollup, streaming transactions in chunks (no commit)"""
+    chunk_size = chunk_size or REBUILD_CHUNK_SIZE
+    db.query(SalesRollup).delete()
+
+    rows = iter(db.query(
+        Transaction.customer_id,
+        Transaction.transaction_date,
+        Transaction.amount,
+        Transaction.product_category
+    ).yield_per(chunk_size))
+
+    summary = {}
+    while True:
+        batch = list(itertools.islice(rows, chunk_size))
+        if not batch:
+            break
+        frame = pd.DataFrame(batch, columns=['customer_id', 'transaction_date', 'amount', 'product_category'])
+        merge_summaries(summary, summarize_transactions(frame[frame['customer_id'].notna()]))
+
+    count = apply_summary(db, summary)
+    mark_backfilled(db, BACKFILL_NAME)
+    return count
+
+
+def rebuild_sales_rollup(db: Session, chunk_size: int = None) -> int:
+    count = backfill_sales_rollup(db, chunk_size)
+    bump_data_version(db)
+    db.commit()
+    return count
+
+
+def ensure_sales_rollup(db: Session):
+    """One-time backfill for databases that predate the rollup table"""
+    if not is_backfilled(db, BACKFILL_NAME):
+        rebuild_sales_rollup(db)
+
+
+def sales_trend(db: Session, granularity: str = "month", limit: int = None) -> list:
+    """Totals per period (oldest first); limit keeps the most recent periods"""
+    query = db.query(
+        SalesRollup.period,
+        func.sum(SalesRollup.total_amount).label('amount'),
+        func.sum(SalesRollup.transaction_count).label('transactions')
+    ).filter(SalesRollup.granularity == granularity)\
+     .group_by(SalesRollup.period)\
+     .order_by(SalesRollup.period.desc())
+    if limit:
+        query = query.limit(limit)
+
+    date_format = DATE_FORMATS[granularity]
+    return [
+        {"date": r.period.strftime(date_format), "amount": float(r.amount or 0), "transactions": int(r.transactions or 0)}
+        for r in reversed(query.all())
+    ]
+
+
+def distinct_customers(db: Session, granularity: str = "month", start: datetime = None, end: datetime = None) -> dict:
+    """Estimated distinct customers per period (category sketches merged, not summed)"""
+    query = db.query(SalesRollup.period, SalesRollup.customer_sketch)\
+        .filter(SalesRollup.granularity == granularity, SalesRollup.customer_sketch.isnot(None))
+    if start:
+        query = query.filter(SalesRollup.period >= start)
+    if end:
+        query = query.filter(SalesRollup.period <= end)
+
+    merged = {}
+    for period, data in query.all():
+        sketch = HyperLogLog.from_bytes(data)
+        if period in merged:
+            merged[period].merge(sketch)
+        else:
+            merged[period] = sketch
+    return {period: round(sketch.count()) for period, sketch in merged.items()}
+
+
+def category_share(db: Session, limit: int = 10) -> list:
+    rows = db.query(
+        SalesRollup.product_category,
+        func.sum(SalesRollup.transaction_count).label('count')
+    ).filter(SalesRollup.granularity == "month")\
+     .group_by(SalesRollup.product_category)\
+     .order_by(func.sum(SalesRollup.transaction_count).desc())\
+     .limit(limit)\
+     .all()
+    return [{"name": r.product_category or "Uncategorized", "value": int(r.count or 0)} for r in rows]
+
+
+def sales_totals(db: Session):
+    """(revenue, transaction count) from O(months x categories) rollup rows"""
+    total, count = db.query(
+        func.sum(SalesRollup.total_amount),
+        func.sum(SalesRollup.transaction_count)
+    ).filter(SalesRollup.granularity == "month").one()
+    return float(total or 0), int(count or 0)
@@ -0,0 +1,69 @@
+import numpy as np
+from sklearn.base import BaseEstimator, ClusterMixin
+from sklearn.cluster import KMeans, AffinityPropagation
+from sklearn.kernel_approximation import Nystroem
+from sklearn.metrics import pairwise_distances_argmin
+
+
+class NystroemSpectralClustering(ClusterMixin, BaseEstimator):
+    """Spectral clustering on a Nystroem low-rank approximation of the RBF affinity.
+
+    With A ~ Phi Phi^T (Phi is n x m), the leading eigenvectors of the normalized
+    affinity D^-1/2 A D^-1/2 are the left singular vectors of D^-1/2 Phi, so memory
+    and time stay linear in n instead of building the full n x n affinity.
+    """
+
+    def __init__(self, n_clusters=3, n_components=300, gamma=1.0, random_state=None):
+        self.n_clusters = n_clusters
+        self.n_components = n_components
+        self.gamma = gamma
+        self.random_state = random_state
+
+    def fit(self, X, y=None):
+        X = np.asarray(X, dtype=float)
+        n_components = min(self.n_components, len(X))
+        feature_map = Nystroem(
+            kernel="rbf", gamma=self.gamma, n_components=n_components, random_state=self.random_state
+        )
+        phi = feature_map.fit_transform(X)
+
+        # Degrees of the approximated affinity without materializing it
+        degree = phi @ phi.sum(axis=0)
+        degree = np.clip(degree, 1e-12, None)
+        phi_normalized = phi / np.sqrt(degree)[:, None]
+
+        u, _, _ = np.linalg.svd(phi_normalized, full_matrices=False)
+        embedding = u[:, :self.n_clusters]
+        norms = np.linalg.norm(embedding, axis=1, keepdims=True)
+        embedding = embedding / np.clip(norms, 1e-12, None)
+
+        self.labels_ = KMeans(
+            n_clusters=self.n_clusters, random_state=self.random_state, n_init=10
+        ).fit_predict(embedding)
+        return self
+
+
+class SampledAffinityPropagation(ClusterMixin, BaseEstimator):
+    """Affinity propagation on a random sample; everyone else joins the nearest exemplar."""
+
+    def __init__(self, damping=0.5, sample_size=2000, random_state=None):
+        self.damping = damping
+        self.sample_size = sample_size
+        self.random_state = random_state
+
+    def fit(self, X, y=None):
+        X = np.asarray(X, dtype=float)
+        rng = np.random.default_rng(self.random_state)
+        sample = rng.choice(len(X), size=min(self.sample_size, len(X)), replace=False)
+
+        model = AffinityPropagation(damping=self.damping, random_state=self.random_state).fit(X[sample])
+        self.cluster_centers_ = model.cluster_centers_
+        self.labels_ = self.predict(X)
+        return self
+
+    def predict(self, X):
+        X = np.asarray(X, dtype=float)
+        if len(self.cluster_centers_) == 0:
+            # Affinity propagation did not converge on the sample
+            return np.full(len(X), -1)
+        return pairwise_distances_argmin(X, self.cluster_centers_)
@@ -0,0 +1,110 @@
+import os
+import pandas as pd
+from sqlalchemy.orm import Session
+from app.models.models import ClusterResult, CustomerCluster, SegmentTransition
+from app.services.feature_store import ID_CHUNK_SIZE, load_customer_features
+from app.services.model_registry import load_model
+from datetime import datetime
+
+# Opt-in: re-score customers touched by uploads and manual transactions against the active run
+SEGMENT_ASSIGN_ON_INGEST = os.getenv("SEGMENT_ASSIGN_ON_INGEST", "0") == "1"
+
+
+def _chunks(values: list, size: int = ID_CHUNK_SIZE):
+    for i in range(0, len(values), size):
+        yield values[i:i + size]
+
+
+def active_run(db: Session):
+    return db.query(ClusterResult).filter(ClusterResult.is_active.is_(True)).first()
+
+
+def activate_run(db: Session, run_id: int) -> ClusterResult:
+    """Make run_id the only active run (no commit)"""
+    run = db.get(ClusterResult, run_id)
+    if run is None:
+        raise LookupError("Run not found")
+    db.query(ClusterResult).filter(ClusterResult.is_active.is_(True), ClusterResult.id != run_id)\
+        .update({ClusterResult.is_active: False}, synchronize_session=False)
+    run.is_active = True
+    return run
+
+
+def reassign_segments(db: Session, customer_ids, source: str):
+    """Re-score customers against the active run and upsert their memberships (no commit).
+
+    Call after their feature-store rows are refreshed. All customers are scored in one
+    vectorized pass; every label change (or new member) is recorded as a transition.
+    Returns None when the hook is off or there is no active run with a saved model.
+    """
+    if not SEGMENT_ASSIGN_ON_INGEST:
+        return None
+    customer_ids = sorted({int(c) for c in customer_ids})
+    if not customer_ids:
+        return None
+    run = active_run(db)
+    model = load_model(run.id) if run is not None else None
+    if model is None:
+        return None
+    # Memberships and cluster_sizes are read-modify-write; one writer per run at a time
+    run = db.query(ClusterResult).filter(ClusterResult.id == run.id)\
+        .with_for_update().populate_existing().one()
+
+    frames = [load_customer_features(db, customer_ids=chunk)[0] for chunk in _chunks(customer_ids)]
+    frames = [f for f in frames if f is not None]
+    if not frames:
+        return None
+    features = pd.concat(frames)
+    scored = pd.DataFrame(
+        {'to_label': model.assign(features[model.features].to_numpy(dtype=float))},
+        index=features.index
+    )
+
+    current = []
+    for chunk in _chunks(customer_ids):
+        current += db.query(CustomerCluster.customer_id, CustomerCluster.id, CustomerCluster.cluster_label)\
+            .filter(CustomerCluster.cluster_result_id == run.id, CustomerCluster.customer_id.in_(chunk))\
+            .all()
+    current = pd.DataFrame(current, columns=['customer_id', 'id', 'from_label']).set_index('customer_id')
+
+    joined = scored.join(current, how='left')
+    changed = joined[joined['from_label'].isna() | (joined['from_label'] != joined['to_label'])]
+    if changed.empty:
+        return {"run_id": run.id, "scored": len(scored), "changed": 0}
+
+    moved = changed[changed['id'].notna()]
+    joined_run = changed[changed['id'].isna()]
+    if len(moved):
+        db.bulk_update_mappings(CustomerCluster, [
+            {"id": int(row_id), "cluster_label": int(label)}
+            for row_id, label in zip(moved['id'], moved['to_label'])
+        ])
+    if len(joined_run):
+        db.bulk_insert_mappings(CustomerCluster, [
+            {"cluster_result_id": run.id, "customer_id": int(customer_id), "cluster_label": int(label)}
+            for customer_id, label in zip(joined_run.index, joined_run['to_label'])
+        ])
+
+    now = datetime.utcnow()
+    db.bulk_insert_mappings(SegmentTransition, [
+        {
+            "cluster_result_id": run.id,
+            "customer_id": int(customer_id),
+            "from_label": None if pd.isna(from_label) else int(from_label),
+            "to_label": int(to_label),
+            "source": source,
+            "changed_at": now
+        }
+        for customer_id, from_label, to_label in zip(changed.index, changed['from_label'], changed['to_label'])
+    ])
+
+    # Keep the run's stored cluster sizes in step with its memberships
+    sizes = {int(k): int(v) for k, v in (run.cluster_sizes or {}).items()}
+    for label, count in moved['from_label'].astype(int).value_counts().items():
+        sizes[int(label)] = sizes.get(int(label), 0) - int(count)
+    for label, count in changed['to_label'].value_counts().items():
+        sizes[int(label)] = sizes.get(int(label), 0) + int(count)
+    run.cluster_sizes = sizes
+    run.customer_count = (run.customer_count or 0) + len(joined_run)
+
+    return {"run_id": run.id, "scored": len(scored), "changed": len(changed)}
@@ -1,5 +1,5 @@
 from sqlalchemy.orm import Session
-from app.models.models import ClusterResult, CustomerCluster, Customer, Transaction
+from app.models.models import ClusterProfile, ClusterResult, CustomerCluster, Customer, Transaction
 from sqlalchemy import func
 import pandas as pd
 
@@ -86,8 +86,96 @@ def classify_segment(avg_spend: float, frequency: float, recency_days: float = N
     else:
         return "at_risk"
 
+def segment_for(spend: float, frequency: float, spend_75: float, spend_25: float, freq_75: float, freq_25: float,
+                recency: float = None, recency_50: float = None) -> str:
+    """Relative classification of a cluster against dataset benchmarks"""
+    # 1. High Value (Top 25% Spend)
+    if spend >= spend_75:
+        if frequency >= freq_75:
+            return "vip"  # Spends a lot, buys often
+        if recency is not None and recency_50 is not None and recency < recency_50:
+            return "loyal"  # Big spenders who bought recently, just not often
+        return "at_risk"  # Spends a lot, but low freq and not recent - "Big Spenders / Whales"
+
+    # 2. Medium Value (Middle 50%)
+    if spend >= spend_25:
+        if frequency >= freq_75:
+            return "loyal"  # Medium spend, but high frequency
+        if frequency >= freq_25:
+            return "regular"  # Average spend, average freq
+        return "new"  # Middle spend, low freq (likely new)
+
+    # 3. Low Value (Bottom 25%)
+    if frequency >= freq_75:
+        return "loyal"  # Low spend, but VERY frequent (Bargain hunters)
+    return "low_value"  # Low spend, low freq
+
+def _strategy(label, segment_key: str, avg_spend: float, frequency: float, customer_count: int, tx_count: int, explanation: str) -> dict:
+    template = STRATEGY_TEMPLATES.get(segment_key, STRATEGY_TEMPLATES["regular"])
+    return {
+        "cluster": label,
+        "segment_name": template["segment_name"],
+        "segment_key": segment_key,
+        "avg_spend": avg_spend,
+        "frequency": round(frequency, 2),
+        "customer_count": customer_count,
+        "transaction_count": tx_count,
+        "priority": template["priority"],
+        "strategies": template["strategies"],
+        "email_template": template["email_template"],
+        "explanation": explanation,
+        "strategy": template["strategies"][0] if template["strategies"] else ""
+    }
+
+def _sort_by_priority(strategies: list) -> list:
+    priority_order = {"high": 0, "medium-high": 1, "medium": 2, "low": 3}
+    strategies.sort(key=lambda x: priority_order.get(x["priority"], 99))
+    return strategies
+
 def generate_strategies(run_id: int, db: Session):
-    """Generate detailed strategies for each cluster using DYNAMIC RELATIVE thresholds"""
+    """Generate strategies from the run's precomputed cluster profiles (k rows)"""
+    profiles = db.query(ClusterProfile)\
+        .filter(ClusterProfile.cluster_result_id == run_id)\
+        .order_by(ClusterProfile.cluster_label)\
+        .all()
+    run = db.get(ClusterResult, run_id)
+    if not profiles or run is None or not run.feature_quantiles:
+        # Runs saved before profiles existed
+        return generate_strategies_from_transactions(run_id, db)
+
+    # Customer-level benchmarks over everyone in the run
+    benchmarks = run.feature_quantiles
+    spend_75, spend_25 = benchmarks['monetary']['p75'], benchmarks['monetary']['p25']
+    freq_75, freq_25 = benchmarks['frequency']['p75'], benchmarks['frequency']['p25']
+    recency_50 = benchmarks['recency']['p50']
+
+    strategies = []
+    for profile in profiles:
+        # The cluster's typical customer, not its average (robust to a few huge accounts)
+        spend = profile.quantiles['monetary']['p50']
+        frequency = profile.quantiles['frequency']['p50']
+        recency = profile.quantiles['recency']['p50']
+        segment_key = segment_for(spend, frequency, spend_75, spend_25, freq_75, freq_25, recency, recency_50)
+
+        strategy = _strategy(
+            profile.cluster_label,
+            segment_key,
+            float(profile.avg_spend or 0),
+            float(profile.frequency or 0),
+            profile.customer_count,
+            profile.transaction_count,
+            f"Median customer spend: ${spend:.0f} (Benchmark: >${spend_75:.0f}), "
+            f"Median frequency: {frequency:.1f} (Benchmark: >{freq_75:.1f}), "
+            f"Median recency: {recency:.0f} days"
+        )
+        strategy["recency"] = profile.recency
+        strategy["quantiles"] = profile.quantiles
+        strategies.append(strategy)
+
+    return _sort_by_priority(strategies)
+
+def generate_strategies_from_transactions(run_id: int, db: Session):
+    """Legacy path: aggregate customer_clusters x transactions and grade cluster averages"""
     
     # 1. Fetch Cluster Statistics
     query = db.query(
@@ -137,52 +225,17 @@ def generate_strategies(run_id: int, db: Session):
         # Calculate frequency
         frequency = tx_count / customer_count if customer_count > 0 else 0
         
-        # --- DYNAMIC CLASSIFICATION LOGIC ---
         # Compare THIS cluster's average against the Global benchmarks
-        
-        # Logic Tree:
-        # 1. High Value (Top 25% Spend)
-        if avg_spend >= monetary_75:
-            if frequency >= freq_75:
-                segment_key = "vip" # Spends a lot, buys often
-            else:
-                segment_key = "at_risk" # Spends a lot, but low freq (or verify recency if available) - treating as "Big Spenders / Whales"
-        
-        # 2. Medium Value (Middle 50%)
-        elif avg_spend >= monetary_25:
-            if frequency >= freq_75:
-                segment_key = "loyal" # Medium spend, but high frequency
-            elif frequency >= freq_25:
-                segment_key = "regular" # Average spend, average freq
-            else:
-                segment_key = "new" # Middle spend, low freq (likely new)
-                
-        # 3. Low Value (Bottom 25%)
-        else:
-            if frequency >= freq_75:
-                segment_key = "loyal" # Low spend, but VERY frequent (Bargain hunters)
-            else:
-                segment_key = "low_value" # Low spend, low freq
-
-        template = STRATEGY_TEMPLATES.get(segment_key, STRATEGY_TEMPLATES["regular"])
-        
-        strategies.append({
-            "cluster": label,
-            "segment_name": template["segment_name"],
-            "segment_key": segment_key,
-            "avg_spend": avg_spend,
-            "frequency": round(frequency, 2),
-            "customer_count": customer_count,
-            "transaction_count": tx_count,
-            "priority": template["priority"],
-            "strategies": template["strategies"],
-            "email_template": template["email_template"],
-            "explanation": f"Spend: ${avg_spend:.0f} (Benchmark: >${monetary_75:.0f}), Freq: {frequency:.1f} (Benchmark: >{freq_75:.1f})",
-            "strategy": template["strategies"][0] if template["strategies"] else ""
-        })
+        segment_key = segment_for(avg_spend, frequency, monetary_75, monetary_25, freq_75, freq_25)
+
+        strategies.append(_strategy(
+            label,
+            segment_key,
+            avg_spend,
+            frequency,
+            customer_count,
+            tx_count,
+            f"Spend: ${avg_spend:.0f} (Benchmark: >${monetary_75:.0f}), Freq: {frequency:.1f} (Benchmark: >{freq_75:.1f})"
+        ))
     
-    # Sort by priority
-    priority_order = {"high": 0, "medium-high": 1, "medium": 2, "low": 3}
-    strategies.sort(key=lambda x: priority_order.get(x["priority"], 99))
-        
-    return strategies
+    return _sort_by_priority(strategies)
@@ -0,0 +1,177 @@
+import itertools
+import math
+import multiprocessing
+import os
+import time
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing import shared_memory
+from sklearn.metrics import silhouette_score, calinski_harabasz_score, davies_bouldin_score
+from sklearn.preprocessing import StandardScaler
+from sqlalchemy.orm import Session
+from app.services.clustering_service import build_model, load_run_features, run_clustering
+from datetime import datetime
+
+# Worker processes per sweep
+SWEEP_MAX_WORKERS = int(os.getenv("SWEEP_MAX_WORKERS", os.cpu_count() or 2))
+
+# Quality scores are computed on a sample above this many customers (silhouette is O(n^2))
+SCORE_SAMPLE_SIZE = int(os.getenv("SWEEP_SCORE_SAMPLE_SIZE", 10000))
+
+# Upper bound on configurations per sweep (each one is a full fit)
+SWEEP_MAX_CONFIGS = int(os.getenv("SWEEP_MAX_CONFIGS", 100))
+
+
+def expand_grid(grid: list) -> list:
+    """[{"algorithm": "kmeans", "params": {"n_clusters": [2, 3]}}] -> one (algorithm, params) per combination"""
+    axes = []
+    for entry in grid:
+        params = entry.get("params") or {}
+        axes.append((entry["algorithm"], list(params), [v if isinstance(v, list) else [v] for v in params.values()]))
+
+    # Counted before expanding, so an oversized grid is never materialised
+    total = sum(math.prod(len(v) for v in values) for _, _, values in axes)
+    if total > SWEEP_MAX_CONFIGS:
+        raise ValueError(f"Grid expands to {total} configurations; at most {SWEEP_MAX_CONFIGS} per sweep")
+
+    configs = []
+    for algorithm, keys, values in axes:
+        for combination in itertools.product(*values):
+            configs.append((algorithm, dict(zip(keys, combination))))
+    return configs
+
+
+def score_labels(X: np.ndarray, labels: np.ndarray, sample_size: int = SCORE_SAMPLE_SIZE, random_state: int = 42):
+    """Silhouette, Calinski-Harabasz and Davies-Bouldin on clustered (non-noise) rows"""
+    mask = labels >= 0
+    X, labels = X[mask], labels[mask]
+    n_clusters = len(np.unique(labels))
+    if n_clusters < 2 or n_clusters >= len(X):
+        return {"silhouette": None, "calinski_harabasz": None, "davies_bouldin": None}
+
+    if len(X) > sample_size:
+        idx = np.random.default_rng(random_state).choice(len(X), size=sample_size, replace=False)
+        if len(np.unique(labels[idx])) >= 2:
+            X, labels = X[idx], labels[idx]
+
+    return {
+        "silhouette": round(float(silhouette_score(X, labels)), 4),
+        "calinski_harabasz": round(float(calinski_harabasz_score(X, labels)), 4),
+        "davies_bouldin": round(float(davies_bouldin_score(X, labels)), 4)
+    }
+
+
+def _evaluate(X: np.ndarray, algorithm: str, params: dict) -> dict:
+    started = time.perf_counter()
+    try:
+        model, variant = build_model(algorithm, params, X)
+        labels = np.asarray(model.fit_predict(X))
+    except Exception as e:
+        return {"algorithm": algorithm, "params": params, "error": str(e)}
+    fit_seconds = time.perf_counter() - started
+
+    scores = score_labels(X, labels)
+    values, counts = np.unique(labels, return_counts=True)
+    return {
+        "algorithm": algorithm,
+        "params": params,
+        "variant": variant,
+        "n_clusters": int((values >= 0).sum()),
+        "cluster_sizes": {int(v): int(c) for v, c in zip(values, counts)},
+        "fit_seconds": round(fit_seconds, 3),
+        "wall_seconds": round(time.perf_counter() - started, 3),
+        **scores
+    }
+
+
+def evaluate_config(shm_name: str, shape: tuple, dtype: str, algorithm: str, params: dict) -> dict:
+    """Worker: fit one configuration on the shared scaled matrix (no copy of X per task)"""
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        return _evaluate(np.ndarray(shape, dtype=np.dtype(dtype), buffer=shm.buf), algorithm, params)
+    finally:
+        shm.close()
+
+
+def sweep_workers(max_workers: int, n_configs: int) -> int:
+    # Requests may ask for fewer processes than the server allows, never more
+    return max(1, min(max_workers or SWEEP_MAX_WORKERS, SWEEP_MAX_WORKERS, n_configs))
+
+
+def run_sweep(
+    db: Session,
+    grid: list,
+    start_date: datetime = None,
+    end_date: datetime = None,
+    max_workers: int = None,
+    save_best: bool = False,
+    run_name: str = None,
+    progress_callback=None
+):
+    """Fit every configuration of the grid in parallel and score it.
+
+    progress_callback(fraction, message) is called as configurations finish;
+    an exception it raises (e.g. a job cancellation) drops the configurations
+    that have not started and propagates.
+    """
+    configs = expand_grid(grid)
+    if not configs:
+        raise ValueError("Empty parameter grid")
+
+    # Features are built once for the whole grid
+    features = load_run_features(db, start_date, end_date)
+    X = np.ascontiguousarray(StandardScaler().fit_transform(features[0]), dtype=np.float64)
+
+    shm = shared_memory.SharedMemory(create=True, size=X.nbytes)
+    try:
+        shared = np.ndarray(X.shape, dtype=X.dtype, buffer=shm.buf)
+        shared[:] = X
+        del shared
+
+        workers = sweep_workers(max_workers, len(configs))
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+            futures = {
+                pool.submit(evaluate_config, shm.name, X.shape, X.dtype.str, algorithm, params): i
+                for i, (algorithm, params) in enumerate(configs)
+            }
+            results = [None] * len(configs)
+            try:
+                for done, future in enumerate(as_completed(futures), start=1):
+                    results[futures[future]] = future.result()
+                    if progress_callback:
+                        progress_callback(0.9 * done / len(configs), f"Evaluated {done}/{len(configs)} configurations")
+            except BaseException:
+                # Running fits finish (the shared matrix outlives them); queued ones never start
+                pool.shutdown(wait=True, cancel_futures=True)
+                raise
+    finally:
+        shm.close()
+        shm.unlink()
+
+    scored = [r for r in results if r.get("silhouette") is not None]
+    best = max(scored, key=lambda r: r["silhouette"]) if scored else None
+
+    saved_run_id = None
+    if save_best and best:
+        if progress_callback:
+            progress_callback(0.9, "Saving best configuration")
+        # The best configuration becomes a normal ClusterResult (refit on the same features)
+        saved = run_clustering(
+            best["algorithm"],
+            best["params"],
+            db,
+            run_name or f"sweep_{best['algorithm']}",
+            start_date=start_date,
+            end_date=end_date,
+            save_result=True,
+            features=features
+        )
+        saved_run_id = saved["run_id"]
+
+    return {
+        "n_customers": int(len(X)),
+        "n_configs": len(configs),
+        "results": results,
+        "best": best,
+        "saved_run_id": saved_run_id
+    }
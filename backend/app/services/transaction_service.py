@@ -0,0 +1,126 @@
+import os
+import uuid
+import pandas as pd
+from sqlalchemy import func, insert
+from sqlalchemy.orm import Session
+from app.core.cache import bump_data_version
+from app.models.models import Customer, Transaction
+from app.services.bulk_writer import upsert_statement
+from app.services.feature_store import refresh_customer_features
+from app.services.rollup_service import update_sales_rollup
+from app.services.segment_service import reassign_segments
+from datetime import datetime
+
+# Upper bound on items per batch request
+TRANSACTION_BATCH_MAX = int(os.getenv("TRANSACTION_BATCH_MAX", 5000))
+
+# Rows per multi-VALUES statement / IN list (bound-parameter limits)
+STATEMENT_CHUNK = 500
+
+
+def _chunks(values: list, size: int = STATEMENT_CHUNK):
+    for i in range(0, len(values), size):
+        yield values[i:i + size]
+
+
+def upsert_customers(db: Session, customers: dict) -> dict:
+    """{customer_code: name} -> {customer_code: id}, one INSERT .. ON CONFLICT per chunk"""
+    statement = upsert_statement(db, Customer.__table__)
+    if statement is None:
+        # No ON CONFLICT support: lookup + bulk insert of the missing codes
+        from app.services.data_service import resolve_customer_ids
+        rows = pd.DataFrame({'customer_code': list(customers), 'customer_name': list(customers.values())})
+        return resolve_customer_ids(db, rows).to_dict()
+
+    table = Customer.__table__
+    now = datetime.utcnow()
+    ids = {}
+    for chunk in _chunks(list(customers)):
+        upsert = statement.values([{"customer_code": c, "name": customers[c], "created_at": now} for c in chunk])
+        upsert = upsert.on_conflict_do_update(
+            index_elements=[table.c.customer_code],
+            # Existing names win; a missing name is filled in
+            set_={"name": func.coalesce(table.c.name, upsert.excluded.name)}
+        ).returning(table.c.customer_code, table.c.id)
+        ids.update(dict(db.execute(upsert).all()))
+    return ids
+
+
+def _existing_keys(db: Session, keys: list) -> dict:
+    found = {}
+    for chunk in _chunks(keys):
+        found.update(
+            db.query(Transaction.idempotency_key, Transaction.id)
+            .filter(Transaction.idempotency_key.in_(chunk))
+            .all()
+        )
+    return found
+
+
+def record_transactions(db: Session, items: list) -> list:
+    """Insert manual/POS transactions in the caller's transaction (no commit).
+
+    items are dicts with customer_code, customer_name, transaction_date, amount,
+    product_category and optional transaction_code / idempotency_key. Items whose
+    key was already recorded (earlier call or earlier in the batch) are reported
+    as duplicates instead of being inserted again. Results follow input order.
+    """
+    results = [None] * len(items)
+    first_with_key = {}
+    pending = []
+    for i, item in enumerate(items):
+        key = item.get("idempotency_key")
+        if key and key in first_with_key:
+            continue
+        if key:
+            first_with_key[key] = i
+        pending.append(i)
+
+    recorded = _existing_keys(db, list(first_with_key))
+    pending = [i for i in pending if items[i].get("idempotency_key") not in recorded]
+
+    if pending:
+        # First name seen for each new customer
+        customers = {}
+        for i in pending:
+            customers.setdefault(items[i]["customer_code"], items[i].get("customer_name"))
+        customer_ids = upsert_customers(db, customers)
+
+        rows = [
+            {
+                "customer_id": customer_ids[items[i]["customer_code"]],
+                # uuid codes never collide, unlike the former per-second timestamp
+                "transaction_code": items[i].get("transaction_code") or f"MANUAL-{uuid.uuid4().hex}",
+                "transaction_date": items[i]["transaction_date"],
+                "amount": items[i]["amount"],
+                "product_category": items[i].get("product_category"),
+                "idempotency_key": items[i].get("idempotency_key")
+            }
+            for i in pending
+        ]
+        table = Transaction.__table__
+        inserted = db.execute(
+            insert(table).returning(table.c.id, sort_by_parameter_order=True),
+            rows
+        ).scalars().all()
+
+        for i, transaction_id in zip(pending, inserted):
+            results[i] = {"index": i, "status": "created", "transaction_id": transaction_id}
+            key = items[i].get("idempotency_key")
+            if key:
+                recorded[key] = transaction_id
+
+        # Derived tables follow in the same database transaction
+        frame = pd.DataFrame(rows)
+        touched = frame['customer_id'].unique().tolist()
+        refresh_customer_features(db, touched)
+        reassign_segments(db, touched, "manual")
+        update_sales_rollup(db, frame)
+        bump_data_version(db)
+
+    # Repeats of a key within this batch point at the row recorded for it
+    for i, item in enumerate(items):
+        if results[i] is None:
+            results[i] = {"index": i, "status": "duplicate", "transaction_id": recorded[item["idempotency_key"]]}
+
+    return results
@@ -0,0 +1,240 @@
+import itertools
+import json
+import os
+import re
+import shutil
+import time
+import uuid
+import pandas as pd
+from sqlalchemy.orm import Session
+from app.services.data_service import _ingest_chunks, iter_upload_chunks
+from app.services.preview_service import preview_upload
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # Sessions then keep the original file and parse it when processed
+    pa = None
+    pq = None
+
+# One directory per session: meta.json plus Parquet parts (or the original file)
+UPLOAD_SESSION_DIR = os.getenv("UPLOAD_SESSION_DIR", "upload_sessions")
+
+# Seconds a session can be processed after it was created
+UPLOAD_SESSION_TTL = int(os.getenv("UPLOAD_SESSION_TTL", 3600))
+
+# Disk used by all live sessions together
+UPLOAD_SESSION_MAX_BYTES = int(os.getenv("UPLOAD_SESSION_MAX_BYTES", 2 * 1024 ** 3))
+
+UPLOAD_FORMATS = ('.csv', '.xlsx', '.xls')
+
+SESSION_ID = re.compile(r"^[0-9a-f]{32}$")
+CLAIMED_SUFFIX = ".processing"
+
+
+class UploadStorageFull(Exception):
+    """No room left under UPLOAD_SESSION_MAX_BYTES"""
+
+
+def session_directory(session_id: str) -> str:
+    # Ids become paths, so anything but our own uuid hex is unknown
+    if not SESSION_ID.match(session_id or ""):
+        raise LookupError("Upload session not found")
+    return os.path.join(UPLOAD_SESSION_DIR, session_id)
+
+
+def _directory_size(path: str) -> int:
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:  # removed while we were looking
+                pass
+    return total
+
+
+def _read_meta(directory: str):
+    try:
+        with open(os.path.join(directory, "meta.json")) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_meta(directory: str, meta: dict):
+    tmp = os.path.join(directory, "meta.json.tmp")
+    with open(tmp, "w") as f:
+        json.dump(meta, f, default=str)
+    os.replace(tmp, os.path.join(directory, "meta.json"))
+
+
+def purge_expired(now: float = None) -> int:
+    """Remove sessions past their TTL; returns the bytes still in use"""
+    now = now or time.time()
+    if not os.path.isdir(UPLOAD_SESSION_DIR):
+        return 0
+    used = 0
+    for name in os.listdir(UPLOAD_SESSION_DIR):
+        directory = os.path.join(UPLOAD_SESSION_DIR, name)
+        meta = _read_meta(directory)
+        try:
+            # Sessions still being created have no meta yet; they age out from their start
+            expires_at = meta["expires_at"] if meta else os.path.getmtime(directory) + UPLOAD_SESSION_TTL
+        except OSError:
+            continue
+        if expires_at <= now:
+            shutil.rmtree(directory, ignore_errors=True)
+        else:
+            used += _directory_size(directory)
+    return used
+
+
+def open_upload_session(filename: str):
+    """(session_id, path to spool the upload to, bytes it may take)"""
+    if not filename.endswith(UPLOAD_FORMATS):
+        raise ValueError("Unsupported file format")
+    # Checked per session, so concurrent uploads can overshoot the cap by one file each
+    budget = UPLOAD_SESSION_MAX_BYTES - purge_expired()
+    if budget <= 0:
+        raise UploadStorageFull("Upload storage is full; try again when older sessions expire")
+
+    session_id = uuid.uuid4().hex
+    directory = session_directory(session_id)
+    os.makedirs(directory)
+    return session_id, os.path.join(directory, "source" + os.path.splitext(filename)[1]), budget
+
+
+def _arrow_frame(chunk: pd.DataFrame) -> pd.DataFrame:
+    # Mixed object columns (17850 and 'C17850' in one Excel column) have no Arrow
+    # type; store them as text, which is what the column mapping turns them into
+    mixed = [
+        c for c in chunk.columns
+        if chunk[c].dtype == object and pd.api.types.infer_dtype(chunk[c], skipna=True).startswith("mixed")
+    ]
+    if not mixed:
+        return chunk
+    chunk = chunk.copy()
+    for c in mixed:
+        chunk[c] = chunk[c].map(lambda v: v if isinstance(v, str) else str(v)).where(chunk[c].notna(), None)
+    return chunk
+
+
+def _convert(directory: str, source: str, filename: str):
+    """Parse the upload once into Parquet parts of UPLOAD_CHUNK_SIZE rows; returns (parts, rows)"""
+    parts, rows = [], 0
+    try:
+        for i, chunk in enumerate(iter_upload_chunks(source, filename)):
+            part = f"part-{i:05d}.parquet"
+            # Each part keeps its own schema, exactly as the chunk was read
+            pq.write_table(pa.Table.from_pandas(_arrow_frame(chunk), preserve_index=False), os.path.join(directory, part))
+            parts.append(part)
+            rows += len(chunk)
+    except (pa.ArrowException, ValueError):
+        # e.g. duplicate column names; the session falls back to the original file
+        for part in parts:
+            os.remove(os.path.join(directory, part))
+        return None, None
+    return parts, rows
+
+
+def finish_upload_session(session_id: str, filename: str, budget: int = None) -> dict:
+    """Preview and convert a spooled upload; returns the session with its preview"""
+    directory = session_directory(session_id)
+    source = os.path.join(directory, "source" + os.path.splitext(filename)[1])
+    with open(source, "rb") as f:
+        preview = preview_upload(f, filename)
+
+    parts, rows = _convert(directory, source, filename) if pq is not None else (None, None)
+    if parts is not None:
+        os.remove(source)
+    if budget is not None and _directory_size(directory) > budget:
+        raise UploadStorageFull("Upload storage is full; try again when older sessions expire")
+
+    now = time.time()
+    meta = {
+        "session_id": session_id,
+        "filename": filename,
+        "format": "parquet" if parts is not None else "source",
+        "parts": parts,
+        "source": None if parts is not None else os.path.basename(source),
+        "rows": rows,
+        "bytes": _directory_size(directory),
+        "created_at": now,
+        "expires_at": now + UPLOAD_SESSION_TTL,
+        "preview": preview
+    }
+    _write_meta(directory, meta)
+    return session_to_dict(meta)
+
+
+def session_to_dict(meta: dict) -> dict:
+    return {
+        "session_id": meta["session_id"],
+        "filename": meta["filename"],
+        "format": meta["format"],
+        "rows": meta["rows"],
+        "bytes": meta["bytes"],
+        "expires_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(meta["expires_at"])),
+        **meta["preview"]
+    }
+
+
+def get_upload_session(session_id: str) -> dict:
+    meta = _read_meta(session_directory(session_id))
+    if meta is None or meta["expires_at"] <= time.time():
+        raise LookupError("Upload session not found")
+    return session_to_dict(meta)
+
+
+def discard_upload_session(session_id: str):
+    shutil.rmtree(session_directory(session_id), ignore_errors=True)
+
+
+def iter_session_chunks(directory: str, meta: dict):
+    if meta["format"] == "parquet":
+        for part in meta["parts"]:
+            yield pq.read_table(os.path.join(directory, part)).to_pandas()
+    else:
+        yield from iter_upload_chunks(os.path.join(directory, meta["source"]), meta["filename"])
+
+
+def process_upload_session(db: Session, session_id: str, mapping: dict = None) -> dict:
+    """Ingest a session's rows with a mapping; the session is removed once it succeeds.
+
+    The directory is renamed while it is processed so the same file cannot be
+    ingested twice concurrently. On failure (e.g. a wrong mapping) the session is
+    released again and can be retried until it expires. Each part commits as a
+    whole and is recorded in meta.json, so a retry resumes after the last
+    committed part instead of importing it again.
+    """
+    directory = session_directory(session_id)
+    meta = _read_meta(directory)
+    if meta is None or meta["expires_at"] <= time.time():
+        raise LookupError("Upload session not found")
+    committed = meta.get("committed_chunks", 0)
+    if committed and meta.get("mapping") != mapping:
+        raise ValueError(f"{committed} part(s) of this upload were already imported with another mapping; retry with the same mapping")
+
+    claimed = directory + CLAIMED_SUFFIX
+    try:
+        os.rename(directory, claimed)
+    except OSError:
+        raise LookupError("Upload session not found or already being processed")
+    # Not purged while a long file is being ingested
+    meta["expires_at"] = max(meta["expires_at"], time.time() + UPLOAD_SESSION_TTL)
+    _write_meta(claimed, meta)
+
+    def chunk_committed(i):
+        meta["committed_chunks"] = committed + i + 1
+        meta["mapping"] = mapping
+        _write_meta(claimed, meta)
+
+    chunks = itertools.islice(iter_session_chunks(claimed, meta), committed, None)
+    try:
+        stats = _ingest_chunks(db, chunks, mapping, on_chunk_committed=chunk_committed)
+    except Exception:
+        os.rename(claimed, directory)
+        raise
+    shutil.rmtree(claimed, ignore_errors=True)
+    return {"filename": meta["filename"], "resumed_after_parts": committed, **stats}
@@ -0,0 +1,102 @@
+"""Benchmark: concurrent authenticated GETs under the old and new auth dependency.
+
+Usage: python scripts/bench_auth.py [n_requests] [concurrency]
+Runs the API in-process (httpx ASGI transport) against a throwaway SQLite file.
+Above the connection pool's capacity the blocking dependency is skipped: its
+event-loop thread waits for a connection only the (blocked) loop can release.
+"""
+import sys
+import os
+import time
+import asyncio
+import tempfile
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+from fastapi import Depends, HTTPException
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session, sessionmaker
+
+from app.api import auth
+from app.core.database import Base, get_db
+from app.core.security import create_access_token, decode_access_token
+from app.main import app
+from app.models.user import User
+
+
+async def legacy_get_current_user(token: str = Depends(auth.oauth2_scheme), db: Session = Depends(get_db)):
+    # Former dependency: synchronous query on the event loop thread
+    email = decode_access_token(token).get("sub")
+    user = db.query(User).filter(User.email == email).first()
+    if user is None:
+        raise HTTPException(status_code=401)
+    return user
+
+
+async def run(n, concurrency, headers):
+    latencies = []
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        queue = iter(range(n))
+
+        async def worker():
+            for _ in queue:
+                t0 = time.perf_counter()
+                response = await client.get("/api/v1/auth/me", headers=headers)
+                assert response.status_code == 200, response.text
+                latencies.append(time.perf_counter() - t0)
+
+        t0 = time.perf_counter()
+        await asyncio.gather(*[worker() for _ in range(concurrency)])
+        elapsed = time.perf_counter() - t0
+    latencies.sort()
+    return elapsed, latencies[int(len(latencies) * 0.95) - 1]
+
+
+if __name__ == "__main__":
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    concurrency = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+
+    engine = create_engine(
+        f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench_auth.db')}",
+        connect_args={"check_same_thread": False}
+    )
+    Base.metadata.create_all(bind=engine)
+    SessionLocal = sessionmaker(bind=engine)
+    db = SessionLocal()
+    db.add(User(email="bench@example.com", full_name="Bench", hashed_password="unused", role="admin"))
+    db.commit()
+    db.close()
+
+    def override_get_db():
+        session = SessionLocal()
+        try:
+            yield session
+        finally:
+            session.close()
+
+    app.dependency_overrides[get_db] = override_get_db
+    headers = {"Authorization": f"Bearer {create_access_token({'sub': 'bench@example.com'})}"}
+
+    print(f"{n:,} GET /auth/me, {concurrency} concurrent...")
+    modes = [
+        ("Blocking lookup", legacy_get_current_user, 0),
+        ("Threadpool, no cache", None, 0),
+        ("Cached", None, auth.AUTH_USER_CACHE_TTL or 60),
+    ]
+    # QueuePool defaults: 5 connections + 10 overflow
+    pool_capacity = 15
+    for name, dependency, ttl in modes:
+        if dependency is legacy_get_current_user and concurrency > pool_capacity:
+            print(f"{name:22s} skipped: stalls once {pool_capacity} connections are checked out")
+            continue
+        if dependency:
+            app.dependency_overrides[auth.get_current_user] = dependency
+        else:
+            app.dependency_overrides.pop(auth.get_current_user, None)
+        auth.user_cache.clear()
+        auth.user_cache.ttl = ttl
+
+        elapsed, p95 = asyncio.run(run(n, concurrency, headers))
+        print(f"{name:22s} {n / elapsed:10,.0f} req/s  p95 {p95 * 1000:7.1f} ms")
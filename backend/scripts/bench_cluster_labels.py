@@ -0,0 +1,61 @@
+"""Benchmark: per-row ORM CustomerCluster inserts vs. the bulk label writer.
+
+Usage: python scripts/bench_cluster_labels.py [n_customers]
+Runs against a throwaway SQLite file (or DATABASE_URL if BENCH_USE_DATABASE_URL=1).
+"""
+import sys
+import os
+import time
+import tempfile
+import numpy as np
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.core.database import Base, SQLALCHEMY_DATABASE_URL
+from app.models.models import ClusterResult, CustomerCluster
+from app.services.bulk_writer import write_cluster_labels
+
+
+def orm_loop(db, run_id, customer_ids, labels):
+    # Former run_clustering save path
+    for customer_id, label in zip(customer_ids, labels):
+        db.add(CustomerCluster(cluster_result_id=run_id, customer_id=int(customer_id), cluster_label=int(label)))
+    db.commit()
+
+
+def bulk_writer(db, run_id, customer_ids, labels):
+    write_cluster_labels(db, run_id, customer_ids, labels)
+    db.commit()
+
+
+if __name__ == "__main__":
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+
+    if os.getenv("BENCH_USE_DATABASE_URL"):
+        url = SQLALCHEMY_DATABASE_URL
+    else:
+        url = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench_labels.db')}"
+    engine = create_engine(url)
+    Base.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine)()
+
+    customer_ids = np.arange(1, n + 1)
+    labels = np.random.default_rng(42).integers(0, 5, n)
+
+    print(f"Writing {n:,} labels to {engine.dialect.name}...")
+    for name, writer in [("ORM loop", orm_loop), ("Bulk writer", bulk_writer)]:
+        run = ClusterResult(run_name=f"bench {name}", algorithm="kmeans", parameters={})
+        db.add(run)
+        db.commit()
+
+        t0 = time.perf_counter()
+        writer(db, run.id, customer_ids, labels)
+        elapsed = time.perf_counter() - t0
+
+        stored = db.query(CustomerCluster).filter(CustomerCluster.cluster_result_id == run.id).count()
+        assert stored == n
+        print(f"{name:12s} {elapsed:8.2f} s  {n / elapsed:12,.0f} rows/s")
+
+    db.close()
@@ -0,0 +1,74 @@
+"""Micro-benchmark: legacy lambda groupby vs. vectorized RLFM feature builder.
+
+Usage: python scripts/bench_rlfm_features.py [n_customers] [n_rows]
+"""
+import sys
+import os
+import time
+import numpy as np
+import pandas as pd
+from datetime import datetime
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.clustering_service import build_customer_features
+
+
+def make_rows(n_customers: int, n_rows: int, seed: int = 42) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    ids = rng.integers(1, n_customers + 1, n_rows)
+    start = np.datetime64('2022-01-01')
+    return pd.DataFrame({
+        'id': ids,
+        'customer_code': pd.Series(ids).map(lambda i: f"C{i:06d}"),
+        'amount': rng.gamma(2.0, 40.0, n_rows).round(2),
+        'transaction_date': start + rng.integers(0, 730 * 24 * 3600, n_rows).astype('timedelta64[s]'),
+        'product_category': rng.choice([f"Cat{i}" for i in range(25)], n_rows),
+        'transaction_code': pd.Series(rng.integers(0, n_rows // 4, n_rows)).map(lambda i: f"INV{i}"),
+    })
+
+
+def legacy_build(df: pd.DataFrame, now: datetime) -> pd.DataFrame:
+    # Copy of the former get_customer_data aggregation (per-group Python lambdas)
+    aggs = {
+        'amount': 'sum',
+        'transaction_date': [
+            lambda x: (now - x.max()).days,
+            lambda x: (x.max() - x.min()).days
+        ],
+        'product_category': lambda x: x.nunique(),
+        'transaction_code': lambda x: x.nunique()
+    }
+    features = df.groupby('id').agg(aggs)
+    features.columns = ['monetary', 'recency', 'length', 'variety', 'frequency']
+    return features
+
+
+def best_of(fn, repeat: int = 3) -> float:
+    timings = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - t0)
+    return min(timings)
+
+
+if __name__ == "__main__":
+    n_customers = int(sys.argv[1]) if len(sys.argv) > 1 else 4000
+    n_rows = int(sys.argv[2]) if len(sys.argv) > 2 else 400000
+    now = datetime(2024, 1, 1)
+
+    print(f"Generating {n_rows:,} rows for {n_customers:,} customers...")
+    df = make_rows(n_customers, n_rows)
+
+    legacy = legacy_build(df, now)
+    vectorized, _ = build_customer_features(df, now)
+    pd.testing.assert_frame_equal(legacy, vectorized, check_dtype=False)
+    print("Outputs match.")
+
+    legacy_time = best_of(lambda: legacy_build(df, now))
+    vectorized_time = best_of(lambda: build_customer_features(df, now))
+
+    print(f"Legacy (lambdas):      {legacy_time * 1000:8.1f} ms")
+    print(f"Vectorized (built-in): {vectorized_time * 1000:8.1f} ms")
+    print(f"Speed-up:              {legacy_time / vectorized_time:8.1f}x")
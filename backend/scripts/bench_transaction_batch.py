@@ -0,0 +1,78 @@
+"""Load test: one POST per transaction vs. the batch endpoint.
+
+Usage: python scripts/bench_transaction_batch.py [n_transactions] [batch_size]
+Runs the API in-process (TestClient) against a throwaway SQLite file.
+"""
+import sys
+import os
+import time
+import tempfile
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.core.database import Base, get_db
+from app.main import app
+from app.models.models import Transaction
+
+
+def make_items(n, prefix):
+    return [
+        {
+            "customer_code": f"C{i % 500:04d}",
+            "transaction_date": f"2024-{i % 12 + 1:02d}-15T10:00:00",
+            "amount": float(i % 97 + 1),
+            "product_category": ["Books", "Toys", "Food"][i % 3],
+            "idempotency_key": f"{prefix}-{i}"
+        }
+        for i in range(n)
+    ]
+
+
+def single_posts(client, items, batch_size):
+    for item in items:
+        assert client.post("/api/v1/transaction/", json=item).status_code == 200
+
+
+def batch_posts(client, items, batch_size):
+    for i in range(0, len(items), batch_size):
+        assert client.post("/api/v1/transaction/batch", json={"items": items[i:i + batch_size]}).status_code == 200
+
+
+if __name__ == "__main__":
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    batch_size = int(sys.argv[2]) if len(sys.argv) > 2 else 500
+
+    engine = create_engine(f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench_batch.db')}")
+    Base.metadata.create_all(bind=engine)
+    Session = sessionmaker(bind=engine)
+
+    def override_get_db():
+        db = Session()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    app.dependency_overrides[get_db] = override_get_db
+    client = TestClient(app)
+
+    print(f"Posting {n:,} transactions (batch size {batch_size})...")
+    for name, post in [("Single item", single_posts), ("Batch", batch_posts)]:
+        items = make_items(n, name)
+        t0 = time.perf_counter()
+        post(client, items, batch_size)
+        elapsed = time.perf_counter() - t0
+        print(f"{name:12s} {elapsed:8.2f} s  {n / elapsed:10,.0f} rows/s")
+
+    # Replaying the batch run must not add rows
+    t0 = time.perf_counter()
+    batch_posts(client, make_items(n, "Batch"), batch_size)
+    elapsed = time.perf_counter() - t0
+    db = Session()
+    stored = db.query(Transaction).count()
+    assert stored == 2 * n, stored
+    print(f"{'Retry batch':12s} {elapsed:8.2f} s  {n / elapsed:10,.0f} rows/s  (0 new rows)")
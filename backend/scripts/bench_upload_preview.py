@@ -0,0 +1,74 @@
+"""Preview latency vs. file size: streaming preview vs. pd.read_excel/read_csv(nrows=5).
+
+Usage: python scripts/bench_upload_preview.py [rows ...]
+Generates Online-Retail-shaped workbooks and CSVs of each size in a temp directory.
+"""
+import sys
+import os
+import time
+import tempfile
+from datetime import datetime, timedelta
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pandas as pd
+from openpyxl import Workbook
+
+from app.services.preview_service import preview_upload
+
+HEADER = ["InvoiceNo", "StockCode", "Description", "Quantity", "InvoiceDate", "UnitPrice", "CustomerID", "Country"]
+
+
+def retail_rows(n):
+    start = datetime(2010, 12, 1, 8, 26)
+    for i in range(n):
+        yield [
+            str(536365 + i // 20), f"{85000 + i % 3000}", f"PRODUCT {i % 4000}", i % 12 + 1,
+            start + timedelta(minutes=i), round(0.5 + i % 90 / 10, 2), 12000 + i % 4300, "United Kingdom"
+        ]
+
+
+def write_files(directory, n):
+    xlsx = os.path.join(directory, f"retail_{n}.xlsx")
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet("Online Retail")
+    sheet.append(HEADER)
+    for row in retail_rows(n):
+        sheet.append(row)
+    workbook.save(xlsx)
+
+    csv = os.path.join(directory, f"retail_{n}.csv")
+    pd.DataFrame(retail_rows(n), columns=HEADER).to_csv(csv, index=False)
+    return xlsx, csv
+
+
+def timed(fn):
+    started = time.perf_counter()
+    result = fn()
+    return time.perf_counter() - started, result
+
+
+def preview(path):
+    with open(path, "rb") as f:
+        return preview_upload(f, path)
+
+
+def main():
+    sizes = [int(a) for a in sys.argv[1:]] or [10000, 100000, 300000]
+    with tempfile.TemporaryDirectory() as directory:
+        print(f"{'rows':>8} {'file':>5} {'MB':>7} {'preview s':>10} {'estimate':>9} {'nrows=5 s':>10}")
+        for n in sizes:
+            xlsx, csv = write_files(directory, n)
+            for path, kind, baseline in [
+                (xlsx, "xlsx", lambda p: pd.read_excel(p, nrows=5)),
+                (csv, "csv", lambda p: pd.read_csv(p, nrows=5)),
+            ]:
+                seconds, result = timed(lambda: preview(path))
+                base_seconds, _ = timed(lambda: baseline(path))
+                mb = os.path.getsize(path) / 1e6
+                print(f"{n:>8} {kind:>5} {mb:>7.1f} {seconds:>10.3f} {result['estimated_rows']:>9} {base_seconds:>10.3f}")
+    print("✅ Done")
+
+
+if __name__ == "__main__":
+    main()
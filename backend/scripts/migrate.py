@@ -0,0 +1,30 @@
+"""Bring the database schema up to date.
+
+Usage: python scripts/migrate.py            apply pending migrations
+       python scripts/migrate.py --status   list applied / pending versions
+"""
+import sys
+import os
+
+# Add backend directory to sys.path to import app modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.core.database import engine
+from app.core.migrations import MIGRATIONS, applied_versions, run_migrations
+
+if __name__ == "__main__":
+    if "--status" in sys.argv:
+        applied = applied_versions(engine)
+        for version, name, _ in MIGRATIONS:
+            state = f"applied {applied[version]}" if version in applied else "pending"
+            print(f"{version:4d}  {name:32s} {state}")
+        sys.exit(0)
+
+    try:
+        applied = run_migrations(engine)
+    except Exception as e:
+        print(f"❌ Migration failed: {e}")
+        sys.exit(1)
+    for version, name in applied:
+        print(f"✅ {version} {name}")
+    print("Schema is up to date." if applied else "Nothing to apply.")
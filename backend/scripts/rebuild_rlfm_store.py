@@ -0,0 +1,25 @@
+import sys
+import os
+
+# Add backend directory to sys.path to import app modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.core.database import SessionLocal, engine
+from app.models.models import CustomerRLFM
+from app.services.feature_store import rebuild_feature_store
+
+# customer_rlfm only holds derived data, so the table is recreated with the
+# feature-store columns (running aggregates) and backfilled from transactions.
+if __name__ == "__main__":
+    print("Recreating customer_rlfm table...")
+    CustomerRLFM.__table__.drop(bind=engine, checkfirst=True)
+    CustomerRLFM.__table__.create(bind=engine)
+
+    db = SessionLocal()
+    try:
+        count = rebuild_feature_store(db)
+        print(f"✅ Feature store rebuilt for {count} customers")
+    except Exception as e:
+        print(f"❌ Error: {e}")
+    finally:
+        db.close()
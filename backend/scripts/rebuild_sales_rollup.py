@@ -0,0 +1,22 @@
+import sys
+import os
+
+# Add backend directory to sys.path to import app modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.core.database import SessionLocal, engine
+from app.models.models import SalesRollup
+from app.services.rollup_service import rebuild_sales_rollup
+
+# sales_rollup only holds derived data: create it if missing and backfill from transactions.
+if __name__ == "__main__":
+    SalesRollup.__table__.create(bind=engine, checkfirst=True)
+
+    db = SessionLocal()
+    try:
+        count = rebuild_sales_rollup(db)
+        print(f"✅ Sales rollup rebuilt: {count} rows")
+    except Exception as e:
+        print(f"❌ Error: {e}")
+    finally:
+        db.close()
@@ -10,6 +10,8 @@ sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
 from app.core.database import SessionLocal, engine
 from app.models.models import Base, Customer, Transaction, ClusterResult
 from app.services.clustering_service import run_clustering
+from app.services.feature_store import rebuild_feature_store
+from app.services.rollup_service import rebuild_sales_rollup
 
 warnings.filterwarnings("ignore")
 
@@ -127,6 +129,11 @@ def seed_data():
             db.bulk_save_objects(transactions)
             db.commit()
             print("Finished inserting transactions.")
+
+        # Bulk inserts bypass the derived tables; rebuild them (each bumps the data version)
+        print("Rebuilding feature store and sales rollup...")
+        rebuild_feature_store(db)
+        rebuild_sales_rollup(db)
             
         # 4. Run Analysis
         print("Running Initial Analysis (K-Means, 3 Clusters)...")
@@ -4,7 +4,10 @@ from sqlalchemy.orm import sessionmaker
 from sqlalchemy.pool import StaticPool
 from fastapi.testclient import TestClient
 from app.main import app
+from app.api.auth import get_current_user
 from app.core.database import Base, get_db
+from app.models.user import User
+from app.services import model_registry
 
 # Use in-memory SQLite for testing
 SQLALCHEMY_DATABASE_URL = "sqlite:///:memory:"
@@ -37,3 +40,21 @@ def client(db):
     app.dependency_overrides[get_db] = override_get_db
     yield TestClient(app)
     del app.dependency_overrides[get_db]
+
+@pytest.fixture(autouse=True)
+def model_store(tmp_path, monkeypatch):
+    """Fitted models are saved under the test's tmp_path, never the working directory"""
+    monkeypatch.setattr(model_registry, "MODEL_STORE_DIR", str(tmp_path / "model_store"))
+    model_registry.model_cache.clear()
+    yield tmp_path / "model_store"
+    model_registry.model_cache.clear()
+
+@pytest.fixture(scope="function")
+def login_as(client):
+    """login_as(role) authenticates the test client as a user with that role; returns the client"""
+    def login(role="admin"):
+        app.dependency_overrides[get_current_user] = lambda: User(email=f"{role}@example.com", role=role)
+        return client
+
+    yield login
+    app.dependency_overrides.pop(get_current_user, None)
@@ -0,0 +1,57 @@
+from app.api import analytics
+from app.core.cache import ResponseCache
+from tests.test_rlfm_features import seed_transactions
+
+def test_summary_etag_follows_data_version(client, db):
+    seed_transactions(db)
+
+    first = client.get("/api/v1/analytics/summary")
+    assert first.status_code == 200
+    etag = first.headers["etag"]
+
+    cached = client.get("/api/v1/analytics/summary", headers={"If-None-Match": etag})
+    assert cached.status_code == 304
+
+    response = client.post("/api/v1/transaction/", json={
+        "customer_code": "C001",
+        "transaction_date": "2023-12-31T10:00:00",
+        "amount": 20.0
+    })
+    assert response.status_code == 200
+
+    refreshed = client.get("/api/v1/analytics/summary", headers={"If-None-Match": etag})
+    assert refreshed.status_code == 200
+    assert refreshed.headers["etag"] != etag
+    assert refreshed.json()["total_transactions"] == first.json()["total_transactions"] + 1
+
+def test_dashboard_and_data_quality_are_cached(client, db):
+    seed_transactions(db)
+    for path in ("/api/v1/analytics/dashboard", "/api/v1/analytics/data-quality"):
+        response = client.get(path)
+        assert response.status_code == 200
+        assert client.get(path, headers={"If-None-Match": response.headers["etag"]}).status_code == 304
+
+def test_recency_payloads_expire_with_the_day(client, db, monkeypatch):
+    seed_transactions(db)
+    monkeypatch.setattr(analytics, "recency_day", lambda: "2024-01-01")
+    paths = ("/api/v1/analytics/dashboard", "/api/v1/analytics/histogram?feature=recency")
+    etags = {path: client.get(path).headers["etag"] for path in paths}
+
+    # Same data version, but recency moved on by a day
+    monkeypatch.setattr(analytics, "recency_day", lambda: "2024-01-02")
+    for path in paths:
+        assert client.get(path, headers={"If-None-Match": etags[path]}).status_code == 200
+
+def test_lru_limits_and_disk_tier(tmp_path):
+    cache = ResponseCache(max_entries=2, max_bytes=10, directory=str(tmp_path))
+    cache.set("a", "v1", b"12345")
+    cache.set("b", "v1", b"12345")
+    cache.set("c", "v1", b"1")
+    # "a" was evicted from memory (byte limit) but another worker can still read it from disk
+    assert ("a", "v1") not in cache._entries
+    assert ResponseCache(directory=str(tmp_path)).get("a", "v1") == b"12345"
+
+    # A newer version replaces the old file
+    cache.set("a", "v2", b"new")
+    assert cache.get("a", "v1") is None
+    assert cache.get("a", "v2") == b"new"
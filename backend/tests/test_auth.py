@@ -0,0 +1,81 @@
+import pytest
+from sqlalchemy import event
+from app.api import auth
+from app.core import security
+from app.core.security import create_access_token, decode_access_token
+from app.models.user import User
+
+@pytest.fixture(autouse=True)
+def empty_user_cache():
+    auth.user_cache.clear()
+    yield
+    auth.user_cache.clear()
+
+def _user(db, email, role="staff"):
+    user = User(email=email, full_name=email.split("@")[0], hashed_password="unused", role=role)
+    db.add(user)
+    db.commit()
+    return user
+
+def _headers(email):
+    return {"Authorization": f"Bearer {create_access_token({'sub': email})}"}
+
+@pytest.fixture
+def user_queries(db):
+    queries = []
+
+    def capture(conn, cursor, statement, *args):
+        if "FROM users" in statement:
+            queries.append(statement)
+
+    event.listen(db.get_bind(), "before_cursor_execute", capture)
+    yield queries
+    event.remove(db.get_bind(), "before_cursor_execute", capture)
+
+def test_verified_user_is_cached_per_token(client, db, user_queries):
+    _user(db, "ana@example.com")
+    headers = _headers("ana@example.com")
+    queries = user_queries
+
+    for _ in range(3):
+        response = client.get("/api/v1/auth/me", headers=headers)
+        assert response.status_code == 200
+        assert response.json()["email"] == "ana@example.com"
+    assert len(queries) == 1
+
+    # A different token for the same user is looked up once on its own
+    client.get("/api/v1/auth/me", headers=_headers("ana@example.com"))
+    assert len(queries) == 2
+
+def test_bad_tokens_are_rejected(client, db):
+    assert client.get("/api/v1/auth/me", headers={"Authorization": "Bearer nonsense"}).status_code == 401
+    # Valid signature but no such user
+    assert client.get("/api/v1/auth/me", headers=_headers("ghost@example.com")).status_code == 401
+
+def test_profile_and_role_changes_invalidate(client, db):
+    staff = _user(db, "sam@example.com")
+    _user(db, "root@example.com", role="admin")
+    headers = _headers("sam@example.com")
+    assert client.get("/api/v1/auth/me", headers=headers).json()["full_name"] == "sam"
+
+    response = client.put("/api/v1/auth/me", headers=headers, json={"full_name": "Sam Smith"})
+    assert response.status_code == 200
+    assert client.get("/api/v1/auth/me", headers=headers).json()["full_name"] == "Sam Smith"
+
+    # Only admins may change roles; the change is visible on the next request
+    assert client.put(f"/api/v1/auth/users/{staff.id}/role", headers=headers, json={"role": "admin"}).status_code == 403
+    response = client.put(f"/api/v1/auth/users/{staff.id}/role", headers=_headers("root@example.com"), json={"role": "admin"})
+    assert response.status_code == 200
+    assert client.get("/api/v1/auth/me", headers=headers).json()["role"] == "admin"
+
+def test_login_issues_distinct_token_ids(client, db, monkeypatch):
+    _user(db, "lee@example.com")
+    monkeypatch.setattr(security, "verify_password", lambda plain, hashed: plain == "secret")
+
+    form = {"username": "lee@example.com", "password": "secret"}
+    first = client.post("/api/v1/auth/token", data=form).json()["access_token"]
+    second = client.post("/api/v1/auth/token", data=form).json()["access_token"]
+    assert decode_access_token(first)["sub"] == "lee@example.com"
+    assert decode_access_token(first)["jti"] != decode_access_token(second)["jti"]
+
+    assert client.post("/api/v1/auth/token", data={**form, "password": "wrong"}).status_code == 401
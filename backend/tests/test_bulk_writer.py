@@ -0,0 +1,20 @@
+import numpy as np
+from app.models.models import ClusterResult, CustomerCluster
+from app.services.bulk_writer import write_cluster_labels
+
+def test_write_cluster_labels_in_chunks(db):
+    run = ClusterResult(run_name="bulk", algorithm="kmeans", parameters={})
+    db.add(run)
+    db.commit()
+
+    customer_ids = np.arange(1, 1001)
+    labels = customer_ids % 4
+    assert write_cluster_labels(db, run.id, customer_ids, labels, chunk_size=300) == 1000
+    db.commit()
+
+    rows = db.query(CustomerCluster.customer_id, CustomerCluster.cluster_label)\
+        .filter(CustomerCluster.cluster_result_id == run.id)\
+        .order_by(CustomerCluster.customer_id).all()
+    assert len(rows) == 1000
+    assert rows[0] == (1, 1)
+    assert rows[-1] == (1000, 0)
@@ -0,0 +1,37 @@
+from app.models.models import ClusterProfile
+from app.services.clustering_service import run_clustering
+from app.services.strategy_service import generate_strategies, generate_strategies_from_transactions
+from tests.test_rlfm_features import seed_transactions
+
+def test_profiles_are_written_once_and_drive_strategies(db):
+    seed_transactions(db)
+    result = run_clustering("kmeans", {"n_clusters": 2}, db, "profiles")
+    run_id = result["run_id"]
+
+    profiles = db.query(ClusterProfile).filter(ClusterProfile.cluster_result_id == run_id).all()
+    assert {p.cluster_label: p.customer_count for p in profiles} == result["counts"]
+    assert sum(p.transaction_count for p in profiles) == 7
+    assert set(profiles[0].quantiles["monetary"]) == {"p25", "p50", "p75"}
+
+    strategies = generate_strategies(run_id, db)
+    legacy = generate_strategies_from_transactions(run_id, db)
+    assert len(strategies) == 2
+    assert "quantiles" in strategies[0]
+
+    # Same per-cluster statistics as the transaction join, without running it
+    by_cluster = {s["cluster"]: s for s in strategies}
+    for row in legacy:
+        current = by_cluster[row["cluster"]]
+        assert current["customer_count"] == row["customer_count"]
+        assert current["transaction_count"] == row["transaction_count"]
+        assert abs(current["avg_spend"] - row["avg_spend"]) < 1e-9
+
+def test_runs_without_profiles_fall_back(db):
+    seed_transactions(db)
+    run_id = run_clustering("kmeans", {"n_clusters": 2}, db, "legacy")["run_id"]
+    db.query(ClusterProfile).delete()
+    db.commit()
+
+    strategies = generate_strategies(run_id, db)
+    assert sum(s["customer_count"] for s in strategies) == 3
+    assert "quantiles" not in strategies[0]
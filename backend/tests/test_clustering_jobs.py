@@ -0,0 +1,141 @@
+import subprocess
+import sys
+import pytest
+from concurrent.futures import Future
+from concurrent.futures.process import BrokenProcessPool
+from app.models.models import ClusteringJob, CustomerCluster
+from app.services import job_service
+from sqlalchemy.orm import sessionmaker
+from tests.test_rlfm_features import seed_transactions
+
+class InlineExecutor:
+    """Runs jobs synchronously in the test process"""
+    def submit(self, fn, *args):
+        future = Future()
+        future.set_running_or_notify_cancel()
+        future.set_result(fn(*args))
+        return future
+
+class BrokenExecutor:
+    """The pool's worker died before the job could report anything"""
+    def submit(self, fn, *args):
+        future = Future()
+        future.set_exception(BrokenProcessPool("A process in the process pool was terminated abruptly"))
+        return future
+
+class IdleExecutor:
+    """Accepts jobs but never starts them"""
+    def submit(self, fn, *args):
+        return Future()
+
+@pytest.fixture
+def admin_client(login_as, db, monkeypatch):
+    # Job workers open their own sessions; point them at the test database
+    monkeypatch.setattr(job_service, "SessionLocal", sessionmaker(bind=db.get_bind()))
+    return login_as("admin")
+
+def test_run_returns_job_and_completes(admin_client, db, monkeypatch):
+    monkeypatch.setattr(job_service, "_executor", InlineExecutor())
+    seed_transactions(db)
+
+    response = admin_client.post("/api/v1/run", json={
+        "algorithm": "kmeans", "params": {"n_clusters": 2}, "run_name": "job_run"
+    })
+    assert response.status_code == 200
+    job_id = response.json()["job_id"]
+
+    job = admin_client.get(f"/api/v1/jobs/{job_id}").json()
+    assert job["status"] == "completed"
+    assert job["progress"] == 1.0
+    assert sum(job["result"]["counts"].values()) == 3
+    assert job["run_id"] is not None
+    assert db.query(CustomerCluster).filter(CustomerCluster.cluster_result_id == job["run_id"]).count() == 3
+
+def test_failed_job_reports_error(admin_client, db, monkeypatch):
+    monkeypatch.setattr(job_service, "_executor", InlineExecutor())
+    seed_transactions(db)
+
+    job_id = admin_client.post("/api/v1/run", json={
+        "algorithm": "unknown", "params": {}, "run_name": "bad"
+    }).json()["job_id"]
+
+    job = admin_client.get(f"/api/v1/jobs/{job_id}").json()
+    assert job["status"] == "failed"
+    assert "Unknown algorithm" in job["error"]
+
+def test_cancel_queued_job(admin_client, db, monkeypatch):
+    monkeypatch.setattr(job_service, "_executor", IdleExecutor())
+
+    job_id = admin_client.post("/api/v1/run", json={
+        "algorithm": "kmeans", "params": {}, "run_name": "queued"
+    }).json()["job_id"]
+
+    active = admin_client.get("/api/v1/history/jobs").json()
+    assert [j["job_id"] for j in active] == [job_id]
+
+    job = admin_client.post(f"/api/v1/jobs/{job_id}/cancel").json()
+    assert job["status"] == "cancelled"
+    assert admin_client.get("/api/v1/history/jobs").json() == []
+
+def test_job_list_requires_login(client, login_as):
+    assert client.get("/api/v1/history/jobs").status_code == 401
+    assert login_as("customer").get("/api/v1/history/jobs").status_code == 403
+    assert login_as("staff").get("/api/v1/history/jobs?limit=100000").status_code == 200
+
+def test_cancel_requested_stops_running_job(admin_client, db, monkeypatch):
+    monkeypatch.setattr(job_service, "_executor", IdleExecutor())
+    seed_transactions(db)
+
+    job_id = admin_client.post("/api/v1/run", json={
+        "algorithm": "kmeans", "params": {}, "run_name": "running"
+    }).json()["job_id"]
+    job_service._futures.clear()  # simulate a job owned by another worker process
+    admin_client.post(f"/api/v1/jobs/{job_id}/cancel")
+
+    job_service.execute_clustering_job(job_id)
+
+    db.expire_all()
+    job = db.get(ClusteringJob, job_id)
+    assert job.status == "cancelled"
+    assert job.cluster_result_id is None
+
+def _dead_owner():
+    process = subprocess.Popen([sys.executable, "-c", "pass"])
+    process.wait()
+    return f"{job_service.job_owner().rpartition(':')[0]}:{process.pid}"
+
+def test_orphaned_jobs_are_failed_at_startup(db):
+    jobs = {
+        "legacy": ("running", None),
+        "dead": ("queued", _dead_owner()),
+        "ours": ("running", job_service.job_owner()),
+        "remote": ("running", "other-host:1"),
+        "done": ("completed", None),
+    }
+    for job_id, (status, owner) in jobs.items():
+        db.add(ClusteringJob(id=job_id, status=status, owner=owner, run_name=job_id))
+    db.commit()
+
+    assert job_service.recover_orphaned_jobs(db) == 2
+    statuses = {job.id: job.status for job in db.query(ClusteringJob)}
+    assert statuses == {"legacy": "failed", "dead": "failed", "ours": "running", "remote": "running", "done": "completed"}
+    assert "restarted" in db.get(ClusteringJob, "dead").error
+
+def test_broken_pool_fails_the_job(admin_client, db, monkeypatch):
+    monkeypatch.setattr(job_service, "_executor", BrokenExecutor())
+
+    job_id = admin_client.post("/api/v1/run", json={
+        "algorithm": "kmeans", "params": {}, "run_name": "broken"
+    }).json()["job_id"]
+
+    job = admin_client.get(f"/api/v1/jobs/{job_id}").json()
+    assert job["status"] == "failed"
+    assert "terminated abruptly" in job["error"]
+    assert job_id not in job_service._futures
+
+def test_cancel_orphaned_job(admin_client, db):
+    db.add(ClusteringJob(id="orphan", status="running", owner=_dead_owner(), run_name="orphan"))
+    db.commit()
+
+    job = admin_client.post("/api/v1/jobs/orphan/cancel").json()
+    assert job["status"] == "cancelled"
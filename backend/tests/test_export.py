@@ -0,0 +1,75 @@
+import io
+import json
+import pandas as pd
+import pytest
+from app.models.models import ClusterResult, Customer, CustomerCluster
+from app.services import export_service
+from app.services.feature_store import rebuild_feature_store
+from tests.test_rlfm_features import seed_transactions
+
+def _seed_run(db):
+    seed_transactions(db)
+    run = ClusterResult(run_name="export", algorithm="kmeans", parameters={})
+    db.add(run)
+    db.flush()
+    labels = {"C001": 0, "C002": 1, "C003": 0}
+    for customer in db.query(Customer).all():
+        db.add(CustomerCluster(cluster_result_id=run.id, customer_id=customer.id, cluster_label=labels[customer.customer_code]))
+    db.commit()
+    return run.id
+
+def test_rlfm_csv_streams_in_chunks(client, db, monkeypatch):
+    seed_transactions(db)
+    rebuild_feature_store(db)
+    monkeypatch.setattr(export_service, "EXPORT_CHUNK_SIZE", 2)
+
+    response = client.get("/api/v1/rlfm/export", params={"format": "csv"})
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/csv")
+    assert 'filename="rlfm_features.csv"' in response.headers["content-disposition"]
+
+    frame = pd.read_csv(io.StringIO(response.text))
+    assert list(frame.columns) == export_service.RLFM_COLUMNS
+    # Header written once across chunks
+    assert frame["customer_code"].tolist() == ["C001", "C002", "C003"]
+    assert frame.set_index("customer_code").loc["C002", "monetary"] == 300.0
+
+def test_cluster_members_ndjson(client, db):
+    run_id = _seed_run(db)
+
+    # Spend from the transaction join (store empty) ...
+    response = client.get(f"/api/v1/strategy/{run_id}/customers/export", params={"format": "ndjson", "cluster_label": 0})
+    assert response.status_code == 200
+    rows = [json.loads(line) for line in response.text.splitlines() if line]
+    assert {r["customer_code"]: r["total_spend"] for r in rows} == {"C001": 175.5, "C003": 97.0}
+
+    # ... and from the feature store once it is populated
+    rebuild_feature_store(db)
+    rows = [json.loads(line) for line in client.get(f"/api/v1/strategy/{run_id}/customers/export", params={"format": "ndjson"}).text.splitlines()]
+    assert {r["customer_code"]: (r["cluster_label"], r["total_spend"]) for r in rows} == {
+        "C001": (0, 175.5), "C002": (1, 300.0), "C003": (0, 97.0)
+    }
+
+def test_export_errors(client, db):
+    run_id = _seed_run(db)
+    assert client.get("/api/v1/rlfm/export", params={"format": "xlsx"}).status_code == 400
+    assert client.get("/api/v1/strategy/999/customers/export").status_code == 404
+    # Empty cluster still yields a header
+    response = client.get(f"/api/v1/strategy/{run_id}/customers/export", params={"cluster_label": 7})
+    assert response.text.strip() == ",".join(export_service.MEMBER_COLUMNS)
+
+@pytest.mark.parametrize("fmt", ["parquet", "arrow"])
+def test_columnar_exports(client, db, monkeypatch, fmt):
+    pa = pytest.importorskip("pyarrow")
+    run_id = _seed_run(db)
+    monkeypatch.setattr(export_service, "EXPORT_CHUNK_SIZE", 1)
+
+    body = client.get(f"/api/v1/strategy/{run_id}/customers/export", params={"format": fmt}).content
+    if fmt == "parquet":
+        import pyarrow.parquet as pq
+        table = pq.read_table(pa.BufferReader(body))
+    else:
+        table = pa.ipc.open_stream(body).read_all()
+    assert table.column_names == export_service.MEMBER_COLUMNS
+    assert table.num_rows == 3
+    assert sorted(table.column("total_spend").to_pylist()) == [97.0, 175.5, 300.0]
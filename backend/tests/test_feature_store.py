@@ -0,0 +1,106 @@
+import pandas as pd
+from datetime import datetime
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from app.core.database import Base
+from app.models.models import Customer, CustomerRLFM, Transaction
+from app.services.clustering_service import get_customer_data, load_run_features
+from app.services.feature_store import (
+    load_customer_features, rebuild_feature_store, refresh_customer_features, store_is_populated
+)
+from tests.test_rlfm_features import seed_transactions, REFERENCE_DATE
+from tests.test_sales_rollup import run_concurrently
+
+def test_store_matches_transaction_aggregation(db):
+    seed_transactions(db)
+    assert rebuild_feature_store(db) == 3
+
+    stored, stored_map = load_customer_features(db, reference_date=REFERENCE_DATE)
+    computed, computed_map = get_customer_data(db, reference_date=REFERENCE_DATE)
+
+    pd.testing.assert_frame_equal(stored, computed, check_dtype=False)
+    pd.testing.assert_frame_equal(stored_map, computed_map, check_dtype=False)
+
+def test_manual_transaction_updates_only_that_customer(client, db):
+    seed_transactions(db)
+    rebuild_feature_store(db)
+    before = {r.customer_id: r.updated_at for r in db.query(CustomerRLFM).all()}
+
+    response = client.post("/api/v1/transaction/", json={
+        "customer_code": "C002",
+        "transaction_date": "2023-12-31T10:00:00",
+        "amount": 20.0,
+        "product_category": "Books"
+    })
+    assert response.status_code == 200
+
+    features, customer_map = load_customer_features(db, reference_date=REFERENCE_DATE)
+    c002 = customer_map.index[customer_map['customer_code'] == 'C002'][0]
+    assert features.loc[c002, 'monetary'] == 320.0
+    assert features.loc[c002, 'recency'] == 0
+    assert features.loc[c002, 'variety'] == 1
+
+    after = {r.customer_id: r.updated_at for r in db.query(CustomerRLFM).all()}
+    changed = [cid for cid in after if after[cid] != before[cid]]
+    assert changed == [c002]
+
+def test_refresh_inserts_new_customers(db):
+    # Built while empty, so later refreshes are deltas
+    rebuild_feature_store(db)
+    seed_transactions(db)
+    assert refresh_customer_features(db, [1, 3]) == 2
+    db.commit()
+    features, _ = load_customer_features(db)
+    assert sorted(features.index.tolist()) == [1, 3]
+
+def test_upload_refreshes_store(db):
+    from app.services.data_service import process_upload_file
+    content = b"code,total,date\nC001,100,2023-01-01\nC002,200,2023-01-02\nC001,50,2023-02-01"
+    mapping = {"customer_code": "code", "amount": "total", "transaction_date": "date"}
+    process_upload_file(content, "upload.csv", db, mapping)
+
+    features, customer_map = load_customer_features(db, reference_date=datetime(2023, 3, 1))
+    by_code = features.join(customer_map).set_index('customer_code')
+    assert by_code.loc['C001', 'monetary'] == 150.0
+    assert by_code.loc['C001', 'length'] == 31
+    assert by_code.loc['C002', 'recency'] == (datetime(2023, 3, 1) - datetime(2023, 1, 2)).days
+
+def test_first_write_backfills_an_unbuilt_store(client, db):
+    # Existing history, store never built: one manual transaction must not leave
+    # the store holding only the customer it touched
+    seed_transactions(db)
+    response = client.post("/api/v1/transaction/", json={
+        "customer_code": "C002",
+        "transaction_date": "2023-12-31T10:00:00",
+        "amount": 20.0
+    })
+    assert response.status_code == 200
+    assert store_is_populated(db)
+
+    features, _ = load_run_features(db)
+    assert len(features) == 3
+    assert db.query(CustomerRLFM).count() == 3
+
+def test_concurrent_refreshes_of_a_new_customer(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'store.db'}", connect_args={"timeout": 30})
+    Base.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine)()
+    rebuild_feature_store(db)
+    customer = Customer(customer_code="NEW", name="NEW")
+    db.add(customer)
+    db.flush()
+    db.add_all([
+        Transaction(customer_id=customer.id, transaction_code=f"T{i}", transaction_date=datetime(2024, 1, 1 + i), amount=10.0)
+        for i in range(2)
+    ])
+    db.commit()
+    customer_id = customer.id
+    db.close()
+
+    # Both find no row for the customer; the second insert must become an update
+    run_concurrently(engine, [lambda s: refresh_customer_features(s, [customer_id])] * 2, "customer_rlfm")
+
+    db = sessionmaker(bind=engine)()
+    row = db.query(CustomerRLFM).one()
+    assert (row.customer_id, row.transaction_count, row.monetary) == (customer_id, 2, 20.0)
+    db.close()
@@ -0,0 +1,45 @@
+import numpy as np
+from datetime import timedelta
+from app.models.models import CustomerRLFM
+from app.services.histogram_service import bin_edges, feature_histogram
+from tests.test_rlfm_features import REFERENCE_DATE, seed_transactions
+
+def _seed_store(db, n=500):
+    rng = np.random.default_rng(0)
+    monetary = rng.lognormal(4, 1.5, n).round(2)
+    last_dates = [REFERENCE_DATE - timedelta(days=int(d), hours=int(h)) for d, h in zip(rng.integers(0, 400, n), rng.integers(0, 24, n))]
+    db.bulk_insert_mappings(CustomerRLFM, [
+        {"customer_id": i + 1, "monetary": float(m), "frequency": float(i % 7), "length": 0.0, "variety": 1.0, "last_date": d}
+        for i, (m, d) in enumerate(zip(monetary, last_dates))
+    ])
+    db.commit()
+    recency = np.array([(REFERENCE_DATE - d).days for d in last_dates], dtype=float)
+    return monetary, recency
+
+def test_linear_and_log_bins_match_numpy(db):
+    monetary, recency = _seed_store(db)
+
+    for feature, values in (("monetary", monetary), ("recency", recency)):
+        for scale in ("linear", "log"):
+            histogram = feature_histogram(db, feature, bins=8, scale=scale, reference_date=REFERENCE_DATE)
+            edges = bin_edges(values.min(), values.max(), 8, scale)
+            expected, _ = np.histogram(values, bins=edges)
+            assert [h["count"] for h in histogram] == expected.tolist(), (feature, scale)
+
+def test_quantile_bins_have_equal_counts(db):
+    monetary, _ = _seed_store(db)
+    histogram = feature_histogram(db, "monetary", bins=5, scale="quantile")
+
+    assert [h["count"] for h in histogram] == [100] * 5
+    assert histogram[0]["start"] == monetary.min()
+    assert histogram[-1]["end"] == monetary.max()
+
+def test_dashboard_histograms_cover_all_customers(client, db):
+    seed_transactions(db)
+    rfm_dist = client.get("/api/v1/analytics/dashboard").json()["rfm_dist"]
+    # The feature store is backfilled on first read, so every customer is binned
+    assert sum(h["count"] for h in rfm_dist["monetary"]) == 3
+
+    response = client.get("/api/v1/analytics/histogram?feature=recency&bins=3&scale=quantile")
+    assert response.status_code == 200
+    assert sum(h["count"] for h in response.json()["bins"]) == 3
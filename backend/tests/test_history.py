@@ -0,0 +1,64 @@
+from datetime import datetime
+from sqlalchemy import text
+from app.models.models import ClusterResult, ClusteringJob, CustomerCluster, SegmentTransition
+from app.services.clustering_service import run_clustering
+from tests.test_rlfm_features import seed_transactions
+
+def test_saved_run_stores_statistics(db):
+    seed_transactions(db)
+    result = run_clustering("kmeans", {"n_clusters": 2}, db, "stats")
+
+    run = db.get(ClusterResult, result["run_id"])
+    assert run.customer_count == 3
+    assert {int(k): v for k, v in run.cluster_sizes.items()} == result["counts"]
+    assert run.fit_seconds >= 0
+    assert set(run.feature_means) == {"monetary", "recency", "length", "variety", "frequency"}
+
+def test_history_keyset_pages_and_filters(client, db):
+    for i in range(5):
+        db.add(ClusterResult(
+            run_name=f"run{i}",
+            algorithm="kmeans" if i % 2 == 0 else "dbscan",
+            created_at=datetime(2024, 1, 1 + i),
+            customer_count=10 * i,
+            cluster_sizes={"0": 10 * i}
+        ))
+    # Saved before the statistics columns existed
+    legacy = ClusterResult(run_name="legacy", algorithm="kmeans", created_at=datetime(2023, 12, 1))
+    db.add(legacy)
+    db.flush()
+    db.add_all([CustomerCluster(cluster_result_id=legacy.id, customer_id=c, cluster_label=0) for c in (1, 2)])
+    db.commit()
+
+    names, cursor = [], None
+    while True:
+        params = {"limit": 2, **({"cursor": cursor} if cursor else {})}
+        page = client.get("/api/v1/history/", params=params).json()
+        names += [item["run_name"] for item in page["items"]]
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+    assert names == ["run4", "run3", "run2", "run1", "run0", "legacy"]
+
+    page = client.get("/api/v1/history/", params={"algorithm": "kmeans", "start_date": "2023-11-01T00:00:00", "end_date": "2024-01-03T00:00:00"}).json()
+    assert [(item["run_name"], item["customer_count"]) for item in page["items"]] == [("run2", 20), ("run0", 0), ("legacy", 2)]
+
+    assert client.get("/api/v1/history/", params={"cursor": "garbage"}).status_code == 400
+
+def test_deleting_a_run_releases_its_jobs_and_transitions(login_as, db):
+    seed_transactions(db)
+    run_id = run_clustering("kmeans", {"n_clusters": 2}, db, "doomed")["run_id"]
+    db.add(ClusteringJob(id="a" * 32, status="completed", run_name="doomed", cluster_result_id=run_id))
+    db.add(SegmentTransition(cluster_result_id=run_id, customer_id=1, from_label=None, to_label=0, source="upload"))
+    db.commit()
+
+    # SQLite only enforces foreign keys when asked to
+    db.execute(text("PRAGMA foreign_keys=ON"))
+    try:
+        assert login_as("admin").delete(f"/api/v1/history/{run_id}").status_code == 200
+    finally:
+        db.execute(text("PRAGMA foreign_keys=OFF"))
+
+    assert db.get(ClusterResult, run_id) is None
+    assert db.get(ClusteringJob, "a" * 32).cluster_result_id is None
+    assert db.query(SegmentTransition).count() == 0
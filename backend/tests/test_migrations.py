@@ -0,0 +1,93 @@
+from sqlalchemy import create_engine, inspect, text
+from app.core.migrations import MIGRATIONS, pending_migrations, run_migrations
+
+# Tables as they were before any migration existed
+OLD_SCHEMA = [
+    "CREATE TABLE users (id INTEGER PRIMARY KEY, email VARCHAR, full_name VARCHAR, hashed_password VARCHAR, is_active BOOLEAN)",
+    "CREATE TABLE customers (id INTEGER PRIMARY KEY, customer_code VARCHAR UNIQUE, name VARCHAR, created_at DATETIME)",
+    "CREATE TABLE transactions (id INTEGER PRIMARY KEY, customer_id INTEGER, transaction_code VARCHAR, "
+    "transaction_date DATETIME, amount FLOAT, product_category VARCHAR)",
+    "CREATE TABLE cluster_results (id INTEGER PRIMARY KEY, run_name VARCHAR, algorithm VARCHAR, parameters JSON, "
+    "created_at DATETIME, model_path VARCHAR)",
+    "CREATE TABLE customer_clusters (id INTEGER PRIMARY KEY, cluster_result_id INTEGER, customer_id INTEGER, cluster_label INTEGER)",
+    "CREATE TABLE customer_rlfm (id INTEGER PRIMARY KEY, customer_id INTEGER, recency FLOAT, frequency FLOAT, "
+    "monetary FLOAT, length FLOAT, variety FLOAT, created_at DATETIME)",
+    "CREATE TABLE interactions (id INTEGER PRIMARY KEY, customer_id INTEGER, channel VARCHAR, interaction_date DATETIME, "
+    "content VARCHAR, sentiment VARCHAR)",
+    "INSERT INTO customers (id, customer_code, name) VALUES (1, 'C001', 'A'), (2, 'C002', 'B'), (3, 'C003', 'C')",
+    "INSERT INTO transactions (customer_id, transaction_code, transaction_date, amount, product_category) VALUES "
+    "(1, 'T1', '2023-01-01 00:00:00', 10.0, 'Books'), (2, 'T2', '2023-01-02 00:00:00', 20.0, 'Toys'), "
+    "(3, 'T3', '2023-01-03 00:00:00', 30.0, 'Books')",
+    "INSERT INTO cluster_results (id, run_name, algorithm) VALUES (1, 'old run', 'kmeans')",
+    "INSERT INTO customer_clusters (cluster_result_id, customer_id, cluster_label) VALUES (1, 1, 0), (1, 2, 0), (1, 3, 1)",
+]
+
+def _indexes(engine, table):
+    return {i["name"] for i in inspect(engine).get_indexes(table)}
+
+def test_old_database_is_brought_up_to_date(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'old.db'}")
+    with engine.begin() as conn:
+        for statement in OLD_SCHEMA:
+            conn.execute(text(statement))
+
+    applied = run_migrations(engine)
+    assert [version for version, _ in applied] == [version for version, _, _ in MIGRATIONS]
+    assert pending_migrations(engine) == []
+
+    columns = {c["name"] for c in inspect(engine).get_columns("transactions")}
+    assert "idempotency_key" in columns
+    assert "role" in {c["name"] for c in inspect(engine).get_columns("users")}
+    assert "transaction_count" in {c["name"] for c in inspect(engine).get_columns("customer_rlfm")}
+    assert "owner" in {c["name"] for c in inspect(engine).get_columns("clustering_jobs")}
+    assert {"ix_transactions_customer_rlfm", "uq_transactions_idempotency_key"} <= _indexes(engine, "transactions")
+    assert "ix_customer_clusters_run_label_customer" in _indexes(engine, "customer_clusters")
+    assert "ix_interactions_customer_date" in _indexes(engine, "interactions")
+    # New tables come from the models
+    assert "sales_rollup" in inspect(engine).get_table_names()
+
+    with engine.connect() as conn:
+        count, sizes = conn.execute(text("SELECT customer_count, cluster_sizes FROM cluster_results WHERE id = 1")).one()
+    assert count == 3
+    assert sizes == '{"0": 2, "1": 1}'
+
+    # Derived tables are backfilled from every transaction, not left empty
+    with engine.connect() as conn:
+        assert conn.execute(text("SELECT COUNT(*) FROM customer_rlfm")).scalar() == 3
+        assert conn.execute(text("SELECT SUM(transaction_count) FROM sales_rollup WHERE granularity = 'month'")).scalar() == 3
+        names = conn.execute(text("SELECT name FROM backfill_state ORDER BY name")).scalars().all()
+        assert names == ["customer_rlfm", "sales_rollup"]
+
+    # Second run is a no-op
+    assert run_migrations(engine) == []
+
+def test_fresh_database_matches_the_models(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'fresh.db'}")
+    run_migrations(engine)
+    # Every index declared on the models exists once; the steps add nothing extra
+    assert _indexes(engine, "transactions") == {
+        "ix_transactions_id", "ix_transactions_transaction_code", "ix_transactions_date_id",
+        "ix_transactions_customer_date_id", "ix_transactions_category_date_id",
+        "ix_transactions_customer_rlfm", "uq_transactions_idempotency_key"
+    }
+
+def test_float_customer_codes_are_normalised(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'codes.db'}")
+    run_migrations(engine)
+    with engine.begin() as conn:
+        # 17850 was uploaded before (as '17850.0') and after the code fix
+        conn.execute(text(
+            "INSERT INTO customers (id, customer_code) VALUES (1, '17850.0'), (2, '13047.0'), (3, '17850'), (4, 'A1.0')"
+        ))
+        conn.execute(text(
+            "INSERT INTO transactions (customer_id, transaction_date, amount) VALUES "
+            "(1, '2011-01-01 00:00:00', 5.0), (3, '2011-02-01 00:00:00', 7.0)"
+        ))
+        conn.execute(text("DELETE FROM schema_migrations WHERE version = 9"))
+
+    assert run_migrations(engine) == [(9, "integer_customer_codes")]
+    with engine.connect() as conn:
+        customers = dict(conn.execute(text("SELECT customer_code, id FROM customers")).all())
+        assert customers == {"17850": 3, "13047": 2, "A1.0": 4}
+        assert conn.execute(text("SELECT customer_id FROM transactions")).scalars().all() == [3, 3]
+        assert conn.execute(text("SELECT name FROM backfill_state")).scalars().all() == ["sales_rollup"]
@@ -0,0 +1,77 @@
+import os
+import numpy as np
+import pytest
+from app.models.models import ClusterResult, Customer, CustomerCluster
+from app.services import model_registry
+from app.services.clustering_service import FEATURE_COLUMNS, load_run_features, run_clustering
+from tests.test_rlfm_features import seed_transactions
+
+@pytest.fixture
+def staff_client(login_as):
+    # Artifacts land in tmp_path/model_store (see conftest)
+    return login_as("staff")
+
+def _stored_labels(db, run_id):
+    rows = db.query(Customer.customer_code, CustomerCluster.cluster_label)\
+        .join(CustomerCluster, CustomerCluster.customer_id == Customer.id)\
+        .filter(CustomerCluster.cluster_result_id == run_id).all()
+    return dict(rows)
+
+@pytest.mark.parametrize("algorithm, params, method", [
+    ("kmeans", {"n_clusters": 2}, "predict"),
+    ("dbscan", {"eps": 0.5, "min_samples": 1}, "core_points"),
+    ("hierarchical", {"n_clusters": 3}, "centroids"),
+])
+def test_saved_run_scores_its_own_customers(staff_client, db, algorithm, params, method):
+    seed_transactions(db)
+    run_id = run_clustering(algorithm, params, db, "registry")["run_id"]
+
+    run = db.get(ClusterResult, run_id)
+    assert os.path.isdir(run.model_path)
+    model = model_registry.load_model(run_id)
+    assert model.meta["method"] == method
+    assert model.features == FEATURE_COLUMNS
+    # Arrays are memory-mapped, not read into memory
+    assert isinstance(model.arrays["scaler_mean"], np.memmap)
+
+    response = staff_client.post(f"/api/v1/clustering/{run_id}/assign", json={"customer_codes": ["C001", "C002", "C003", "NOPE"]})
+    assert response.status_code == 200
+    body = response.json()
+    assert {a["customer_code"]: a["cluster"] for a in body["assignments"]} == _stored_labels(db, run_id)
+    assert body["missing"] == ["NOPE"]
+
+def test_raw_vectors_in_list_or_named_form(staff_client, db):
+    seed_transactions(db)
+    run_id = run_clustering("kmeans", {"n_clusters": 2}, db, "vectors")["run_id"]
+    features, customer_map = load_run_features(db)
+    row = features.loc[customer_map.index[customer_map['customer_code'] == "C002"][0]]
+
+    body = staff_client.post(f"/api/v1/clustering/{run_id}/assign", json={
+        "vectors": [row.tolist(), {name: float(row[name]) for name in FEATURE_COLUMNS}]
+    }).json()
+    expected = _stored_labels(db, run_id)["C002"]
+    assert body["assignments"] == [{"index": 0, "cluster": expected}, {"index": 1, "cluster": expected}]
+
+    response = staff_client.post(f"/api/v1/clustering/{run_id}/assign", json={"vectors": [[1.0, 2.0]]})
+    assert response.status_code == 400
+
+def test_runs_without_a_model(staff_client, db):
+    assert staff_client.post("/api/v1/clustering/99/assign", json={"customer_codes": ["C001"]}).status_code == 404
+
+    legacy = ClusterResult(run_name="legacy", algorithm="kmeans", parameters={})
+    db.add(legacy)
+    db.commit()
+    response = staff_client.post(f"/api/v1/clustering/{legacy.id}/assign", json={"customer_codes": ["C001"]})
+    assert response.status_code == 404
+    assert "re-run" in response.json()["detail"]
+
+def test_deleting_a_run_removes_its_model(staff_client, login_as, db):
+    seed_transactions(db)
+    run_id = run_clustering("kmeans", {"n_clusters": 2}, db, "doomed")["run_id"]
+    directory = db.get(ClusterResult, run_id).model_path
+    assert model_registry.load_model(run_id) is not None
+
+    login_as("admin")
+    assert staff_client.delete(f"/api/v1/history/{run_id}").status_code == 200
+    assert not os.path.exists(directory)
+    assert model_registry.load_model(run_id) is None
@@ -0,0 +1,97 @@
+import threading
+import pytest
+from datetime import datetime
+from sqlalchemy.orm import sessionmaker
+from app.core.cache import bump_data_version
+from app.models.models import Customer, DataProfile, Transaction
+from app.services import profiler
+
+def _seed(db):
+    customer = Customer(customer_code="C001", name=None)
+    db.add(customer)
+    db.flush()
+    db.add_all([
+        Transaction(customer_id=customer.id, transaction_code="INV1", transaction_date=datetime(2023, 1, 1), amount=10.0, product_category="A"),
+        Transaction(customer_id=customer.id, transaction_code="INV1", transaction_date=datetime(2023, 1, 2), amount=-5.0, product_category=None),
+        Transaction(customer_id=customer.id, transaction_code=None, transaction_date=datetime(2023, 2, 1), amount=0.0, product_category="B"),
+        # Customer 999 does not exist
+        Transaction(customer_id=999, transaction_code="INV2", transaction_date=datetime(2023, 3, 1), amount=7.0, product_category="A"),
+    ])
+    db.commit()
+
+def test_profile_counts_in_one_scan(db):
+    _seed(db)
+    profile = profiler.build_profile(db, chunk_size=3)
+
+    assert profile["total_transactions"] == 4
+    assert profile["total_customers"] == 1
+    assert profile["total_revenue"] == 12.0
+    assert profile["date_range"] == {"start": "2023-01-01T00:00:00", "end": "2023-03-01T00:00:00"}
+    assert profile["missing_values"] == {
+        "customer_id": 0, "transaction_code": 1, "transaction_date": 0, "amount": 0, "product_category": 1
+    }
+    assert profile["customer_missing_values"]["name"] == 1
+    assert profile["amounts"] == {"negative": 1, "zero": 1, "min": -5.0, "max": 10.0}
+    assert profile["orphan_transactions"] == 1
+    assert profile["duplicate_transaction_codes"] == 1
+    assert profile["cardinality"]["transactions"]["product_category"] == 2
+    assert profile["cardinality"]["transactions"]["customer_id"] == 2
+
+def test_snapshot_is_reused_until_data_changes(db, monkeypatch):
+    _seed(db)
+    scans = []
+    build = profiler.build_profile
+    monkeypatch.setattr(profiler, "build_profile", lambda db: scans.append(1) or build(db))
+    monkeypatch.setattr(profiler, "SessionLocal", sessionmaker(bind=db.get_bind()))
+    monkeypatch.setattr(profiler, "PROFILE_REBUILD_INTERVAL", 0)
+
+    first = profiler.get_data_profile(db)
+    second = profiler.get_data_profile(db)
+    assert len(scans) == 1
+    assert second["data_version"] == first["data_version"]
+    assert not first["stale"]
+
+    bump_data_version(db)
+    db.commit()
+    # The old snapshot is served while the rebuild runs in the background
+    third = profiler.get_data_profile(db)
+    assert third["stale"] and third["data_version"] == first["data_version"]
+    profiler._rebuild_thread.join()
+    assert len(scans) == 2
+
+    db.expire_all()
+    fourth = profiler.get_data_profile(db)
+    assert not fourth["stale"] and fourth["data_version"] != first["data_version"]
+    assert db.query(DataProfile).count() == 2
+
+def test_concurrent_loads_share_one_rebuild(db, monkeypatch):
+    _seed(db)
+    profiler.get_data_profile(db)
+    bump_data_version(db)
+    db.commit()
+
+    scans, release = [], threading.Event()
+    build = profiler.build_profile
+    def slow_build(session):
+        scans.append(1)
+        release.wait(5)
+        return build(session)
+    monkeypatch.setattr(profiler, "build_profile", slow_build)
+    monkeypatch.setattr(profiler, "SessionLocal", sessionmaker(bind=db.get_bind()))
+    monkeypatch.setattr(profiler, "PROFILE_REBUILD_INTERVAL", 0)
+
+    responses = [profiler.get_data_profile(db) for _ in range(5)]
+    assert all(r["stale"] for r in responses)
+    release.set()
+    profiler._rebuild_thread.join()
+    assert len(scans) == 1
+
+def test_rebuilds_are_throttled(db, monkeypatch):
+    _seed(db)
+    profiler.get_data_profile(db)
+    bump_data_version(db)
+    db.commit()
+
+    monkeypatch.setattr(profiler, "PROFILE_REBUILD_INTERVAL", 3600)
+    monkeypatch.setattr(profiler, "refresh_profile", lambda: pytest.fail("rebuilt within the interval"))
+    assert profiler.get_data_profile(db)["stale"]
@@ -0,0 +1,70 @@
+import re
+from contextlib import contextmanager
+from sqlalchemy import event
+from app.models.models import ClusterResult, Customer, CustomerCluster, Interaction
+from app.services.clustering_service import aggregate_customer_transactions
+from app.services.cluster_profile_service import _spend_by_cluster
+from app.services.export_service import cluster_members_query
+from app.services.strategy_service import generate_strategies_from_transactions
+from tests.test_rlfm_features import seed_transactions
+
+# Tables large enough that a full scan on a hot path is a regression
+HOT_TABLES = ("transactions", "customer_clusters", "interactions")
+
+@contextmanager
+def captured_statements(db):
+    statements = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if not executemany:
+            statements.append((statement, parameters))
+
+    engine = db.get_bind()
+    event.listen(engine, "before_cursor_execute", capture)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, "before_cursor_execute", capture)
+
+def full_scans(db, statements):
+    """(sql, plan line) for every hot-table access that is not an index search"""
+    cursor = db.connection().connection.cursor()
+    scans = []
+    for statement, parameters in statements:
+        for row in cursor.execute("EXPLAIN QUERY PLAN " + statement, parameters).fetchall():
+            detail = row[3]
+            match = re.match(r"(SCAN|SEARCH) (\w+)", detail)
+            if match and match.group(2) in HOT_TABLES and match.group(1) == "SCAN":
+                scans.append((statement, detail))
+    return scans
+
+def _seed(db):
+    seed_transactions(db)
+    run = ClusterResult(run_name="plans", algorithm="kmeans", parameters={})
+    db.add(run)
+    db.flush()
+    for customer in db.query(Customer).all():
+        db.add(CustomerCluster(cluster_result_id=run.id, customer_id=customer.id, cluster_label=customer.id % 2))
+        db.add(Interaction(customer_id=customer.id, channel="Email", content="hi"))
+    db.commit()
+    return run.id
+
+def test_service_queries_use_indexes(db):
+    run_id = _seed(db)
+    with captured_statements(db) as statements:
+        aggregate_customer_transactions(db, customer_ids=[1, 2])
+        _spend_by_cluster(db, run_id)
+        generate_strategies_from_transactions(run_id, db)
+        cluster_members_query(db, run_id, 0).all()
+    assert len(statements) >= 4
+    assert full_scans(db, statements) == []
+
+def test_endpoint_queries_use_indexes(login_as, db):
+    run_id = _seed(db)
+    client = login_as("admin")
+    with captured_statements(db) as statements:
+        assert client.get(f"/api/v1/strategy/{run_id}/cluster/0/customers").status_code == 200
+        assert client.get("/api/v1/interactions/customer/1").status_code == 200
+        assert client.get("/api/v1/transaction/", params={"customer_code": "C001"}).status_code == 200
+        assert client.delete(f"/api/v1/history/{run_id}").status_code == 200
+    assert full_scans(db, statements) == []
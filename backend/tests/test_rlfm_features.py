@@ -0,0 +1,61 @@
+import pandas as pd
+from datetime import datetime
+from app.models.models import Customer, Transaction
+from app.services.clustering_service import get_customer_data
+
+REFERENCE_DATE = datetime(2024, 1, 1)
+
+def seed_transactions(db, with_codes=True):
+    rows = [
+        ("C001", "INV-1", datetime(2023, 1, 5), 100.0, "Books"),
+        ("C001", "INV-1", datetime(2023, 1, 5), 50.0, "Toys"),
+        ("C001", "INV-2", datetime(2023, 6, 1), 25.5, "Books"),
+        ("C002", "INV-3", datetime(2023, 3, 10), 300.0, None),
+        ("C003", "INV-4", datetime(2023, 11, 20), 12.0, "Garden"),
+        ("C003", "INV-5", datetime(2023, 12, 24), 80.0, "Toys"),
+        ("C003", "INV-6", datetime(2023, 12, 30), 5.0, "Books"),
+    ]
+    customers = {}
+    for code, txn_code, date, amount, category in rows:
+        if code not in customers:
+            customers[code] = Customer(customer_code=code, name=code)
+            db.add(customers[code])
+            db.flush()
+        db.add(Transaction(
+            customer_id=customers[code].id,
+            transaction_code=txn_code if with_codes else None,
+            transaction_date=date,
+            amount=amount,
+            product_category=category
+        ))
+    db.commit()
+
+def test_sql_and_pandas_features_match(db):
+    seed_transactions(db)
+
+    sql_features, sql_map = get_customer_data(db, reference_date=REFERENCE_DATE, use_sql=True)
+    pandas_features, pandas_map = get_customer_data(db, reference_date=REFERENCE_DATE, use_sql=False)
+
+    pd.testing.assert_frame_equal(
+        sql_features.sort_index(), pandas_features.sort_index(), check_dtype=False
+    )
+    pd.testing.assert_frame_equal(sql_map.sort_index(), pandas_map.sort_index(), check_dtype=False)
+
+    c001 = sql_features.loc[sql_map.index[sql_map['customer_code'] == 'C001'][0]]
+    assert c001['monetary'] == 175.5
+    assert c001['frequency'] == 2
+    assert c001['variety'] == 2
+    assert c001['length'] == (datetime(2023, 6, 1) - datetime(2023, 1, 5)).days
+    assert c001['recency'] == (REFERENCE_DATE - datetime(2023, 6, 1)).days
+
+def test_sql_and_pandas_features_match_without_codes(db):
+    seed_transactions(db, with_codes=False)
+
+    sql_features, _ = get_customer_data(db, reference_date=REFERENCE_DATE, use_sql=True)
+    pandas_features, _ = get_customer_data(db, reference_date=REFERENCE_DATE, use_sql=False)
+
+    pd.testing.assert_frame_equal(
+        sql_features.sort_index(), pandas_features.sort_index(), check_dtype=False
+    )
+    # Without transaction codes frequency falls back to the number of rows
+    assert sorted(sql_features['frequency'].tolist()) == [1, 3, 3]
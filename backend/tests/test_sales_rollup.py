@@ -0,0 +1,128 @@
+import threading
+from datetime import datetime
+import numpy as np
+import pandas as pd
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+from app.core.database import Base
+from app.models.models import SalesRollup, Transaction
+from app.services.data_service import process_upload_file
+from app.services.rollup_service import apply_summary, ensure_sales_rollup, rebuild_sales_rollup, sales_trend, summarize_transactions
+from app.services.sketch import HyperLogLog
+from tests.test_rlfm_features import seed_transactions
+from tests.test_upload import RETAIL_CSV, RETAIL_MAPPING
+
+def _exact_monthly(db):
+    rows = db.query(Transaction.transaction_date, Transaction.amount).all()
+    df = pd.DataFrame(rows, columns=['date', 'amount'])
+    monthly = df.groupby(pd.to_datetime(df['date']).dt.strftime('%Y-%m'))['amount'].agg(['sum', 'count'])
+    return {month: (round(r['sum'], 6), int(r['count'])) for month, r in monthly.iterrows()}
+
+def _rollup_monthly(db):
+    return {r["date"]: (round(r["amount"], 6), r["transactions"]) for r in sales_trend(db)}
+
+def test_rollup_is_maintained_by_upload_and_manual_transaction(client, db):
+    process_upload_file(RETAIL_CSV, "retail.csv", db, RETAIL_MAPPING, chunk_size=2)
+    response = client.post("/api/v1/transaction/", json={
+        "customer_code": "17850",
+        "transaction_date": "2011-01-15T10:00:00",
+        "amount": 20.0,
+        "product_category": "Lights"
+    })
+    assert response.status_code == 200
+
+    assert _rollup_monthly(db) == _exact_monthly(db)
+    incremental = {
+        (r.period, r.product_category): (round(r.total_amount, 6), r.transaction_count)
+        for r in db.query(SalesRollup).all()
+    }
+
+    # A full rebuild produces the same rows as the incremental path
+    rebuild_sales_rollup(db, chunk_size=2)
+    rebuilt = {
+        (r.period, r.product_category): (round(r.total_amount, 6), r.transaction_count)
+        for r in db.query(SalesRollup).all()
+    }
+    assert incremental == rebuilt
+
+    response = client.get("/api/v1/analytics/sales-over-time?customers=true")
+    assert response.status_code == 200
+    # 2010-12: 17850 and 13047; 2011-01: 17850; the undated row is filed under today
+    assert [r["customers"] for r in response.json()] == [2, 1, 1]
+
+def test_first_write_backfills_an_unbuilt_rollup(client, db):
+    # Existing history, rollup never built: one manual transaction must not leave
+    # the rollup holding only that row
+    seed_transactions(db)
+    response = client.post("/api/v1/transaction/", json={
+        "customer_code": "C002",
+        "transaction_date": "2023-12-31T10:00:00",
+        "amount": 20.0
+    })
+    assert response.status_code == 200
+    assert _rollup_monthly(db) == _exact_monthly(db)
+
+    # Later reads see a complete rollup and leave it alone
+    before = {r.id: r.updated_at for r in db.query(SalesRollup)}
+    ensure_sales_rollup(db)
+    assert {r.id: r.updated_at for r in db.query(SalesRollup)} == before
+
+def test_sketch_merges_estimate_union():
+    first = HyperLogLog().add(np.arange(0, 60000))
+    second = HyperLogLog().add(np.arange(30000, 90000))
+    restored = HyperLogLog.from_bytes(first.merge(second).to_bytes())
+    assert abs(restored.count() - 90000) / 90000 < 0.1
+
+def run_concurrently(engine, writers, table):
+    """Run each writer(session) in its own thread; all have read before any writes to table"""
+    barrier = threading.Barrier(len(writers), timeout=10)
+    waiting = threading.local()
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def hold_first_write(conn, cursor, statement, *args):
+        if not getattr(waiting, "done", False) and statement.lstrip().startswith(("INSERT INTO " + table, "UPDATE " + table)):
+            waiting.done = True
+            barrier.wait()
+
+    errors = []
+
+    def run(writer):
+        db = sessionmaker(bind=engine)()
+        try:
+            writer(db)
+            db.commit()
+        except Exception as e:  # reported by the caller
+            errors.append(e)
+        finally:
+            db.close()
+
+    threads = [threading.Thread(target=run, args=(w,)) for w in writers]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    event.remove(engine, "before_cursor_execute", hold_first_write)
+    assert errors == []
+
+def test_concurrent_writers_add_to_the_same_rows(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'rollup.db'}", connect_args={"timeout": 30})
+    Base.metadata.create_all(bind=engine)
+
+    def frame(customer_id, amount):
+        return pd.DataFrame({
+            "customer_id": [customer_id], "transaction_date": [datetime(2024, 3, 5)],
+            "amount": [amount], "product_category": ["Books"]
+        })
+
+    # Both create the same new row, then both add to it
+    for amounts in ((10.0, 20.0), (1.0, 2.0)):
+        run_concurrently(engine, [
+            lambda db, a=amounts[0]: apply_summary(db, summarize_transactions(frame(1, a))),
+            lambda db, a=amounts[1]: apply_summary(db, summarize_transactions(frame(2, a))),
+        ], "sales_rollup")
+
+    db = sessionmaker(bind=engine)()
+    row = db.query(SalesRollup).one()
+    assert (row.total_amount, row.transaction_count) == (33.0, 4)
+    assert round(HyperLogLog.from_bytes(row.customer_sketch).count()) == 2
+    db.close()
@@ -0,0 +1,70 @@
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.cluster import DBSCAN, AgglomerativeClustering, KMeans
+from sklearn.datasets import make_blobs
+from app.services.clustering_service import assign_labels, stratified_sample_indices, run_clustering, validate_fit_sample_size
+from app.services.data_service import process_upload_file
+
+@pytest.fixture(scope="module")
+def blobs():
+    X, _ = make_blobs(n_samples=2000, centers=3, n_features=4, cluster_std=0.5, random_state=1)
+    return X
+
+@pytest.mark.parametrize("model", [
+    KMeans(n_clusters=3, random_state=0),
+    DBSCAN(eps=0.8, min_samples=5),
+    AgglomerativeClustering(n_clusters=3),
+])
+def test_assign_labels_matches_full_fit(blobs, model):
+    sample = np.arange(0, len(blobs), 5)
+    fit_labels = model.fit_predict(blobs[sample])
+
+    labels = assign_labels(model, blobs[sample], fit_labels, blobs, batch_size=300)
+
+    assert len(labels) == len(blobs)
+    # Sampled rows keep (up to relabelling) the label they were fitted with
+    assert (pd.crosstab(fit_labels, labels[sample]).gt(0).sum(axis=1) == 1).all()
+
+def test_stratified_sample_keeps_spend_mix():
+    features = pd.DataFrame({"monetary": np.random.default_rng(0).lognormal(3, 1, 5000)})
+    idx = stratified_sample_indices(features, 500)
+    assert 480 <= len(idx) <= 520
+    assert abs(features['monetary'].iloc[idx].median() / features['monetary'].median() - 1) < 0.1
+
+def test_stratified_sample_of_fewer_customers_than_strata():
+    features = pd.DataFrame({"monetary": [5.0, 1.0, 3.0, 2.0, 4.0, 6.0]})
+    assert len(stratified_sample_indices(features, 3)) == 3
+
+def test_fit_sample_size_is_validated(login_as):
+    validate_fit_sample_size(None, {})
+    validate_fit_sample_size(100, {"n_clusters": 3})
+    for size, params in [(5, {}), (-1, {}), (120, {"n_clusters": 150})]:
+        with pytest.raises(ValueError, match="fit_sample_size must be at least"):
+            validate_fit_sample_size(size, params)
+
+    response = login_as("staff").post("/api/v1/run", json={
+        "algorithm": "kmeans", "params": {"n_clusters": 3}, "run_name": "tiny", "fit_sample_size": 5
+    })
+    assert response.status_code == 400
+    assert response.json()["detail"] == "fit_sample_size must be at least 100 (got 5)"
+
+def test_run_clustering_with_fit_sample(db):
+    rng = np.random.default_rng(3)
+    rows = ["code,amount,date,invoice"]
+    for c in range(300):
+        spend = [20, 200, 2000][c % 3]
+        for t in range(1 + c % 3):
+            rows.append(f"C{c},{spend * rng.uniform(0.9, 1.1):.2f},2023-0{1 + t}-1{c % 9},INV{c}-{t}")
+    process_upload_file("\n".join(rows).encode(), "data.csv", db, {
+        "customer_code": "code", "amount": "amount", "transaction_date": "date", "transaction_code": "invoice"
+    })
+
+    result = run_clustering("kmeans", {"n_clusters": 3}, db, "sampled", save_result=False, fit_sample_size=100)
+
+    assert sum(result["counts"].values()) == 300
+    sampling = result["sampling"]
+    assert 90 <= sampling["sample_size"] <= 110
+    assert sampling["fit_seconds"] >= 0 and sampling["assign_seconds"] >= 0
+    assert sampling["agreement_subset_size"] == 300 - sampling["sample_size"]
+    assert sampling["agreement"] > 0.8
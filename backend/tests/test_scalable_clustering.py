@@ -0,0 +1,47 @@
+import pytest
+from sklearn.datasets import make_blobs
+from sklearn.metrics import adjusted_rand_score
+from app.services import clustering_service
+from app.services.clustering_service import build_model, run_clustering
+from tests.test_rlfm_features import seed_transactions
+
+@pytest.fixture(scope="module")
+def blobs():
+    return make_blobs(n_samples=1500, centers=3, n_features=5, cluster_std=0.6, random_state=0)
+
+@pytest.mark.parametrize("algorithm,variant", [
+    ("kmeans", "minibatch_kmeans"),
+    ("hierarchical", "birch_agglomerative"),
+    ("spectral", "nystroem_spectral"),
+    ("meanshift", "meanshift_bin_seeding"),
+    ("affinity_propagation", "sampled_affinity_propagation"),
+])
+def test_scalable_variants_recover_blobs(blobs, algorithm, variant):
+    X, truth = blobs
+    params = {"n_clusters": 3, "scalable": True, "sample_size": 300, "damping": 0.9}
+    model, chosen = build_model(algorithm, params, X)
+    assert chosen == variant
+
+    labels = model.fit_predict(X)
+    assert len(labels) == len(X)
+    if algorithm != "affinity_propagation":  # AP picks its own number of exemplars
+        assert adjusted_rand_score(truth, labels) > 0.9
+
+def test_auto_selection_uses_threshold(blobs, monkeypatch):
+    X, _ = blobs
+    monkeypatch.setattr(clustering_service, "SCALABLE_THRESHOLD", 1000)
+    assert build_model("kmeans", {}, X)[1] == "minibatch_kmeans"
+    assert build_model("kmeans", {}, X[:999])[1] == "kmeans"
+    assert build_model("kmeans", {"scalable": False}, X)[1] == "kmeans"
+    # Algorithms without a scalable variant run as-is
+    assert build_model("dbscan", {}, X)[1] == "dbscan"
+
+def test_unknown_algorithm_rejected(blobs):
+    with pytest.raises(ValueError):
+        build_model("nope", {}, blobs[0])
+
+def test_run_reports_variant(db):
+    seed_transactions(db)
+    result = run_clustering("kmeans", {"n_clusters": 2, "scalable": True}, db, "scalable", save_result=False)
+    assert result["variant"] == "minibatch_kmeans"
+    assert sum(result["counts"].values()) == 3
@@ -0,0 +1,87 @@
+import pytest
+from app.models.models import ClusterResult, Customer, CustomerCluster, SegmentTransition
+from app.services import model_registry, segment_service
+from app.services.clustering_service import run_clustering
+from app.services.data_service import process_upload_file
+from app.services.feature_store import load_customer_features
+from tests.test_rlfm_features import seed_transactions
+from tests.test_upload import RETAIL_CSV, RETAIL_MAPPING
+
+@pytest.fixture
+def admin_client(login_as, monkeypatch):
+    monkeypatch.setattr(segment_service, "SEGMENT_ASSIGN_ON_INGEST", True)
+    return login_as("admin")
+
+def _active_run(db, client):
+    seed_transactions(db)
+    run_id = run_clustering("kmeans", {"n_clusters": 2}, db, "active")["run_id"]
+    assert client.post(f"/api/v1/history/{run_id}/activate").status_code == 200
+    return run_id
+
+def _memberships(db, run_id):
+    rows = db.query(CustomerCluster.customer_id, CustomerCluster.cluster_label)\
+        .filter(CustomerCluster.cluster_result_id == run_id).all()
+    return dict(rows)
+
+def _assert_current(db, run_id):
+    """Touched members' stored labels are what the saved model gives for their current features"""
+    memberships = _memberships(db, run_id)
+    # Only touched customers are in the feature store (the run itself read transactions)
+    features, _ = load_customer_features(db, customer_ids=list(memberships))
+    model = model_registry.load_model(run_id)
+    expected = dict(zip(features.index, model.assign(features[model.features].to_numpy(dtype=float))))
+    assert {k: memberships[k] for k in expected} == {k: int(v) for k, v in expected.items()}
+    run = db.get(ClusterResult, run_id)
+    db.refresh(run)
+    assert run.customer_count == len(memberships)
+    assert sum(run.cluster_sizes.values()) == len(memberships)
+
+def test_manual_transactions_rescore_customers(admin_client, db):
+    run_id = _active_run(db, admin_client)
+    before = _memberships(db, run_id)
+
+    items = [
+        {"customer_code": "C003", "transaction_date": "2023-12-31T10:00:00", "amount": 5000.0},
+        {"customer_code": "NEW1", "transaction_date": "2023-12-31T10:00:00", "amount": 40.0},
+    ]
+    assert admin_client.post("/api/v1/transaction/batch", json={"items": items}).status_code == 200
+
+    _assert_current(db, run_id)
+    new_id = db.query(Customer.id).filter(Customer.customer_code == "NEW1").scalar()
+    transitions = db.query(SegmentTransition).filter(SegmentTransition.cluster_result_id == run_id).all()
+    joined = [t for t in transitions if t.customer_id == new_id]
+    assert len(joined) == 1 and joined[0].from_label is None and joined[0].source == "manual"
+    # Existing members only get a transition when their label actually changed
+    for t in transitions:
+        if t.customer_id != new_id:
+            assert before[t.customer_id] == t.from_label != t.to_label
+
+def test_upload_is_scored_in_one_pass(admin_client, db):
+    run_id = _active_run(db, admin_client)
+    stats = process_upload_file(RETAIL_CSV, "retail.csv", db, RETAIL_MAPPING)
+    assert stats["segments"]["run_id"] == run_id
+    assert stats["segments"]["scored"] == 3
+    _assert_current(db, run_id)
+    assert db.query(SegmentTransition).filter(SegmentTransition.source == "upload").count() == 3
+
+def test_hook_is_opt_in(admin_client, db, monkeypatch):
+    run_id = _active_run(db, admin_client)
+    monkeypatch.setattr(segment_service, "SEGMENT_ASSIGN_ON_INGEST", False)
+    stats = process_upload_file(RETAIL_CSV, "retail.csv", db, RETAIL_MAPPING)
+    assert stats["segments"] is None
+    assert len(_memberships(db, run_id)) == 3
+    assert db.query(SegmentTransition).count() == 0
+
+def test_only_one_run_is_active(admin_client, db):
+    first = _active_run(db, admin_client)
+    second = run_clustering("kmeans", {"n_clusters": 2}, db, "second")["run_id"]
+    assert admin_client.post(f"/api/v1/history/{second}/activate").status_code == 200
+    active = {item["id"]: item["is_active"] for item in admin_client.get("/api/v1/history/").json()["items"]}
+    assert active == {first: False, second: True}
+
+    assert admin_client.post("/api/v1/history/999/activate").status_code == 404
+    legacy = ClusterResult(run_name="legacy", algorithm="kmeans", parameters={})
+    db.add(legacy)
+    db.commit()
+    assert admin_client.post(f"/api/v1/history/{legacy.id}/activate").status_code == 400
+    assert segment_service.active_run(db).id == second
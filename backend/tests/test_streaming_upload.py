@@ -0,0 +1,88 @@
+import os
+import subprocess
+import sys
+import textwrap
+import pytest
+from app.models.models import Customer, Transaction
+from app.core.cache import get_data_version
+from app.services.data_service import _ingest_chunks, iter_upload_chunks, process_upload_stream
+from app.services.feature_store import load_customer_features
+from tests.test_upload import RETAIL_CSV, RETAIL_MAPPING
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def test_stream_upload_in_small_chunks(db, tmp_path):
+    path = tmp_path / "retail.csv"
+    path.write_bytes(RETAIL_CSV)
+
+    stats = process_upload_stream(str(path), "retail.csv", db, RETAIL_MAPPING, chunk_size=2)
+
+    assert stats["count"] == 4
+    assert db.query(Transaction).count() == 4
+    # The same customer split across chunks (int in one, float with gaps in another) stays one customer
+    assert db.query(Customer).filter(Customer.customer_code == "17850").count() == 1
+    assert db.query(Customer).count() == 3
+
+def test_failed_upload_still_refreshes_committed_chunks(db, tmp_path):
+    path = tmp_path / "retail.csv"
+    path.write_bytes(RETAIL_CSV)
+    version = get_data_version(db)
+
+    def failing_chunks():
+        chunks = iter_upload_chunks(str(path), "retail.csv", chunk_size=2)
+        yield next(chunks)
+        raise ValueError("broken file")
+
+    with pytest.raises(ValueError):
+        _ingest_chunks(db, failing_chunks(), RETAIL_MAPPING, chunk_size=2)
+
+    # The first chunk (customer 17850) committed and is visible to derived data
+    assert db.query(Transaction).count() == 2
+    features, customer_map = load_customer_features(db)
+    assert customer_map['customer_code'].tolist() == ["17850"]
+    assert get_data_version(db) != version
+
+# Generating and loading a multi-hundred-MB file takes minutes, so it is opt-in:
+#   DSS_RUN_SLOW_TESTS=1 python -m pytest tests/test_streaming_upload.py
+@pytest.mark.skipif(not os.getenv("DSS_RUN_SLOW_TESTS"), reason="set DSS_RUN_SLOW_TESTS=1 to run")
+def test_streaming_upload_peak_rss_is_bounded(tmp_path):
+    file_mb = int(os.getenv("DSS_STREAM_TEST_MB", 300))
+    rss_limit_mb = int(os.getenv("DSS_STREAM_RSS_LIMIT_MB", 600))
+
+    csv_path = tmp_path / "large.csv"
+    line = "C{:06d},INV{:08d},2023-{:02d}-{:02d} 10:00:00,{:.2f},Category{}\n"
+    with open(csv_path, "w") as f:
+        f.write("customer,invoice,date,amount,category\n")
+        i = 0
+        while f.tell() < file_mb * 1024 * 1024:
+            f.write("".join(
+                line.format(n % 5000, n // 3, n % 12 + 1, n % 28 + 1, (n % 997) / 3, n % 20)
+                for n in range(i, i + 100000)
+            ))
+            i += 100000
+
+    # Run in a fresh interpreter so ru_maxrss reflects only the ingestion
+    script = textwrap.dedent(f"""
+        import resource
+        from app.core.database import SessionLocal, engine, Base
+        from app.models import models
+        from app.core.cache import get_data_version
+from app.services.data_service import _ingest_chunks, iter_upload_chunks, process_upload_stream
+from app.services.feature_store import load_customer_features
+        Base.metadata.create_all(bind=engine)
+        db = SessionLocal()
+        stats = process_upload_stream({str(csv_path)!r}, "large.csv", db, {{
+            "customer_code": "customer", "transaction_code": "invoice",
+            "transaction_date": "date", "amount": "amount", "product_category": "category"
+        }}, chunk_size=50000)
+        print(stats["count"], resource.getrusage(resource.RUSAGE_SELF).ru_maxrss // 1024)
+    """)
+    env = {**os.environ, "DATABASE_URL": f"sqlite:///{tmp_path / 'stream.db'}"}
+    result = subprocess.run(
+        [sys.executable, "-c", script], cwd=BACKEND_DIR, env=env,
+        capture_output=True, text=True, check=True
+    )
+    count, peak_rss_mb = map(int, result.stdout.split()[-2:])
+
+    assert count == i
+    assert peak_rss_mb < rss_limit_mb, f"peak RSS {peak_rss_mb} MB for a {file_mb} MB file"
@@ -0,0 +1,97 @@
+import pytest
+from sqlalchemy.orm import sessionmaker
+from app.models.models import ClusterResult
+from app.services import job_service, sweep_service
+from app.services.sweep_service import expand_grid, run_sweep, sweep_workers
+from tests.test_clustering_jobs import InlineExecutor
+
+def seed_customers(db):
+    # 300 customers in three clear spend tiers
+    from app.services.data_service import process_upload_file
+    rows = ["code,amount,date,invoice"]
+    for c in range(300):
+        spend = [20, 200, 2000][c % 3]
+        for t in range(1 + c % 3):
+            rows.append(f"C{c},{spend},2023-0{1 + t}-1{c % 9},INV{c}-{t}")
+    process_upload_file("\n".join(rows).encode(), "data.csv", db, {
+        "customer_code": "code", "amount": "amount", "transaction_date": "date", "transaction_code": "invoice"
+    })
+
+def test_expand_grid():
+    configs = expand_grid([
+        {"algorithm": "kmeans", "params": {"n_clusters": [2, 3], "batch_size": 100}},
+        {"algorithm": "dbscan", "params": {}},
+    ])
+    assert configs == [
+        ("kmeans", {"n_clusters": 2, "batch_size": 100}),
+        ("kmeans", {"n_clusters": 3, "batch_size": 100}),
+        ("dbscan", {}),
+    ]
+
+def test_sweep_workers_are_capped(monkeypatch):
+    monkeypatch.setattr(sweep_service, "SWEEP_MAX_WORKERS", 4)
+    assert sweep_workers(None, 10) == 4
+    assert sweep_workers(1000, 10) == 4
+    assert sweep_workers(2, 10) == 2
+    assert sweep_workers(8, 3) == 3
+    assert sweep_workers(-5, 10) == 1
+
+def test_sweep_scores_grid_and_saves_best(db):
+    seed_customers(db)
+
+    result = run_sweep(db, [
+        {"algorithm": "kmeans", "params": {"n_clusters": [2, 3, 4]}},
+        {"algorithm": "nope", "params": {}},
+    ], max_workers=2, save_best=True, run_name="best_of_sweep")
+
+    assert result["n_customers"] == 300
+    assert result["n_configs"] == 4
+    scored = [r for r in result["results"] if "error" not in r]
+    assert len(scored) == 3
+    for r in scored:
+        assert sum(r["cluster_sizes"].values()) == 300
+        assert r["calinski_harabasz"] > 0 and r["davies_bouldin"] >= 0
+    assert "Unknown algorithm" in result["results"][-1]["error"]
+
+    assert result["best"]["params"] == {"n_clusters": 3}
+    saved = db.get(ClusterResult, result["saved_run_id"])
+    assert saved.run_name == "best_of_sweep"
+    assert saved.parameters == {"n_clusters": 3}
+
+def test_grid_size_is_capped(login_as, monkeypatch):
+    monkeypatch.setattr(sweep_service, "SWEEP_MAX_CONFIGS", 3)
+    with pytest.raises(ValueError, match="at most 3"):
+        expand_grid([{"algorithm": "kmeans", "params": {"n_clusters": [2, 3], "batch_size": [100, 200]}}])
+
+    response = login_as("staff").post("/api/v1/clustering/sweep", json={
+        "grid": [{"algorithm": "kmeans", "params": {"n_clusters": list(range(2, 1000))}}]
+    })
+    assert response.status_code == 400
+    assert "at most 3" in response.json()["detail"]
+
+def test_sweep_runs_as_a_job(login_as, db, monkeypatch):
+    seed_customers(db)
+    monkeypatch.setattr(job_service, "SessionLocal", sessionmaker(bind=db.get_bind()))
+    monkeypatch.setattr(job_service, "_executor", InlineExecutor())
+    client = login_as("staff")
+
+    submitted = client.post("/api/v1/clustering/sweep", json={
+        "grid": [{"algorithm": "kmeans", "params": {"n_clusters": [2, 3]}}],
+        "max_workers": 1, "save_best": True, "run_name": "sweep_job"
+    }).json()
+    assert submitted["n_configs"] == 2
+
+    job = client.get(f"/api/v1/jobs/{submitted['job_id']}").json()
+    assert job["status"] == "completed" and job["algorithm"] == "sweep"
+    assert job["result"]["best"]["params"] == {"n_clusters": 3}
+    assert db.get(ClusterResult, job["run_id"]).run_name == "sweep_job"
+
+def test_cancelled_sweep_stops(db):
+    seed_customers(db)
+
+    def cancel(fraction, message):
+        raise job_service.JobCancelled()
+
+    with pytest.raises(job_service.JobCancelled):
+        run_sweep(db, [{"algorithm": "kmeans", "params": {"n_clusters": [2, 3, 4]}}], max_workers=1, progress_callback=cancel)
+    assert db.query(ClusterResult).count() == 0
@@ -0,0 +1,99 @@
+from datetime import datetime
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from app.core.database import Base
+from app.models.models import Customer, CustomerRLFM, Transaction
+from app.services.feature_store import rebuild_feature_store
+from app.services.rollup_service import rebuild_sales_rollup, sales_totals
+from app.services.transaction_service import record_transactions
+from tests.test_sales_rollup import run_concurrently
+
+def _item(code, amount, key=None, name=None, date="2024-01-15T10:00:00"):
+    item = {"customer_code": code, "transaction_date": date, "amount": amount, "product_category": "Books"}
+    if key:
+        item["idempotency_key"] = key
+    if name:
+        item["customer_name"] = name
+    return item
+
+def test_batch_inserts_rows_and_upserts_customers(client, db):
+    db.add(Customer(customer_code="C001", name=None))
+    db.commit()
+
+    items = [_item("C001", 10.0, name="Alice"), _item("C002", 20.0, name="Bob"), _item("C002", 5.0)]
+    response = client.post("/api/v1/transaction/batch", json={"items": items})
+    assert response.status_code == 200
+    body = response.json()
+    assert body["created"] == 3
+    assert body["duplicates"] == 0
+    assert [r["index"] for r in body["results"]] == [0, 1, 2]
+
+    customers = {c.customer_code: c for c in db.query(Customer).all()}
+    assert set(customers) == {"C001", "C002"}
+    # Missing name filled in from the batch
+    assert customers["C001"].name == "Alice"
+    assert db.query(Transaction).count() == 3
+
+    codes = {t.transaction_code for t in db.query(Transaction).all()}
+    assert len(codes) == 3
+
+    # Derived tables were updated in the same commit
+    assert sales_totals(db) == (35.0, 3)
+    assert db.query(CustomerRLFM).count() == 2
+
+def test_retried_keys_are_not_counted_twice(client, db):
+    items = [_item("C001", 10.0, key="k1"), _item("C001", 15.0, key="k2")]
+    first = client.post("/api/v1/transaction/batch", json={"items": items}).json()
+    assert first["created"] == 2
+
+    retry = client.post("/api/v1/transaction/batch", json={"items": items + [_item("C001", 1.0, key="k3")]}).json()
+    assert retry["created"] == 1
+    assert retry["duplicates"] == 2
+    assert [r["transaction_id"] for r in retry["results"][:2]] == [r["transaction_id"] for r in first["results"]]
+
+    assert db.query(Transaction).count() == 3
+    assert sales_totals(db) == (26.0, 3)
+
+def test_repeated_key_within_a_batch(client, db):
+    items = [_item("C001", 10.0, key="same"), _item("C001", 10.0, key="same")]
+    body = client.post("/api/v1/transaction/batch", json={"items": items}).json()
+    assert [r["status"] for r in body["results"]] == ["created", "duplicate"]
+    assert body["results"][0]["transaction_id"] == body["results"][1]["transaction_id"]
+    assert db.query(Transaction).count() == 1
+
+def test_single_item_endpoint_is_idempotent(client, db):
+    item = _item("C009", 42.0, key="pos-1")
+    first = client.post("/api/v1/transaction/", json=item).json()
+    second = client.post("/api/v1/transaction/", json=item).json()
+    assert first["message"] == "Transaction created successfully"
+    assert second["message"] == "Transaction already recorded"
+    assert first["transaction_id"] == second["transaction_id"]
+    assert db.query(Transaction).count() == 1
+
+def test_batch_limits(client):
+    assert client.post("/api/v1/transaction/batch", json={"items": []}).status_code == 400
+
+def test_concurrent_batches_for_the_same_customer(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'batch.db'}", connect_args={"timeout": 30})
+    Base.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine)()
+    rebuild_feature_store(db)
+    rebuild_sales_rollup(db)
+    db.close()
+
+    def batch(amount):
+        items = [_item("NEW", amount) for _ in range(3)]
+        for item in items:
+            item["transaction_date"] = datetime.fromisoformat(item["transaction_date"])
+        return lambda session: record_transactions(session, items)
+
+    # Same new customer, same rollup row, same feature-store row
+    run_concurrently(engine, [batch(10.0), batch(1.0)], "customers")
+
+    db = sessionmaker(bind=engine)()
+    assert db.query(Customer).count() == 1
+    assert db.query(Transaction).count() == 6
+    assert sales_totals(db) == (33.0, 6)
+    row = db.query(CustomerRLFM).one()
+    assert (row.transaction_count, row.monetary) == (6, 33.0)
+    db.close()
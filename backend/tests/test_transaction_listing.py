@@ -0,0 +1,72 @@
+from datetime import datetime, timedelta
+from sqlalchemy import event
+from app.models.models import Customer, Transaction
+
+def _seed(db, n=25):
+    customers = [Customer(customer_code=f"C{i}") for i in range(3)]
+    db.add_all(customers)
+    db.flush()
+    base = datetime(2024, 1, 1)
+    for i in range(n):
+        # Pairs of rows share a timestamp so the id tiebreak matters
+        db.add(Transaction(
+            customer_id=customers[i % 3].id,
+            transaction_code=f"T{i}",
+            transaction_date=base + timedelta(days=i // 2),
+            amount=float(i),
+            product_category="Books" if i % 2 else "Toys"
+        ))
+    db.commit()
+
+def _all_pages(client, **params):
+    items, cursor = [], None
+    while True:
+        page = client.get("/api/v1/transaction/", params={**params, **({"cursor": cursor} if cursor else {})}).json()
+        items += page["items"]
+        cursor = page["next_cursor"]
+        if cursor is None:
+            return items
+
+def test_keyset_pages_cover_every_row_once(client, db):
+    _seed(db)
+    items = _all_pages(client, limit=4)
+    assert len(items) == 25
+    assert len({item["id"] for item in items}) == 25
+    assert [(item["date"], item["id"]) for item in items] == sorted(((i["date"], i["id"]) for i in items), reverse=True)
+
+    first = client.get("/api/v1/transaction/", params={"limit": 4, "include_total": True}).json()
+    assert first["total"] == 25
+    assert first["items"][0]["customer_code"] == "C0"
+
+def test_undated_rows_do_not_break_paging(client, db):
+    _seed(db)
+    db.add_all([Transaction(transaction_code=f"U{i}", amount=1.0) for i in range(2)])
+    db.commit()
+    # A page boundary that would fall on an undated row
+    items = _all_pages(client, limit=26)
+    assert len(items) == 25
+    assert all(item["date"] for item in items)
+
+def test_filters(client, db):
+    _seed(db)
+    books = _all_pages(client, limit=3, category="Books", customer_code="C1")
+    assert {item["category"] for item in books} == {"Books"}
+    assert {item["customer_code"] for item in books} == {"C1"}
+
+    page = client.get("/api/v1/transaction/", params={
+        "start_date": "2024-01-02T00:00:00", "end_date": "2024-01-03T00:00:00", "include_total": True
+    }).json()
+    assert page["total"] == 4
+    assert client.get("/api/v1/transaction/", params={"customer_code": "missing"}).json()["items"] == []
+
+def test_page_is_a_single_join_query(client, db):
+    _seed(db)
+    statements = []
+    listener = lambda conn, cursor, statement, *args: statements.append(statement)
+    event.listen(db.get_bind(), "before_cursor_execute", listener)
+    try:
+        client.get("/api/v1/transaction/", params={"limit": 20})
+    finally:
+        event.remove(db.get_bind(), "before_cursor_execute", listener)
+    # No per-row customer lookups and no COUNT(*)
+    assert len([s for s in statements if "transactions" in s]) == 1
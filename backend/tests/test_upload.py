@@ -0,0 +1,48 @@
+from datetime import datetime
+from app.models.models import Customer, Transaction
+from app.services.data_service import process_upload_file
+
+RETAIL_CSV = b"""InvoiceNo,CustomerID,Qty,Price,InvoiceDate,Description
+536365,17850,6,2.55,2010-12-01 08:26:00,Lights
+536365,17850,8,3.39,2010-12-01 08:26:00,Lanterns
+536366,13047,2,1.85,2010-12-01 08:28:00,
+536367,,4,1.00,2010-12-01 08:30:00,Cards
+536368,12583,3,4.25,not a date,Mugs
+"""
+
+RETAIL_MAPPING = {
+    "customer_code": "CustomerID",
+    "transaction_code": "InvoiceNo",
+    "quantity": "Qty",
+    "unit_price": "Price",
+    "transaction_date": "InvoiceDate",
+    "product_category": "Description",
+    "amount_mode": "calculate"
+}
+
+def test_bulk_upload_maps_columns(db):
+    db.add(Customer(customer_code="17850", name="Existing"))
+    db.commit()
+
+    stats = process_upload_file(RETAIL_CSV, "retail.csv", db, RETAIL_MAPPING, chunk_size=2)
+
+    # Row without a customer code is skipped
+    assert stats["count"] == 4
+    assert stats["rows_per_second"] > 0
+    assert db.query(Transaction).count() == 4
+
+    # Existing customer is reused, missing ones are created once
+    assert db.query(Customer).count() == 3
+    existing = db.query(Customer).filter(Customer.customer_code == "17850").one()
+    txns = db.query(Transaction).filter(Transaction.customer_id == existing.id).all()
+    assert sorted(t.amount for t in txns) == [6 * 2.55, 8 * 3.39]
+    assert {t.transaction_code for t in txns} == {"536365"}
+    assert txns[0].transaction_date == datetime(2010, 12, 1, 8, 26)
+
+    other = db.query(Transaction).join(Customer).filter(Customer.customer_code == "13047").one()
+    assert other.product_category == "General"
+
+def test_upload_rejects_unknown_mapped_column(db):
+    import pytest
+    with pytest.raises(ValueError):
+        process_upload_file(RETAIL_CSV, "retail.csv", db, {"customer_code": "Missing"})
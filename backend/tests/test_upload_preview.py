@@ -0,0 +1,136 @@
+import io
+import pytest
+from datetime import datetime
+from app.models.models import Transaction
+from app.services import preview_service
+from app.services.data_service import process_upload_stream
+from app.services.preview_service import preview_upload, preview_upload_file
+from tests.test_upload import RETAIL_CSV, RETAIL_MAPPING
+
+
+class CountingReader(io.BytesIO):
+    """Records how many bytes the preview actually read"""
+
+    bytes_read = 0
+
+    def read(self, size=-1):
+        data = super().read(size)
+        self.bytes_read += len(data)
+        return data
+
+
+def big_csv(rows: int) -> bytes:
+    lines = ["InvoiceNo,CustomerID,Qty,Price,InvoiceDate,Description"]
+    lines += [f"{536365 + i},{12000 + i % 4000},{i % 9 + 1},{i % 50 / 10 + 0.5:.2f},2011-0{i % 9 + 1}-15 10:00:00,Item {i % 300}"
+              for i in range(rows)]
+    return ("\n".join(lines) + "\n").encode()
+
+
+def test_csv_preview_types_sample_and_exact_count():
+    preview = preview_upload_file(RETAIL_CSV, "retail.csv")
+
+    assert preview["columns"] == ["InvoiceNo", "CustomerID", "Qty", "Price", "InvoiceDate", "Description"]
+    assert preview["types"]["InvoiceNo"] == "integer"
+    # Gaps make pandas read IDs as floats; still reported as integers
+    assert preview["types"]["CustomerID"] == "integer"
+    assert preview["types"]["Price"] == "float"
+    assert preview["types"]["Description"] == "string"
+    assert preview["estimated_rows"] == 5 and preview["rows_exact"] is True
+    assert preview["delimiter"] == ","
+    # Missing values are JSON-safe
+    assert preview["sample"][3]["CustomerID"] is None
+    assert len(preview["sample"]) == 5
+
+
+def test_csv_preview_reads_only_the_head(monkeypatch):
+    monkeypatch.setattr(preview_service, "PREVIEW_SNIFF_BYTES", 16 * 1024)
+    contents = big_csv(50000)
+    reader = CountingReader(contents)
+
+    preview = preview_upload(reader, "big.csv")
+
+    assert reader.bytes_read <= 16 * 1024
+    assert preview["rows_exact"] is False
+    assert abs(preview["estimated_rows"] - 50000) / 50000 < 0.1
+    assert preview["types"]["InvoiceDate"] == "datetime"
+
+
+def test_semicolon_csv_is_sniffed_for_preview_and_ingest(db, tmp_path):
+    contents = RETAIL_CSV.decode().replace(",", ";").encode("latin-1")
+    preview = preview_upload_file(contents, "retail.csv")
+    assert preview["delimiter"] == ";"
+    assert "CustomerID" in preview["columns"]
+
+    path = tmp_path / "retail.csv"
+    path.write_bytes(contents)
+    stats = process_upload_stream(str(path), "retail.csv", db, RETAIL_MAPPING)
+    assert stats["count"] == 4
+    assert db.query(Transaction).count() == 4
+
+
+def test_xlsx_preview_with_and_without_dimension(tmp_path):
+    openpyxl = pytest.importorskip("openpyxl")
+    rows = 3000
+
+    # Regular workbooks record their used range; write-only ones leave it out
+    for write_only in (False, True):
+        workbook = openpyxl.Workbook(write_only=write_only)
+        sheet = workbook.create_sheet("Sales") if write_only else workbook.active
+        sheet.append(["InvoiceNo", "CustomerID", "Amount", "InvoiceDate", "Shipped"])
+        for i in range(rows):
+            sheet.append([f"INV{i}", 12000 + i % 50, i / 4, f"2011-01-{i % 28 + 1:02d}", datetime(2011, 2, 1, i % 24)])
+        path = tmp_path / f"sales_{write_only}.xlsx"
+        workbook.save(path)
+
+        with open(path, "rb") as f:
+            preview = preview_upload(f, "sales.xlsx")
+
+        assert preview["columns"] == ["InvoiceNo", "CustomerID", "Amount", "InvoiceDate", "Shipped"]
+        assert preview["types"] == {
+            "InvoiceNo": "string", "CustomerID": "integer", "Amount": "float",
+            "InvoiceDate": "datetime", "Shipped": "datetime"
+        }
+        assert preview["sample"][0]["InvoiceNo"] == "INV0"
+        # Date-formatted cells come back as datetimes, sent as strings
+        assert preview["sample"][1]["Shipped"] == "2011-02-01 01:00:00"
+        assert preview["rows_exact"] is False
+        assert abs(preview["estimated_rows"] - rows) / rows < 0.1
+
+
+def test_xlsx_preview_without_openpyxl_internals(tmp_path, monkeypatch):
+    openpyxl = pytest.importorskip("openpyxl")
+    workbook = openpyxl.Workbook()
+    workbook.active.append(["InvoiceNo", "CustomerID", "Shipped"])
+    for i in range(300):
+        workbook.active.append([f"INV{i}", 12000 + i % 50, datetime(2011, 2, 1, i % 24)])
+    path = tmp_path / "sales.xlsx"
+    workbook.save(path)
+
+    def moved(fileobj, limit):
+        raise ImportError("cannot import name 'WorkSheetParser'")
+
+    with open(path, "rb") as f:
+        expected = preview_upload(f, "sales.xlsx")
+    monkeypatch.setattr(preview_service, "_parse_first_sheet_rows", moved)
+    with open(path, "rb") as f:
+        preview = preview_upload(f, "sales.xlsx")
+
+    assert preview["columns"] == expected["columns"]
+    assert preview["types"] == expected["types"] == {"InvoiceNo": "string", "CustomerID": "integer", "Shipped": "datetime"}
+    assert preview["sample"] == expected["sample"]
+    assert preview["estimated_rows"] == 300
+
+def test_preview_endpoint(login_as):
+    client = login_as("admin")
+    response = client.post(
+        "/api/v1/upload/preview",
+        files={"file": ("retail.csv", RETAIL_CSV, "text/csv")}
+    )
+    assert response.status_code == 200
+    assert response.json()["estimated_rows"] == 5
+
+    response = client.post(
+        "/api/v1/upload/preview",
+        files={"file": ("retail.json", b"{}", "application/json")}
+    )
+    assert response.status_code == 400
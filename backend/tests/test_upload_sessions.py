@@ -0,0 +1,143 @@
+import os
+import time
+import pytest
+from app.models.models import Customer, Transaction
+from app.services import data_service, upload_session_service
+from app.services.upload_session_service import finish_upload_session, open_upload_session, process_upload_session
+from tests.test_upload import RETAIL_CSV, RETAIL_MAPPING
+
+
+@pytest.fixture
+def sessions(login_as, tmp_path, monkeypatch):
+    monkeypatch.setattr(upload_session_service, "UPLOAD_SESSION_DIR", str(tmp_path / "sessions"))
+    login_as("admin")
+    return tmp_path / "sessions"
+
+
+def create(client, contents=RETAIL_CSV, filename="retail.csv"):
+    return client.post("/api/v1/upload/sessions", files={"file": (filename, contents, "text/csv")})
+
+
+def test_session_is_previewed_once_and_processed_by_id(client, db, sessions):
+    pytest.importorskip("pyarrow")
+    response = create(client)
+    assert response.status_code == 200
+    session = response.json()
+    assert session["format"] == "parquet"
+    assert session["rows"] == 5
+    assert session["columns"][1] == "CustomerID"
+    assert session["types"]["Price"] == "float"
+
+    # Only the converted parts are kept
+    files = os.listdir(sessions / session["session_id"])
+    assert "meta.json" in files and not any(f.startswith("source") for f in files)
+    assert client.get(f"/api/v1/upload/sessions/{session['session_id']}").json()["rows"] == 5
+
+    response = client.post(
+        f"/api/v1/upload/sessions/{session['session_id']}/process",
+        json={"mapping": RETAIL_MAPPING}
+    )
+    assert response.status_code == 200
+    assert response.json()["count"] == 4
+    assert db.query(Transaction).count() == 4
+
+    # Processed sessions are gone, so a retry cannot import the file twice
+    assert os.listdir(sessions) == []
+    response = client.post(
+        f"/api/v1/upload/sessions/{session['session_id']}/process",
+        json={"mapping": RETAIL_MAPPING}
+    )
+    assert response.status_code == 404
+
+
+def test_failed_mapping_keeps_the_session(client, db, sessions):
+    session_id = create(client).json()["session_id"]
+
+    response = client.post(f"/api/v1/upload/sessions/{session_id}/process", json={"mapping": {"customer_code": "Missing"}})
+    assert response.status_code == 400
+
+    response = client.post(f"/api/v1/upload/sessions/{session_id}/process", json={"mapping": RETAIL_MAPPING})
+    assert response.status_code == 200
+    assert db.query(Transaction).count() == 4
+
+
+def test_sessions_expire(client, sessions, monkeypatch):
+    session_id = create(client).json()["session_id"]
+
+    upload_session_service.purge_expired(now=time.time() + upload_session_service.UPLOAD_SESSION_TTL + 1)
+    assert os.listdir(sessions) == []
+    assert client.get(f"/api/v1/upload/sessions/{session_id}").status_code == 404
+    # Ids are never used as paths unless they look like ours
+    assert client.get("/api/v1/upload/sessions/..%2F..%2Fetc").status_code == 404
+
+
+def test_disk_cap_rejects_new_sessions(client, sessions, monkeypatch):
+    monkeypatch.setattr(upload_session_service, "UPLOAD_SESSION_MAX_BYTES", 64)
+
+    response = create(client)
+    assert response.status_code == 507
+    # The partial spool is removed
+    assert os.listdir(sessions) == []
+
+
+def test_without_pyarrow_the_original_file_is_kept(db, sessions, monkeypatch):
+    monkeypatch.setattr(upload_session_service, "pq", None)
+    session_id, path, budget = open_upload_session("retail.csv")
+    with open(path, "wb") as f:
+        f.write(RETAIL_CSV)
+
+    session = finish_upload_session(session_id, "retail.csv", budget)
+    assert session["format"] == "source"
+    assert session["rows"] is None
+
+    stats = process_upload_session(db, session_id, RETAIL_MAPPING)
+    assert stats["count"] == 4
+
+
+def test_mixed_excel_columns_are_converted(db, sessions):
+    openpyxl = pytest.importorskip("openpyxl")
+    pytest.importorskip("pyarrow")
+    workbook = openpyxl.Workbook()
+    workbook.active.append(["InvoiceNo", "CustomerID", "Amount"])
+    workbook.active.append([536365, 17850, 10.0])
+    workbook.active.append(["C536379", "C17850", 5.0])
+
+    session_id, path, budget = open_upload_session("retail.xlsx")
+    workbook.save(path)
+    session = finish_upload_session(session_id, "retail.xlsx", budget)
+    assert session["format"] == "parquet"
+
+    mapping = {"customer_code": "CustomerID", "transaction_code": "InvoiceNo", "amount": "Amount"}
+    assert process_upload_session(db, session_id, mapping)["count"] == 2
+    assert {c.customer_code for c in db.query(Customer)} == {"17850", "C17850"}
+    assert {t.transaction_code for t in db.query(Transaction)} == {"536365", "C536379"}
+
+def test_retry_resumes_after_committed_parts(db, sessions, monkeypatch):
+    # Parts of two rows; the second part fails once, after the first committed
+    monkeypatch.setattr(data_service, "UPLOAD_CHUNK_SIZE", 2)
+    session_id, path, budget = open_upload_session("retail.csv")
+    with open(path, "wb") as f:
+        f.write(RETAIL_CSV)
+    finish_upload_session(session_id, "retail.csv", budget)
+
+    ingest_frame = data_service.ingest_frame
+    calls = []
+
+    def flaky(db, chunk, *args):
+        calls.append(len(chunk))
+        if len(calls) == 2:
+            raise RuntimeError("database is locked")
+        return ingest_frame(db, chunk, *args)
+
+    monkeypatch.setattr(data_service, "ingest_frame", flaky)
+    with pytest.raises(RuntimeError):
+        process_upload_session(db, session_id, RETAIL_MAPPING)
+    assert db.query(Transaction).count() == 2
+
+    # The committed part is not imported a second time, nor with another mapping
+    with pytest.raises(ValueError):
+        process_upload_session(db, session_id, {**RETAIL_MAPPING, "amount": "Qty"})
+    stats = process_upload_session(db, session_id, RETAIL_MAPPING)
+    assert stats["resumed_after_parts"] == 1
+    assert db.query(Transaction).count() == 4
+    assert sorted(t.transaction_code for t in db.query(Transaction)) == ["536365", "536365", "536366", "536368"]
@@ -97,7 +97,7 @@ const FileUpload = ({ onUploadSuccess }) => {
         }
 
         try {
-            const res = await processFile(file, finalMapping);
+            const res = await processFile(file, finalMapping, previewData?.session_id);
             setMessage(res.message);
             setStep('success');
             if (onUploadSuccess) onUploadSuccess();
@@ -20,6 +20,8 @@ const DataPage = () => {
     const [transactions, setTransactions] = useState([]);
     const [totalItems, setTotalItems] = useState(0);
     const [page, setPage] = useState(1);
+    // cursors[i] fetches page i + 1 (page 1 starts without a cursor)
+    const [cursors, setCursors] = useState([null]);
     const limit = 50;
 
     // Quality State
@@ -92,9 +94,14 @@ const DataPage = () => {
     const fetchTransactions = async () => {
         setLoading(true);
         try {
-            const res = await getTransactions((page - 1) * limit, limit);
+            const res = await getTransactions(cursors[page - 1], limit, {}, page === 1);
             setTransactions(res.items);
-            setTotalItems(res.total);
+            if (res.total !== null && res.total !== undefined) setTotalItems(res.total);
+            setCursors(prev => {
+                const next = prev.slice(0, page);
+                next[page] = res.next_cursor;
+                return next;
+            });
         } catch (err) {
             console.error("Failed to fetch transactions", err);
         } finally {
@@ -215,7 +222,7 @@ const DataPage = () => {
                     </button>
                     <button
                         onClick={() => setPage(p => Math.min(totalPages, p + 1))}
-                        disabled={page === totalPages}
+                        disabled={page === totalPages || !cursors[page]}
                         className="p-2 border rounded hover:bg-gray-50 disabled:opacity-50"
                     >
                         <ChevronRight className="w-4 h-4" />
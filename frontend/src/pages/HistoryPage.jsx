@@ -1,22 +1,28 @@
 import React, { useState, useEffect } from 'react';
 import { useAuth } from '../context/AuthContext';
-import { getHistory, deleteRun, getStrategy } from '../services/api';
-import { Clock, Trash2, ChevronRight, FileText, Calendar, Users, Zap, Loader, PieChart, BarChart2 } from 'lucide-react';
+import { getHistoryPage, deleteRun, getStrategy, getActiveJobs, cancelJob } from '../services/api';
+import { Clock, Trash2, ChevronRight, FileText, Calendar, Users, Zap, Loader, PieChart, BarChart2, XCircle } from 'lucide-react';
 import { PieChart as RechartsPie, Pie, Cell, Tooltip, ResponsiveContainer, BarChart, Bar, XAxis, YAxis, CartesianGrid, Legend } from 'recharts';
 import Layout from '../components/Layout';
 
+const JOB_REFRESH_INTERVAL_MS = 3000;
+
 const HistoryPage = () => {
     const { user } = useAuth();
     const [history, setHistory] = useState([]);
+    const [nextCursor, setNextCursor] = useState(null);
     const [loading, setLoading] = useState(true);
+    const [loadingMore, setLoadingMore] = useState(false);
     const [selectedRun, setSelectedRun] = useState(null);
     const [strategies, setStrategies] = useState(null);
     const [stratLoading, setStratLoading] = useState(false);
+    const [activeJobs, setActiveJobs] = useState([]);
 
     const fetchHistory = async () => {
         try {
-            const data = await getHistory();
-            setHistory(data);
+            const page = await getHistoryPage();
+            setHistory(page.items);
+            setNextCursor(page.next_cursor);
         } catch (err) {
             console.error(err);
         } finally {
@@ -24,10 +30,58 @@ const HistoryPage = () => {
         }
     };
 
+    // Runs are paged by keyset; each page continues after the last run shown
+    const loadMore = async () => {
+        setLoadingMore(true);
+        try {
+            const page = await getHistoryPage({ cursor: nextCursor });
+            setHistory(prev => [...prev, ...page.items]);
+            setNextCursor(page.next_cursor);
+        } catch (err) {
+            console.error(err);
+        } finally {
+            setLoadingMore(false);
+        }
+    };
+
+    const fetchActiveJobs = async () => {
+        try {
+            setActiveJobs(await getActiveJobs());
+        } catch (err) {
+            console.error(err);
+        }
+    };
+
     useEffect(() => {
         fetchHistory();
+        fetchActiveJobs();
     }, []);
 
+    // Queued/running jobs are refreshed while any remain; finished runs then appear in the list
+    useEffect(() => {
+        if (activeJobs.length === 0) return;
+        const timer = setTimeout(async () => {
+            const before = activeJobs.length;
+            const jobs = await getActiveJobs().catch(() => activeJobs);
+            setActiveJobs(jobs);
+            if (jobs.length < before) fetchHistory();
+        }, JOB_REFRESH_INTERVAL_MS);
+        return () => clearTimeout(timer);
+    }, [activeJobs]);
+
+    const handleCancelJob = async (jobId) => {
+        try {
+            const job = await cancelJob(jobId);
+            if (job.status === 'cancelled') {
+                setActiveJobs(prev => prev.filter(j => j.job_id !== jobId));
+            } else {
+                setActiveJobs(prev => prev.map(j => j.job_id === jobId ? job : j));
+            }
+        } catch (err) {
+            alert("Failed to cancel job");
+        }
+    };
+
     const handleDelete = async (e, id) => {
         e.stopPropagation();
         if (!window.confirm("Are you sure you want to delete this analysis run?")) return;
@@ -119,6 +173,25 @@ const HistoryPage = () => {
                         </h2>
                     </div>
                     <div className="overflow-y-auto flex-1 p-2 space-y-2">
+                        {activeJobs.map(job => (
+                            <div key={job.job_id} className="p-4 rounded-lg border border-amber-200 bg-amber-50">
+                                <div className="flex justify-between items-start mb-2">
+                                    <h3 className="font-semibold text-gray-800">{job.run_name || job.algorithm}</h3>
+                                    <button
+                                        onClick={() => handleCancelJob(job.job_id)}
+                                        className="text-gray-400 hover:text-red-500 transition-colors p-1"
+                                        title="Cancel job"
+                                    >
+                                        <XCircle className="w-4 h-4" />
+                                    </button>
+                                </div>
+                                <div className="flex items-center text-xs text-amber-700">
+                                    <Loader className="w-3 h-3 mr-1 animate-spin" />
+                                    <span className="uppercase font-bold tracking-wider mr-2">{job.status}</span>
+                                    {job.message || (job.progress != null && `${Math.round(job.progress * 100)}%`)}
+                                </div>
+                            </div>
+                        ))}
                         {history.length === 0 ? (
                             <div className="text-center py-8 text-gray-400">No history found</div>
                         ) : (
@@ -159,6 +232,15 @@ const HistoryPage = () => {
                                 </div>
                             ))
                         )}
+                        {nextCursor && (
+                            <button
+                                onClick={loadMore}
+                                disabled={loadingMore}
+                                className="w-full py-2 text-sm font-medium text-blue-600 hover:bg-blue-50 rounded-lg transition-colors disabled:opacity-50 flex items-center justify-center"
+                            >
+                                {loadingMore ? <Loader className="w-4 h-4 animate-spin" /> : 'Load more'}
+                            </button>
+                        )}
                     </div>
                 </div>
 
@@ -131,7 +131,7 @@ const UploadStep = ({ onComplete, completed }) => {
 
         try {
             const finalMapping = { ...mapping, amount_mode: amountMode };
-            await processFile(file, finalMapping);
+            await processFile(file, finalMapping, previewData?.session_id);
             setSuccess(true);
             onComplete();
         } catch (err) {
@@ -2,11 +2,13 @@ import axios from 'axios';
 
 const API_URL = 'http://localhost:8000/api/v1';
 
+// The file is sent once: the session endpoint returns the preview plus a
+// session_id, and processing only sends that id with the column mapping
 export const previewFile = async (file) => {
     const formData = new FormData();
     formData.append('file', file);
     try {
-        const response = await axios.post(`${API_URL}/upload/preview`, formData, {
+        const response = await axios.post(`${API_URL}/upload/sessions`, formData, {
             headers: { 'Content-Type': 'multipart/form-data' },
         });
         return response.data;
@@ -16,7 +18,20 @@ export const previewFile = async (file) => {
     }
 };
 
-export const processFile = async (file, mapping) => {
+export const processFile = async (file, mapping, sessionId) => {
+    if (sessionId) {
+        try {
+            const response = await axios.post(`${API_URL}/upload/sessions/${sessionId}/process`, { mapping });
+            return response.data;
+        } catch (error) {
+            // Expired session: fall back to sending the file again
+            if (error.response?.status !== 404) {
+                console.error('Error processing file:', error);
+                throw error;
+            }
+        }
+    }
+
     const formData = new FormData();
     formData.append('file', file);
     formData.append('mapping', JSON.stringify(mapping));
@@ -32,6 +47,50 @@ export const processFile = async (file, mapping) => {
     }
 };
 
+// Clustering runs are background jobs: submit, then poll until they finish
+const JOB_POLL_INTERVAL_MS = 1000;
+
+export const getJob = async (jobId) => {
+    const response = await axios.get(`${API_URL}/jobs/${jobId}`);
+    return response.data;
+};
+
+export const cancelJob = async (jobId) => {
+    try {
+        const response = await axios.post(`${API_URL}/jobs/${jobId}/cancel`);
+        return response.data;
+    } catch (error) {
+        console.error('Error cancelling job:', error);
+        throw error;
+    }
+};
+
+export const getActiveJobs = async () => {
+    try {
+        const response = await axios.get(`${API_URL}/history/jobs`);
+        return response.data;
+    } catch (error) {
+        console.error('Error fetching jobs:', error);
+        throw error;
+    }
+};
+
+// Polls a submitted job until it finishes; resolves with its result
+const waitForJob = async (jobId, options = {}) => {
+    while (true) {
+        await new Promise((resolve) => setTimeout(resolve, JOB_POLL_INTERVAL_MS));
+        const job = await getJob(jobId);
+        if (options.onProgress) options.onProgress(job);
+        if (job.status === 'completed') return job.result;
+        if (job.status === 'failed' || job.status === 'cancelled') {
+            // Same shape as an axios error so callers can read error.response.data.detail
+            const error = new Error(job.error || `Clustering job ${job.status}`);
+            error.response = { data: { detail: job.error || `Clustering job ${job.status}` } };
+            throw error;
+        }
+    }
+};
+
 export const runClustering = async (algorithm, params, runName, options = {}) => {
     try {
         const response = await axios.post(`${API_URL}/run`, {
@@ -42,16 +101,35 @@ export const runClustering = async (algorithm, params, runName, options = {}) =>
             end_date: options.endDate,
             save_result: options.saveResult
         });
-        return response.data;
+        return await waitForJob(response.data.job_id, options);
     } catch (error) {
         console.error('Error running clustering:', error);
         throw error;
     }
 };
 
-export const getHistory = async () => {
+export const runSweep = async (grid, options = {}) => {
+    try {
+        const response = await axios.post(`${API_URL}/clustering/sweep`, {
+            grid,
+            start_date: options.startDate,
+            end_date: options.endDate,
+            max_workers: options.maxWorkers,
+            save_best: options.saveBest,
+            run_name: options.runName
+        });
+        // Sweeps are jobs too; options.onProgress sees each poll (cancel with cancelJob)
+        return await waitForJob(response.data.job_id, options);
+    } catch (error) {
+        console.error('Error running sweep:', error);
+        throw error;
+    }
+};
+
+// One page of runs ({ items, next_cursor }); pass next_cursor back as `cursor` for the next page
+export const getHistoryPage = async (params = {}) => {
     try {
-        const response = await axios.get(`${API_URL}/history/`);
+        const response = await axios.get(`${API_URL}/history/`, { params });
         return response.data;
     } catch (error) {
         console.error('Error fetching history:', error);
@@ -151,9 +229,12 @@ export const getRLFMData = async (skip = 0, limit = 100) => {
     }
 };
 
-export const getTransactions = async (skip = 0, limit = 50) => {
+// Keyset pagination: pass the previous page's next_cursor; filters: customer_code, category, start_date, end_date
+export const getTransactions = async (cursor = null, limit = 50, filters = {}, includeTotal = false) => {
     try {
-        const response = await axios.get(`${API_URL}/transaction`, { params: { skip, limit } });
+        const params = { limit, include_total: includeTotal, ...filters };
+        if (cursor) params.cursor = cursor;
+        const response = await axios.get(`${API_URL}/transaction`, { params });
         return response.data;
     } catch (error) {
         console.error('Error fetching transactions:', error);